@@ -1,25 +1,25 @@
 import streamlit as st
-import gspread
 import pandas as pd
 import plotly.graph_objects as go
 from datetime import date, datetime
 import numpy as np
 from google.oauth2.service_account import Credentials
-import time
+from streamlit.errors import StreamlitSecretNotFoundError
+
+from journal_export import EXPORT_FORMATS, export_bytes, export_name
+from journal_query import TradeQuery
+from journal_format import TradePicker, format_frame, format_rupiah as format_rupiah_values
+from journal_data import (COLUMNS, FIRST_DATA_ROW, FORMULA_COL_INDEXES, ID_COL, ID_COL_INDEX, INPUT_COL_INDEXES,
+                          parse_rows)
+from journal_store import MultiJournalStore, apply_ops, open_store
+from sheet_sync import SheetSync
+from sheets_client import LIMITER, SheetsPool
+from sheet_writer import WriteQueue
 
 # =========================================================================
 # MULTI-THEME SELECTOR 
 # =========================================================================
 
-# Inisialisasi theme di session state
-if 'theme' not in st.session_state:
-    st.session_state.theme = '🌙 Dark Korporat'
-
-# Fungsi ganti theme
-def change_theme(theme_name):
-    st.session_state.theme = theme_name
-    st.rerun()
-
 # Sidebar untuk pilih theme
 with st.sidebar:
     st.markdown("## 🎨 CUSTOM THEME")
@@ -79,21 +79,18 @@ with st.sidebar:
     
     theme_keys = list(theme_options.keys())
     
-    if st.session_state.theme in theme_keys:
-        default_index = theme_keys.index(st.session_state.theme)
-    else:
-        default_index = 0
+    # Inisialisasi theme di session state
+    if st.session_state.get('theme') not in theme_keys:
+        st.session_state.theme = '🌙 Dark Korporat'
     
-    selected = st.selectbox(
+    # Selectbox langsung terikat ke session_state.theme: pilihan baru sudah
+    # berlaku di run yang sama, tidak perlu rerun kedua
+    st.selectbox(
         "Pilih Theme",
         theme_keys,
-        index=default_index,
-        key="theme_selector"
+        key="theme"
     )
     
-    if selected != st.session_state.theme:
-        change_theme(selected)
-    
     current = theme_options[st.session_state.theme]
     st.markdown(f"""
     <div style="
@@ -129,7 +126,11 @@ st.set_page_config(
 # -----------------------------------------------------------------
 # CSS DINAMIS 
 # -----------------------------------------------------------------
-st.markdown(f"""
+@st.cache_resource
+def theme_css(theme_name):
+    # Stylesheet satu theme dirakit sekali per proses, rerun berikutnya tinggal pakai
+    theme = theme_options[theme_name]
+    return f"""
     <style>
     .stApp {{
         background: {theme['bg']};
@@ -379,7 +380,9 @@ st.markdown(f"""
         }}
     }}
     </style>
-""", unsafe_allow_html=True)
+"""
+
+st.markdown(theme_css(st.session_state.theme), unsafe_allow_html=True)
 
 # -----------------------------------------------------------------
 # HEADER WITH REFRESH BUTTON
@@ -397,9 +400,7 @@ with col1:
     """, unsafe_allow_html=True)
 with col2:
     st.write("")
-    if st.button("🔄 Refresh", use_container_width=True):
-        st.cache_data.clear()
-        st.rerun()
+    refresh_clicked = st.button("🔄 Refresh", use_container_width=True)
 
 # =========================================================================
 # KONEKSI GOOGLE SHEETS
@@ -409,13 +410,24 @@ SCOPES = [
     "https://www.googleapis.com/auth/drive"
 ]
 
-COLUMNS = [
-    "Buy Date", "Stock Code", "Qty Lot", "Price (Buy)", "Value (Buy)", 
-    "Current Date", "Current Price", "Custom Date", "Custom Price", 
-    "Possition", "Change %", "P&L", "Change % (Custom)", "P&L (Custom)"
-]
+def secret(name, default=None):
+    # Tanpa secrets.toml pakai default; pesan error-nya muncul di get_gsheet_client
+    try:
+        return st.secrets.get(name, default)
+    except StreamlitSecretNotFoundError:
+        return default
+
+# Backend jurnal: "sheets" (default), atau lokal "sqlite" / "parquet" (path di journal_path)
+JOURNAL_BACKEND = secret("journal_backend", "sheets")
+# Satu poller per proses menyegarkan snapshot jurnal untuk semua sesi (detik)
+POLL_SECONDS = secret("journal_poll_seconds", 30)
 
-@st.cache_resource(ttl=300)
+def close_resource(resource):
+    # Resource dilepas dari cache (clear / eviction): hentikan thread background-nya
+    if resource is not None:
+        resource.close()
+
+@st.cache_resource(on_release=close_resource)
 def get_gsheet_client():
     try:
         if "gcp_service_account" not in st.secrets:
@@ -424,74 +436,136 @@ def get_gsheet_client():
         
         creds_dict = dict(st.secrets["gcp_service_account"])
         creds = Credentials.from_service_account_info(creds_dict, scopes=SCOPES)
-        client = gspread.authorize(creds)
-        return client
+        # Satu client per proses: handle spreadsheet/worksheet di-cache, token
+        # di-refresh di background, semua call API lewat limiter bersama
+        return SheetsPool(creds)
     except Exception as e:
         st.error(f"🔴 Gagal koneksi ke Google Sheets: {str(e)}")
         return None
 
-def get_worksheet(_client):
-    if _client:
-        try:
-            return _client.open_by_key(st.secrets["spreadsheet_id"]).sheet1
-        except Exception as e:
-            st.error(f"🔴 Gagal mengambil Worksheet: {str(e)}")
-    return None
+@st.cache_resource
+def get_journal_sync(spreadsheet_id, worksheet=None):
+    # Snapshot + fingerprint baris disimpan per proses, dipakai ulang antar rerun.
+    # Snapshot juga di-mirror ke Parquet lokal untuk cold start / Sheets down.
+    # Satu SheetSync per worksheet sumber.
+    mirror_key = spreadsheet_id if worksheet is None else f"{spreadsheet_id}-{worksheet}"
+    return SheetSync(parse=parse_rows, width=len(COLUMNS), key_cols=INPUT_COL_INDEXES,
+                     first_row=FIRST_DATA_ROW, mirror_key=mirror_key,
+                     append_from=3, id_col=ID_COL_INDEX, id_header=ID_COL, formula_cols=FORMULA_COL_INDEXES)
 
-@st.cache_data(ttl=30)
-def load_data(_client):
-    try:
-        if _client is None:
-            return pd.DataFrame(columns=COLUMNS)
-            
-        spreadsheet = _client.open_by_key(st.secrets["spreadsheet_id"])
-        ws = spreadsheet.sheet1
-        
-        data = ws.get_all_values()
-        if len(data) <= 1:
-            return pd.DataFrame(columns=COLUMNS)
-            
-        df = pd.DataFrame(data[1:], columns=COLUMNS)
-        df = df[df['Stock Code'].astype(str).str.strip() != '']
-        
-        def clean_number(x):
-            if pd.isna(x) or x == '':
-                return 0.0
-            if isinstance(x, str):
-                x = x.replace('Rp', '').replace(',', '').replace('%', '').replace('.', '').strip()
-                if x in ['#N/A', '#ERROR!', 'No Data', '-', '']:
-                    return 0.0
-            try:
-                return float(x)
-            except:
-                return 0.0
+@st.cache_resource(on_release=close_resource)
+def get_journal_store(_client):
+    # Semua baca/tulis jurnal lewat JournalStore, backend dipilih dari secrets
+    if JOURNAL_BACKEND != "sheets":
+        return open_store(JOURNAL_BACKEND, path=secret("journal_path"))
+    # Beberapa jurnal (satu worksheet per tahun / satu spreadsheet per akun) lewat
+    # secrets journal_sources = [{name, spreadsheet_id, worksheet}]; ADD masuk ke yang pertama
+    sources = secret("journal_sources")
+    if not sources:
+        return open_sheets_journal(_client, secret("spreadsheet_id"))
+    members = {}
+    for source in sources:
+        spreadsheet_id = source.get("spreadsheet_id", secret("spreadsheet_id"))
+        name = source.get("name") or source.get("worksheet") or spreadsheet_id
+        members[name] = open_sheets_journal(_client, spreadsheet_id, source.get("worksheet"))
+    return MultiJournalStore(members)
 
-        numeric_cols = ["Price (Buy)", "Value (Buy)", "Current Price", "Custom Price", 
-                        "P&L", "P&L (Custom)", "Change %", "Change % (Custom)", "Qty Lot"]
-        
-        for col in numeric_cols:
-            if col in df.columns:
-                df[col] = df[col].apply(clean_number)
-        
-        date_cols = ["Buy Date", "Current Date", "Custom Date"]
-        for col in date_cols:
-            if col in df.columns:
-                df[col] = pd.to_datetime(df[col], errors='coerce')
+def open_sheets_journal(client, spreadsheet_id, worksheet=None):
+    # Worksheet None = sheet pertama. Tanpa client (koneksi gagal) tidak ada yang perlu di-poll
+    return open_store("sheets", open_ws=lambda: client.worksheet(spreadsheet_id, worksheet),
+                      sync=get_journal_sync(spreadsheet_id, worksheet),
+                      poll_every=POLL_SECONDS if client is not None else None)
+
+@st.cache_resource(on_release=close_resource)
+def get_write_queue(_client):
+    # Satu antrian tulis per proses; worker thread yang menulis ke store
+    return WriteQueue(get_journal_store(_client))
+
+# Kolom yang dibaca tiap tampilan (None = semua, mis. untuk export CSV).
+# Kolom formula yang tidak diminta tampilan mana pun tidak ikut di-refresh dari sheet.
+VIEW_COLUMNS = {
+    "sidebar": ["Possition"],
+    "footer": ["Stock Code"],
+    "dashboard": ["Buy Date", "Stock Code", "Qty Lot", "Price (Buy)", "Value (Buy)",
+                  "Current Price", "Possition", "Change %", "P&L"],
+    "add": [],
+    "update": ["Buy Date", "Stock Code", "Price (Buy)", "Custom Date", "Possition", ID_COL],
+    "analytics": ["Stock Code", "Possition", "Change %", "P&L"],
+    "delete": ["Buy Date", "Stock Code", "Value (Buy)", ID_COL],
+    "all_trades": None,
+}
+
+def view_columns(views):
+    # Gabungan kolom beberapa tampilan, urut sesuai sheet.
+    # Trade ID selalu ikut: perubahan di antrian dicocokkan lewat ID (apply_ops)
+    if any(VIEW_COLUMNS[v] is None for v in views):
+        return None
+    wanted = {ID_COL, *(c for v in views for c in VIEW_COLUMNS[v])}
+    return [c for c in COLUMNS if c in wanted]
+
+def load_data(_client, columns=None):
+    try:
+        if JOURNAL_BACKEND == "sheets" and _client is None:
+            return pd.DataFrame(columns=COLUMNS if columns is None else columns)
         
-        return df
+        # Snapshot terakhir yang diterbitkan poller; sesi tidak pernah baca sheet sendiri
+        return get_journal_store(_client).load(max_age=POLL_SECONDS, columns=columns)
     except Exception as e:
         st.error(f"🔴 Gagal memuat data: {str(e)}")
         return pd.DataFrame(columns=COLUMNS)
 
+@st.fragment(run_every=2)
+def watch_sync(seen_version):
+    # Rerun penuh begitu revalidasi background selesai
+    store = get_journal_store(client)
+    if store.version != seen_version or not store.revalidating:
+        st.rerun()
+
+@st.fragment(run_every=1)
+def watch_writes():
+    # Status antrian tulis sesi ini; rerun penuh begitu semua sudah tersimpan
+    queue = get_write_queue(client)
+    pending = [i for i in st.session_state.write_ids
+               if queue.status.get(i, {}).get('state') == 'pending']
+    if pending:
+        st.caption(f"⏳ {len(pending)} perubahan menunggu disimpan...")
+    else:
+        st.rerun()
+
+def track_write(mutation_id):
+    st.session_state.setdefault('write_ids', []).append(mutation_id)
+
+def view_data(*views):
+    # Perubahan yang masih di antrian langsung tampil; kalau gagal tersimpan, otomatis hilang lagi.
+    # Versi: snapshot store + isi antrian tulis, untuk key cache tampilan
+    version = (journal_store.version, write_queue.revision)
+    return apply_ops(load_data(client, view_columns(views)), write_queue.pending_ops()), version
+
+def flash(message, balloons=False):
+    # Pesan untuk rerun berikutnya (rerun langsung, tanpa jeda)
+    st.session_state.flash = (message, balloons)
+
 # Initialize
 try:
-    client = get_gsheet_client()
-    df = load_data(client)
-    worksheet = get_worksheet(client) 
+    client = get_gsheet_client() if JOURNAL_BACKEND == "sheets" else None
+    journal_store = get_journal_store(client)
+    if refresh_clicked:
+        journal_store.invalidate()
+        if client is not None:
+            client.forget()
+    write_queue = get_write_queue(client)
+    # Run penuh cuma butuh kolom sidebar & footer; tiap tab memuat kolomnya sendiri
+    df, data_version = view_data("sidebar", "footer")
 except Exception as e:
     st.error(f"❌ Fatal Error: {str(e)}")
     st.stop()
 
+if journal_store.error is not None:
+    st.warning(f"⚠️ Google Sheets tidak bisa dihubungi, menampilkan data terakhir. ({journal_store.error})")
+if journal_store.revalidating:
+    st.caption("🔄 Menampilkan snapshot terakhir, sinkronisasi Google Sheets berjalan di background...")
+    watch_sync(journal_store.version)
+
 # Format function untuk separator ribuan
 def format_rupiah(angka):
     if pd.isna(angka) or angka == 0:
@@ -501,28 +575,178 @@ def format_rupiah(angka):
     except:
         return "Rp 0"
 
+# Tabel trade (Dashboard & All Trades)
+DISPLAY_COLS = ['Buy Date', 'Stock Code', 'Qty Lot', 'Price (Buy)', 'Value (Buy)',
+                'Possition', 'Current Price', 'Change %', 'P&L']
+DISPLAY_NAMES = {
+    "Buy Date": "📅 DATE",
+    "Stock Code": "📊 STOCK",
+    "Qty Lot": "🔢 LOT",
+    "Price (Buy)": "💰 BUY",
+    "Value (Buy)": "💵 VALUE",
+    "Possition": "📍 POS",
+    "Current Price": "💹 CURRENT",
+    "Change %": "📈 %",
+    "P&L": "💲 P&L"
+}
+
+PAGE_SIZES = [50, 100, 250]
+
+@st.cache_resource(max_entries=8)
+def trade_query(_df, version, view):
+    # Urutan sort + bitmap filter dibangun sekali per versi data (dan kolom tampilan)
+    return TradeQuery(_df)
+
+def open_trades(df, version, view):
+    # Posisi OPEN lewat bitmap yang disimpan bersama TradeQuery snapshot ini
+    return df[trade_query(df, version, view).mask('Possition', ['OPEN'])]
+
+def display_page(query, rows, page=0, page_size=PAGE_SIZES[0]):
+    # Hanya baris di halaman ini yang diformat dan dikirim ke browser
+    start = page * page_size
+    return format_frame(query.df.iloc[rows[start:start + page_size]], DISPLAY_COLS, DISPLAY_NAMES)
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def export_trades(_query, _rows, version, filters, sort_by, fmt):
+    # Baru jalan saat tombol download diklik; per versi data + filter + format cukup sekali
+    return export_bytes(_query.df.iloc[_rows], fmt)
+
+# Pilihan trade (Update & Delete): maksimal sekian opsi dikirim ke selectbox
+PICKER_LIMIT = 500
+
+@st.cache_resource(max_entries=8)
+def trade_picker(_df, version, value_col):
+    # Label + index pencarian dibangun sekali per versi data
+    return TradePicker(_df, value_col, key_col=ID_COL)
+
+def pick_trade(picker, label, key):
+    # Cari dulu (prefix kode saham / tanggal), selectbox hanya berisi hasilnya
+    query = st.text_input("🔍 Cari kode saham / tanggal", key=f"{key}_search",
+                          placeholder="BBCA, 02/01/24, 2024-01...")
+    keys, total = picker.search(query, PICKER_LIMIT)
+    if total > len(keys):
+        st.caption(f"Menampilkan {len(keys)} dari {total} transaksi, ketik untuk mempersempit")
+    elif not total:
+        st.caption(f"Tidak ada transaksi yang cocok dengan '{query}'")
+    # Nilai pilihan = Trade ID (stabil antar reload, label kembar tetap beda trade)
+    return st.selectbox(label, keys, format_func=picker.label, key=key)
+
+# =========================================================================
+# CHARTS
+# =========================================================================
+# Di atas jumlah posisi ini, P&L Distribution digabung per saham (tanpa label per bar)
+AGGREGATE_ABOVE = 300
+
+def pnl_bar(df_open, theme, labels=True):
+    pnl = df_open['P&L'].to_numpy(dtype='float64', na_value=np.nan)
+    return go.Bar(
+        x=df_open['Stock Code'],
+        y=pnl,
+        marker_color=np.where(pnl > 0, theme['positive'], theme['negative']),
+        text=format_rupiah_values(pnl) if labels else None,
+        textposition='outside',
+        textfont=dict(size=10, color=theme['text'])
+    )
+
+def status_pie(labels, values, colors, theme):
+    return go.Pie(
+        labels=labels,
+        values=values,
+        marker_colors=colors,
+        textinfo='label+percent',
+        textfont=dict(size=12, color=theme['text']),
+        hole=0.4
+    )
+
+@st.cache_resource(max_entries=64)
+def chart_figure(_df, version, view, theme_name, chart):
+    # Figure per (versi data, theme, chart); rerun tanpa perubahan tidak membangun ulang
+    theme = theme_options[theme_name]
+    df_open = open_trades(_df, version, view)
+    layout = dict(
+        template="plotly_dark",
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        font=dict(color=theme['text']),
+    )
+
+    if chart == "top_pnl":
+        chart_df = df_open.nlargest(10, 'P&L') if len(df_open) > 10 else df_open
+        fig = go.Figure(pnl_bar(chart_df, theme))
+        fig.update_layout(**layout, height=300, margin=dict(l=20, r=20, t=10, b=20),
+                          showlegend=False, xaxis_title="", yaxis_title="")
+    elif chart == "position_status":
+        position_open = len(df_open)
+        fig = go.Figure(status_pie(['OPEN', 'CLOSED'], [position_open, len(_df) - position_open],
+                                   [theme['accent'], theme['text_secondary']], theme))
+        fig.update_layout(**layout, height=300, margin=dict(l=20, r=20, t=10, b=20))
+    elif chart == "pnl_distribution":
+        if len(df_open) > AGGREGATE_ABOVE:
+            by_stock = df_open.groupby('Stock Code', observed=True, sort=False)['P&L'].sum().reset_index()
+            fig = go.Figure(pnl_bar(by_stock, theme, labels=len(by_stock) <= AGGREGATE_ABOVE))
+        else:
+            fig = go.Figure(pnl_bar(df_open, theme))
+        fig.update_layout(**layout, height=350, margin=dict(l=20, r=20, t=20, b=20), showlegend=False)
+    elif chart == "win_loss":
+        fig = go.Figure(status_pie(['WIN', 'LOSS'], [(df_open['P&L'] > 0).sum(), (df_open['P&L'] < 0).sum()],
+                                   [theme['positive'], theme['negative']], theme))
+        fig.update_layout(**layout, height=350, margin=dict(l=20, r=20, t=20, b=20))
+    else:
+        raise ValueError(f"Unknown chart: {chart}")
+    return fig
+
 # Update sidebar quick stats
 with st.sidebar:
     if not df.empty:
-        open_positions = len(df[df['Possition'].str.contains('Open|Floating', case=False, na=False)])
-        closed_positions = len(df[~df['Possition'].str.contains('Open|Floating', case=False, na=False)])
+        open_positions = trade_query(df, data_version, "sidebar").count('Possition', ['OPEN'])
         st.metric("🔓 Open Positions", open_positions)
-        st.metric("🔒 Closed Positions", closed_positions)
+        st.metric("🔒 Closed Positions", len(df) - open_positions)
         st.metric("📊 Total Trades", len(df))
     else:
         st.info("No trades yet")
+    
+    # Status write-behind queue
+    if 'flash' in st.session_state:
+        message, balloons = st.session_state.pop('flash')
+        st.success(message)
+        if balloons:
+            st.balloons()
+    write_ids = st.session_state.get('write_ids', [])
+    if write_ids:
+        write_states = [s for s in (get_write_queue(client).status.get(i) for i in write_ids) if s]
+        if any(s['state'] == 'pending' for s in write_states):
+            watch_writes()
+        else:
+            committed = sum(1 for s in write_states if s['state'] == 'committed')
+            if committed:
+                st.success(f"✅ {committed} perubahan tersimpan")
+            for s in write_states:
+                if s['state'] == 'failed':
+                    st.error(f"❌ Gagal menyimpan {s['label']}, perubahan dibatalkan: {s['error']}")
+            st.session_state.write_ids = []
+    
+    # Sisa kuota API bersama semua sesi
+    if JOURNAL_BACKEND == "sheets":
+        api = LIMITER.metrics()
+        st.caption(f"📡 Kuota API: {api['remaining']:.0f}/{api['capacity']} · "
+                   f"{api['calls']} call · {api['throttled']} kena 429 · {api['retries']} retry")
 
 # =========================================================================
 # TABS
 # =========================================================================
-tabs = st.tabs(["📊 DASHBOARD", "➕ ADD TRADE", "✏️ UPDATE", "📈 ANALYTICS", "🗑️ DELETE", "📋 ALL TRADES"])
+# Hanya tab yang sedang dibuka yang dijalankan; tiap tab fragment sendiri,
+# jadi widget di satu tab hanya merender ulang tab itu
+tabs = st.tabs(["📊 DASHBOARD", "➕ ADD TRADE", "✏️ UPDATE", "📈 ANALYTICS", "🗑️ DELETE", "📋 ALL TRADES"],
+               key="tab", on_change="rerun")
 
 # ==========================================
 # DASHBOARD
 # ==========================================
-with tabs[0]:
+@st.fragment
+def dashboard_tab():
+    df, view_version = view_data("dashboard")
     if not df.empty:
-        df_open = df[df['Possition'].str.contains('Open|Floating', case=False, na=False)]
+        df_open = open_trades(df, view_version, "dashboard")
         
         cols = st.columns(4)
         with cols[0]:
@@ -548,82 +772,19 @@ with tabs[0]:
         with col1:
             st.markdown("### 📊 Top 10 P&L")
             if not df_open.empty:
-                chart_df = df_open.nlargest(10, 'P&L') if len(df_open) > 10 else df_open
-                colors = [theme['positive'] if x > 0 else theme['negative'] for x in chart_df['P&L']]
-                
-                fig = go.Figure()
-                fig.add_trace(go.Bar(
-                    x=chart_df['Stock Code'],
-                    y=chart_df['P&L'],
-                    marker_color=colors,
-                    text=chart_df['P&L'].apply(lambda x: format_rupiah(x)),
-                    textposition='outside',
-                    textfont=dict(size=10, color=theme['text'])
-                ))
-                
-                fig.update_layout(
-                    template="plotly_dark",
-                    plot_bgcolor='rgba(0,0,0,0)',
-                    paper_bgcolor='rgba(0,0,0,0)',
-                    font=dict(color=theme['text']),
-                    height=300,
-                    margin=dict(l=20, r=20, t=10, b=20),
-                    showlegend=False,
-                    xaxis_title="",
-                    yaxis_title=""
-                )
+                fig = chart_figure(df, view_version, "dashboard", st.session_state.theme, "top_pnl")
                 st.plotly_chart(fig, use_container_width=True)
         
         with col2:
             st.markdown("### 🥧 Position Status")
-            position_open = len(df[df['Possition'].str.contains('Open|Floating', case=False, na=False)])
-            position_closed = len(df) - position_open
-            
-            if position_open + position_closed > 0:
-                fig = go.Figure(data=[go.Pie(
-                    labels=['OPEN', 'CLOSED'],
-                    values=[position_open, position_closed],
-                    marker_colors=[theme['accent'], theme['text_secondary']],
-                    textinfo='label+percent',
-                    textfont=dict(size=12, color=theme['text']),
-                    hole=0.4
-                )])
-                
-                fig.update_layout(
-                    template="plotly_dark",
-                    plot_bgcolor='rgba(0,0,0,0)',
-                    paper_bgcolor='rgba(0,0,0,0)',
-                    font=dict(color=theme['text']),
-                    height=300,
-                    margin=dict(l=20, r=20, t=10, b=20)
-                )
-                st.plotly_chart(fig, use_container_width=True)
+            fig = chart_figure(df, view_version, "dashboard", st.session_state.theme, "position_status")
+            st.plotly_chart(fig, use_container_width=True)
         
         st.divider()
         st.subheader("📋 RECENT TRADES")
         
-        display_cols = ['Buy Date', 'Stock Code', 'Qty Lot', 'Price (Buy)', 'Value (Buy)', 
-                        'Possition', 'Current Price', 'Change %', 'P&L']
-        df_display = df.head(10)[display_cols].copy()
-        
-        df_display['Buy Date'] = df_display['Buy Date'].apply(lambda x: x.strftime('%d/%m/%y') if pd.notna(x) else '-')
-        df_display['Price (Buy)'] = df_display['Price (Buy)'].apply(format_rupiah)
-        df_display['Value (Buy)'] = df_display['Value (Buy)'].apply(format_rupiah)
-        df_display['Current Price'] = df_display['Current Price'].apply(format_rupiah)
-        df_display['P&L'] = df_display['P&L'].apply(format_rupiah)
-        df_display['Change %'] = df_display['Change %'].apply(lambda x: f"{x:.1f}%")
-        
-        df_display = df_display.rename(columns={
-            "Buy Date": "📅 DATE",
-            "Stock Code": "📊 STOCK",
-            "Qty Lot": "🔢 LOT",
-            "Price (Buy)": "💰 BUY",
-            "Value (Buy)": "💵 VALUE",
-            "Possition": "📍 POS",
-            "Current Price": "💹 CURRENT",
-            "Change %": "📈 %",
-            "P&L": "💲 P&L"
-        })
+        query = trade_query(df, view_version, "dashboard")
+        df_display = display_page(query, query.select(), page_size=10)
 
         st.dataframe(
             df_display,
@@ -646,10 +807,15 @@ with tabs[0]:
     else:
         st.info("✨ Belum ada transaksi. Mulai dengan tab ADD TRADE")
 
+with tabs[0]:
+    if tabs[0].open:
+        dashboard_tab()
+
 # ==========================================
 # ADD TRADE - WITH CALCULATION
 # ==========================================
-with tabs[1]:
+@st.fragment
+def add_tab():
     st.subheader("➕ ADD NEW TRADE")
     
     with st.form("entry_form", clear_on_submit=True):
@@ -707,18 +873,6 @@ with tabs[1]:
                 st.error("❌ Buy price harus lebih dari 0!")
             else:
                 try:
-                    # Get all data to find next empty row
-                    all_values = worksheet.get_all_values()
-                    
-                    # Find first empty row starting from row 3
-                    next_row = 3
-                    for i, row in enumerate(all_values[2:], start=3):
-                        if not row or not row[0] or row[0].strip() == '':
-                            next_row = i
-                            break
-                    else:
-                        next_row = len(all_values) + 1
-                    
                     # Prepare new row data
                     new_row = [
                         buy_date.strftime("%Y-%m-%d"),
@@ -730,40 +884,34 @@ with tabs[1]:
                         "", "", "", ""
                     ]
                     
-                    with st.spinner("Saving to Google Sheets..."):
-                        # Update cell by cell to avoid deleting formulas
-                        for col_idx, value in enumerate(new_row, start=1):
-                            if value != "":
-                                col_letter = chr(64 + col_idx)
-                                worksheet.update(f'{col_letter}{next_row}', [[value]], value_input_option='USER_ENTERED')
-                        
-                        st.cache_data.clear()
-                        st.success(f"✅ {stock_code} berhasil ditambahkan!")
-                        st.balloons()
-                        time.sleep(1)
-                        st.rerun()
+                    # Masuk antrian; worker menulis satu batch_update ke baris kosong
+                    # berikutnya, sel kosong dilewati supaya formula tidak terhapus
+                    track_write(get_write_queue(client).append(new_row, label=stock_code))
+                    flash(f"✅ {stock_code} ditambahkan, menyimpan ke Google Sheets...", balloons=True)
+                    st.rerun()
                 except Exception as e:
                     st.error(f"❌ Error: {str(e)}")
 
+with tabs[1]:
+    if tabs[1].open:
+        add_tab()
+
 # ==========================================
 # UPDATE
 # ==========================================
-with tabs[2]:
+@st.fragment
+def update_tab():
+    df, view_version = view_data("update")
     st.subheader("✏️ UPDATE TRADE")
     
     if not df.empty:
-        options = [
-            f"{row['Stock Code']} - {row['Buy Date'].strftime('%d/%m/%y') if pd.notna(row['Buy Date']) else '-'} - {format_rupiah(row['Price (Buy)'])}" 
-            for _, row in df.iterrows()
-        ]
+        picker = trade_picker(df, view_version, 'Price (Buy)')
         
-        if options:
-            selected = st.selectbox("Pilih transaksi:", options)
+        if len(picker):
+            selected = pick_trade(picker, "Pilih transaksi:", "update_trade")
             
             if selected:
-                idx = options.index(selected)
-                row = df.iloc[idx]
-                gsheet_row = idx + 3  # +3 because: +1 for header, +1 for formula row, +1 for 0-indexing
+                row = df.iloc[picker.position[selected]]
                 
                 st.info(f"**Editing:** {row['Stock Code']} - Buy: {format_rupiah(row['Price (Buy)'])}")
                 
@@ -771,10 +919,7 @@ with tabs[2]:
                 
                 with col1:
                     current_pos = row['Possition']
-                    if 'Open' in str(current_pos) or 'Floating' in str(current_pos):
-                        pos_index = 0
-                    else:
-                        pos_index = 1
+                    pos_index = 0 if current_pos == 'OPEN' else 1
                     
                     new_position = st.selectbox(
                         "📍 Update Position",
@@ -790,14 +935,13 @@ with tabs[2]:
                 with col1:
                     if st.button("🔄 UPDATE", use_container_width=True, key="update_btn"):
                         try:
-                            with st.spinner("Updating..."):
-                                worksheet.update(f'J{gsheet_row}', [[new_position]], value_input_option='USER_ENTERED')
-                                worksheet.update(f'H{gsheet_row}', [[custom_date.strftime("%Y-%m-%d")]], value_input_option='USER_ENTERED')
-                                
-                                st.cache_data.clear()
-                                st.success("✅ Updated successfully!")
-                                time.sleep(1)
-                                st.rerun()
+                            # Kolom J (Possition) + H (Custom Date) digabung jadi satu tulis di antrian
+                            track_write(get_write_queue(client).update(selected, {
+                                "Possition": new_position,
+                                "Custom Date": custom_date.strftime("%Y-%m-%d"),
+                            }, label=row['Stock Code']))
+                            flash(f"✅ {row['Stock Code']} diupdate, menyimpan ke Google Sheets...")
+                            st.rerun()
                         except Exception as e:
                             st.error(f"❌ Error: {str(e)}")
                 with col2:
@@ -808,41 +952,27 @@ with tabs[2]:
     else:
         st.info("No transactions yet")
 
+with tabs[2]:
+    if tabs[2].open:
+        update_tab()
+
 # ==========================================
 # ANALYTICS
 # ==========================================
-with tabs[3]:
+@st.fragment
+def analytics_tab():
+    df, view_version = view_data("analytics")
     st.subheader("📈 ANALYTICS DASHBOARD")
     
     if not df.empty:
-        df_open = df[df['Possition'].str.contains('Open|Floating', case=False, na=False)]
+        df_open = open_trades(df, view_version, "analytics")
         
         if not df_open.empty:
             col1, col2 = st.columns(2)
             
             with col1:
                 st.markdown("### 📊 P&L Distribution")
-                fig = go.Figure()
-                colors = [theme['positive'] if x > 0 else theme['negative'] for x in df_open['P&L']]
-                
-                fig.add_trace(go.Bar(
-                    x=df_open['Stock Code'],
-                    y=df_open['P&L'],
-                    marker_color=colors,
-                    text=df_open['P&L'].apply(lambda x: format_rupiah(x)),
-                    textposition='outside',
-                    textfont=dict(size=10, color=theme['text'])
-                ))
-                
-                fig.update_layout(
-                    template="plotly_dark",
-                    plot_bgcolor='rgba(0,0,0,0)',
-                    paper_bgcolor='rgba(0,0,0,0)',
-                    font=dict(color=theme['text']),
-                    height=350,
-                    margin=dict(l=20, r=20, t=20, b=20),
-                    showlegend=False
-                )
+                fig = chart_figure(df, view_version, "analytics", st.session_state.theme, "pnl_distribution")
                 st.plotly_chart(fig, use_container_width=True)
             
             with col2:
@@ -851,23 +981,7 @@ with tabs[3]:
                 losses = (df_open['P&L'] < 0).sum()
                 
                 if wins + losses > 0:
-                    fig = go.Figure(data=[go.Pie(
-                        labels=['WIN', 'LOSS'],
-                        values=[wins, losses],
-                        marker_colors=[theme['positive'], theme['negative']],
-                        textinfo='label+percent',
-                        textfont=dict(size=12, color=theme['text']),
-                        hole=0.4
-                    )])
-                    
-                    fig.update_layout(
-                        template="plotly_dark",
-                        plot_bgcolor='rgba(0,0,0,0)',
-                        paper_bgcolor='rgba(0,0,0,0)',
-                        font=dict(color=theme['text']),
-                        height=350,
-                        margin=dict(l=20, r=20, t=20, b=20)
-                    )
+                    fig = chart_figure(df, view_version, "analytics", st.session_state.theme, "win_loss")
                     st.plotly_chart(fig, use_container_width=True)
             
             st.divider()
@@ -891,25 +1005,26 @@ with tabs[3]:
     else:
         st.info("Add trades to see analytics")
 
+with tabs[3]:
+    if tabs[3].open:
+        analytics_tab()
+
 # ==========================================
 # DELETE
 # ==========================================
-with tabs[4]:
+@st.fragment
+def delete_tab():
+    df, view_version = view_data("delete")
     st.subheader("🗑️ DELETE TRADE")
     
     if not df.empty:
-        options = [
-            f"{row['Stock Code']} - {row['Buy Date'].strftime('%d/%m/%y') if pd.notna(row['Buy Date']) else '-'} - {format_rupiah(row['Value (Buy)'])}" 
-            for _, row in df.iterrows()
-        ]
+        picker = trade_picker(df, view_version, 'Value (Buy)')
         
-        if options:
-            to_delete = st.selectbox("Select trade to delete:", options)
+        if len(picker):
+            to_delete = pick_trade(picker, "Select trade to delete:", "delete_trade")
             
             if to_delete:
-                idx = options.index(to_delete)
-                row = df.iloc[idx]
-                gsheet_row = idx + 3  # +3 because: +1 for header, +1 for formula row, +1 for 0-indexing
+                row = df.iloc[picker.position[to_delete]]
                 
                 st.warning(f"⚠️ PERMANENT DELETE: **{row['Stock Code']}**")
                 
@@ -917,12 +1032,9 @@ with tabs[4]:
                 with col1:
                     if st.button("🗑️ CONFIRM DELETE", use_container_width=True, key="delete_btn"):
                         try:
-                            with st.spinner("Deleting..."):
-                                worksheet.delete_rows(gsheet_row)
-                                st.cache_data.clear()
-                                st.success("✅ Deleted!")
-                                time.sleep(1)
-                                st.rerun()
+                            track_write(get_write_queue(client).delete(to_delete, label=row['Stock Code']))
+                            flash(f"✅ {row['Stock Code']} dihapus, menyimpan ke Google Sheets...")
+                            st.rerun()
                         except Exception as e:
                             st.error(f"❌ Error: {str(e)}")
                 with col2:
@@ -933,13 +1045,21 @@ with tabs[4]:
     else:
         st.info("No trades yet")
 
+with tabs[4]:
+    if tabs[4].open:
+        delete_tab()
+
 # ==========================================
 # ALL TRADES
 # ==========================================
-with tabs[5]:
+@st.fragment
+def all_trades_tab():
+    df, view_version = view_data("all_trades")
     st.subheader("📋 ALL TRADES")
     
     if not df.empty:
+        query = trade_query(df, view_version, "all_trades")
+        
         # Filters
         col1, col2, col3, col4 = st.columns(4)
         
@@ -953,7 +1073,7 @@ with tabs[5]:
         with col2:
             stock_filter = st.multiselect(
                 "Stock",
-                options=df['Stock Code'].unique().tolist()
+                options=query.values['Stock Code'].tolist()
             )
         
         with col3:
@@ -966,47 +1086,29 @@ with tabs[5]:
             st.write("")
             st.write("")
             if st.button("🔄 Refresh", use_container_width=True, key="refresh_all"):
-                st.cache_data.clear()
+                journal_store.invalidate()
                 st.rerun()
         
-        # Apply filters
-        filtered_df = df.copy()
-        
-        if position_filter:
-            filtered_df = filtered_df[filtered_df['Possition'].isin(position_filter)]
+        # Filter (bitmap) + sort (urutan siap pakai), tanpa menyalin tabel
+        rows = query.select({'Possition': position_filter, 'Stock Code': stock_filter}, sort_by)
+        total = len(rows)
         
-        if stock_filter:
-            filtered_df = filtered_df[filtered_df['Stock Code'].isin(stock_filter)]
-        
-        # Sort
-        filtered_df = filtered_df.sort_values(by=sort_by, ascending=False)
-        
-        st.markdown(f"**Showing {len(filtered_df)} trades**")
-        
-        # Display
-        display_cols = ['Buy Date', 'Stock Code', 'Qty Lot', 'Price (Buy)', 'Value (Buy)', 
-                        'Possition', 'Current Price', 'Change %', 'P&L']
-        df_display = filtered_df[display_cols].copy()
+        # Paging; halaman kembali dalam batas kalau filter mempersempit hasil
+        col1, col2, col3 = st.columns([1, 1, 3])
+        with col2:
+            page_size = st.selectbox("Rows", PAGE_SIZES, key="all_trades_rows")
+        pages = max(1, -(-total // page_size))
+        if st.session_state.get("all_trades_page", 1) > pages:
+            st.session_state.all_trades_page = pages
+        with col1:
+            page = st.number_input("Page", min_value=1, max_value=pages, step=1, key="all_trades_page")
         
-        df_display['Buy Date'] = df_display['Buy Date'].apply(lambda x: x.strftime('%d/%m/%y') if pd.notna(x) else '-')
-        df_display['Price (Buy)'] = df_display['Price (Buy)'].apply(format_rupiah)
-        df_display['Value (Buy)'] = df_display['Value (Buy)'].apply(format_rupiah)
-        df_display['Current Price'] = df_display['Current Price'].apply(format_rupiah)
-        df_display['P&L'] = df_display['P&L'].apply(format_rupiah)
-        df_display['Change %'] = df_display['Change %'].apply(lambda x: f"{x:.1f}%")
+        df_display = display_page(query, rows, page - 1, page_size)
+        first = (page - 1) * page_size
+        with col3:
+            st.write("")
+            st.markdown(f"**Showing {first + 1 if total else 0}-{first + len(df_display)} of {total} trades**")
         
-        df_display = df_display.rename(columns={
-            "Buy Date": "📅 DATE",
-            "Stock Code": "📊 STOCK",
-            "Qty Lot": "🔢 LOT",
-            "Price (Buy)": "💰 BUY",
-            "Value (Buy)": "💵 VALUE",
-            "Possition": "📍 POS",
-            "Current Price": "💹 CURRENT",
-            "Change %": "📈 %",
-            "P&L": "💲 P&L"
-        })
-
         st.dataframe(
             df_display,
             use_container_width=True,
@@ -1014,20 +1116,27 @@ with tabs[5]:
             height=500
         )
         
-        # Download button
-        col1, col2, col3 = st.columns([2, 1, 2])
+        # Download: file dibuat saat tombol diklik, bukan tiap rerun
+        col1, col2, col3, col4 = st.columns([2, 1, 1, 2])
         with col2:
-            csv = filtered_df.to_csv(index=False)
+            export_format = st.selectbox("Format", list(EXPORT_FORMATS), key="export_format",
+                                         label_visibility="collapsed")
+        with col3:
+            filter_key = (tuple(position_filter), tuple(stock_filter))
             st.download_button(
-                label="📥 Download CSV",
-                data=csv,
-                file_name=f"idx_trades_{datetime.now().strftime('%Y%m%d')}.csv",
-                mime="text/csv",
+                label="📥 Download",
+                data=lambda: export_trades(query, rows, view_version, filter_key, sort_by, export_format),
+                file_name=export_name(f"idx_trades_{datetime.now().strftime('%Y%m%d')}", export_format),
+                mime=EXPORT_FORMATS[export_format][1],
                 use_container_width=True
             )
     else:
         st.info("No trades yet")
 
+with tabs[5]:
+    if tabs[5].open:
+        all_trades_tab()
+
 # -----------------------------------------------------------------
 # FOOTER
 # -----------------------------------------------------------------
@@ -1038,4 +1147,5 @@ with col1:
 with col2:
     st.caption(f"📈 Total Stocks: {df['Stock Code'].nunique() if not df.empty else 0}")
 with col3:
-    st.caption(f"⚡ Last Update: {datetime.now().strftime('%H:%M:%S')}")
+    last_sync = datetime.fromtimestamp(journal_store.synced_at) if journal_store.synced_at else datetime.now()
+    st.caption(f"⚡ Last Update: {last_sync.strftime('%H:%M:%S')}")
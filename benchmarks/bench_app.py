@@ -0,0 +1,131 @@
+"""Benchmark: app reruns and journal data paths against the offline fake gspread.
+
+Usage:
+    python benchmarks/bench_app.py                           # 2k rows, no latency
+    python benchmarks/bench_app.py --rows 20000 --latency 0.15 --quota 60
+    python benchmarks/bench_app.py --apps app.py --error-rate 0.05
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+# Mirror Parquet jangan sampai menimpa cache lokal yang asli
+os.environ.setdefault("JOURNAL_MIRROR_DIR", tempfile.mkdtemp(prefix="bench_mirror_"))
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import streamlit as st  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+from fake_gspread import FakeClient, journal_rows, patch_gspread  # noqa: E402
+from journal_data import COLUMNS, FIRST_DATA_ROW, ID_COL, ID_COL_INDEX, INPUT_COL_INDEXES, parse_rows  # noqa: E402
+from journal_store import SheetsJournalStore  # noqa: E402
+from sheet_sync import SheetSync  # noqa: E402
+from sheet_writer import WriteQueue  # noqa: E402
+from sheets_client import LIMITER  # noqa: E402
+
+SPREADSHEET_ID = "bench"
+
+
+def make_client(args):
+    client = FakeClient(latency=args.latency, latency_per_cell=args.latency_per_cell,
+                        quota=args.quota, error_rate=args.error_rate, seed=args.seed)
+    client.create(SPREADSHEET_ID, journal_rows(args.rows, seed=args.seed, formula_row=True))
+    return client
+
+
+def measure(client, fn):
+    """(seconds, api calls, cells read, 429s) spent by fn()"""
+    client.reset_stats()
+    start = time.perf_counter()
+    try:
+        fn()
+    except Exception as e:
+        # 429 yang tidak ditangani app/store ikut tercatat, benchmark jalan terus
+        print(f"  ! {type(e).__name__}: {e}", file=sys.stderr)
+    return time.perf_counter() - start, client.total_calls, client.cells_read, client.throttled
+
+
+# -----------------------------------------------------------------
+# Jalur data (JournalStore Sheets) tanpa UI
+# -----------------------------------------------------------------
+def bench_store(args):
+    client = make_client(args)
+    open_ws = lambda: client.open_by_key(SPREADSHEET_ID).sheet1  # noqa: E731
+    sync = SheetSync(parse=parse_rows, width=len(COLUMNS), key_cols=INPUT_COL_INDEXES,
+                     first_row=FIRST_DATA_ROW, append_from=3, id_col=ID_COL_INDEX, id_header=ID_COL)
+    store = SheetsJournalStore(open_ws, sync)
+    new_trade = ["2024-06-03", "TLKM", 10, 3000] + [""] * 5 + ["OPEN"] + [""] * 5
+
+    results = [("store: cold load (full read)", measure(client, store.load))]
+    results.append(("store: warm load (delta, no change)", measure(client, store.load)))
+    results.append(("store: append", measure(client, lambda: store.append(new_trade))))
+    key = sync.df[ID_COL].iloc[len(sync.df) // 2]   # snapshot lokal, tanpa API call
+    results.append(("store: update", measure(client, lambda: store.update(key, {"Possition": "CLOSE"}))))
+    results.append(("store: delete", measure(client, lambda: store.delete(key))))
+
+    queue = WriteQueue(store, flush_delay=0.05, backoff=0.05)
+    keys = list(sync.df[ID_COL].iloc[:args.burst])
+
+    def burst():
+        for k in keys:
+            queue.update(k, {"Custom Date": "2024-07-01"})
+        queue.wait(timeout=120)
+
+    results.append((f"queue: {args.burst} updates coalesced", measure(client, burst)))
+    return results
+
+
+# -----------------------------------------------------------------
+# Rerun aplikasi end-to-end (AppTest)
+# -----------------------------------------------------------------
+def bench_app(app, args):
+    client = make_client(args)
+    st.cache_resource.clear()
+    st.cache_data.clear()
+    results = []
+    with patch_gspread(client):
+        at = AppTest.from_file(os.path.join(ROOT, app), default_timeout=args.timeout)
+        at.secrets["spreadsheet_id"] = SPREADSHEET_ID
+        at.secrets["gcp_service_account"] = {"type": "service_account"}
+        results.append((f"{app}: cold run", measure(client, at.run)))
+        for i in range(args.reruns):
+            results.append((f"{app}: warm rerun #{i + 1}", measure(client, at.run)))
+        if at.exception:
+            print(f"  ! {app}: {at.exception[0].value}", file=sys.stderr)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.0, help="detik per API call")
+    parser.add_argument("--latency-per-cell", type=float, default=0.0)
+    parser.add_argument("--quota", type=int, default=None, help="max call per menit (429 setelahnya)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraksi call yang kena 429 acak")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--burst", type=int, default=20)
+    parser.add_argument("--reruns", type=int, default=2)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--apps", nargs="*", default=["app.py", "claude_app.py", "testing_app.py"])
+    args = parser.parse_args()
+
+    results = bench_store(args)
+    for app in args.apps:
+        results += bench_app(app, args)
+
+    print(f"{'scenario':<42} {'time (s)':>9} {'calls':>6} {'cells read':>11} {'429s':>5}")
+    for name, (elapsed, calls, cells, throttled) in results:
+        print(f"{name:<42} {elapsed:>9.3f} {calls:>6} {cells:>11,} {throttled:>5}")
+
+    # Limiter bersama yang dipakai aplikasi (bukan jalur store di atas)
+    api = LIMITER.metrics()
+    print(f"\napp limiter: {api['calls']} calls, {api['throttled']} throttled, {api['retries']} retries, "
+          f"{api['failed']} failed, {api['waited']:.2f}s waiting for tokens")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Benchmark: vectorized journal parsing vs the old per-cell clean_number loader.
+
+Usage:
+    python benchmarks/bench_parsing.py                 # 10k, 100k, 1M rows
+    python benchmarks/bench_parsing.py --rows 50000 --repeat 5
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from journal_data import COLUMNS, DATE_COLS, NUMERIC_COLS, parse_rows  # noqa: E402
+
+
+# -----------------------------------------------------------------
+# Loader lama (per sel) sebagai pembanding
+# -----------------------------------------------------------------
+def legacy_clean_number(x):
+    if pd.isna(x) or x == '':
+        return 0.0
+    if isinstance(x, str):
+        x = x.replace('Rp', '').replace(',', '').replace('%', '').replace('.', '').strip()
+        if x in ['#N/A', '#ERROR!', 'No Data', '-', '']:
+            return 0.0
+    try:
+        return float(x)
+    except:
+        return 0.0
+
+
+def legacy_parse(rows):
+    df = pd.DataFrame(rows, columns=COLUMNS)
+    df = df[df['Stock Code'].astype(str).str.strip() != '']
+    for col in NUMERIC_COLS:
+        df[col] = df[col].apply(legacy_clean_number)
+    for col in DATE_COLS:
+        df[col] = pd.to_datetime(df[col], errors='coerce')
+    return df
+
+
+# -----------------------------------------------------------------
+# Data sintetis mirip isi sheet (teks hasil format Google Sheets)
+# -----------------------------------------------------------------
+def synthetic_rows(n, seed=0):
+    rng = np.random.default_rng(seed)
+    codes = np.array(['BBCA', 'BMRI', 'TLKM', 'ASII', 'BBRI', 'GOTO', 'ANTM', 'UNVR'])
+    buy = pd.Timestamp('2020-01-01') + pd.to_timedelta(rng.integers(0, 1500, n), unit='D')
+    qty = rng.integers(1, 200, n)
+    price = rng.integers(50, 12000, n) // 5 * 5
+    current = (price * rng.uniform(0.6, 1.6, n)).astype(int)
+    change = (current - price) / price * 100
+    pnl = (current - price) * qty * 100
+    errors = rng.random(n) < 0.02
+
+    buy_s = buy.strftime('%Y-%m-%d')
+    rows = []
+    for i in range(n):
+        rows.append([
+            buy_s[i], codes[i % len(codes)], str(qty[i]), f"{price[i]:,}",
+            f"Rp {price[i] * qty[i] * 100:,}", '2024-06-28',
+            '#N/A' if errors[i] else f"{current[i]:,}",
+            '', '', 'OPEN' if i % 3 else 'CLOSE',
+            '#N/A' if errors[i] else f"{change[i]:.2f}%",
+            '#N/A' if errors[i] else f"Rp {pnl[i]:,}",
+            '', '', f"{i:012X}",
+        ])
+    return rows
+
+
+def best_of(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'legacy (s)':>12} {'vectorized (s)':>15} {'speedup':>9}")
+    for n in args.rows:
+        rows = synthetic_rows(n)
+        numbers = range(2, 2 + n)
+        legacy = best_of(lambda: legacy_parse(rows), args.repeat)
+        vectorized = best_of(lambda: parse_rows(rows, numbers), args.repeat)
+        print(f"{n:>10,} {legacy:>12.3f} {vectorized:>15.3f} {legacy / vectorized:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,23 @@
 import streamlit as st
 import gspread
 from google.oauth2.service_account import Credentials
+from streamlit.errors import StreamlitSecretNotFoundError
 import pandas as pd
+import numpy as np
 from datetime import datetime, timedelta
 import plotly.graph_objects as go
 import plotly.express as px
 import time
+from functools import partial
+
+from journal_format import (TradePicker, format_dates, format_frame, format_number, format_percent,
+                            format_rupiah)
+from journal_export import EXPORT_FORMATS, export_bytes, export_name
+from journal_query import TradeQuery
+from journal_data import COLUMNS, FORMULA_COL_INDEXES, ID_COL, ID_COL_INDEX, INPUT_COL_INDEXES, categorize
+from journal_store import MultiJournalStore, SheetsJournalStore, open_store
+from sheet_sync import SheetSync
+from sheets_client import SheetsPool
 
 # Page config
 st.set_page_config(
@@ -221,8 +233,25 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+def secret(name, default=None):
+    """Secret value, or `default` when there is no secrets.toml (init_connection reports that)"""
+    try:
+        return st.secrets.get(name, default)
+    except StreamlitSecretNotFoundError:
+        return default
+
+# Journal backend: "sheets" (default), or local "sqlite" / "parquet" (path in journal_path)
+JOURNAL_BACKEND = secret("journal_backend", "sheets")
+# One poller per process refreshes the journal snapshot for every session (seconds)
+POLL_SECONDS = secret("journal_poll_seconds", 30)
+
+def close_resource(resource):
+    """Stop the background threads of a resource dropped from the cache"""
+    if resource is not None:
+        resource.close()
+
 # Initialize connection to Google Sheets
-@st.cache_resource
+@st.cache_resource(on_release=close_resource)
 def init_connection():
     """Initialize connection to Google Sheets"""
     try:
@@ -233,81 +262,101 @@ def init_connection():
                 "https://www.googleapis.com/auth/drive"
             ]
         )
-        client = gspread.authorize(credentials)
-        return client
+        # One pooled client per process: cached spreadsheet/worksheet handles,
+        # background token refresh, all API calls through the shared limiter
+        return SheetsPool(credentials)
     except Exception as e:
         st.error(f"Error connecting to Google Sheets: {e}")
         return None
 
-@st.cache_data(ttl=60)
-def load_data(_client):
-    """Load data from Google Sheets with caching"""
+def parse_trade_rows(rows, row_numbers):
+    """Parse raw sheet rows into a typed DataFrame indexed by sheet row"""
+    # Filter out empty rows (where Buy Date is empty)
+    pairs = [(row, n) for row, n in zip(rows, row_numbers) if row and row[0].strip()]
+    
+    # If no data rows, return empty DataFrame with headers
+    if not pairs:
+        return categorize(pd.DataFrame(columns=COLUMNS))
+    
+    df = pd.DataFrame(
+        [row for row, _ in pairs],
+        columns=COLUMNS,
+        index=pd.Index([n for _, n in pairs], name='Row')
+    )
+    
+    # Convert date columns
+    date_columns = ['Buy Date', 'Current Date', 'Custom Date']
+    for col in date_columns:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], errors='coerce')
+    
+    # Convert numeric columns
+    numeric_columns = ['Qty Lot', 'Price (Buy)', 'Value (Buy)', 'Current Price', 
+                      'Custom Price', 'Change %', 'P&L', 'Change % (Custom)', 'P&L (Custom)']
+    for col in numeric_columns:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+    
+    # Position as OPEN/CLOSE categories, Stock Code as category
+    return categorize(df)
+
+@st.cache_resource
+def get_journal_sync(spreadsheet_id, worksheet=None):
+    """Per-process snapshot of one worksheet, used for incremental (delta) syncs"""
+    return SheetSync(parse=parse_trade_rows, width=len(COLUMNS), key_cols=INPUT_COL_INDEXES,
+                     id_col=ID_COL_INDEX, id_header=ID_COL, formula_cols=FORMULA_COL_INDEXES)
+
+@st.cache_resource(on_release=close_resource)
+def get_journal_store(_client):
+    """JournalStore for the configured backend; every read and write goes through it"""
+    if JOURNAL_BACKEND != "sheets":
+        return open_store(JOURNAL_BACKEND, path=st.secrets.get("journal_path"))
+    # Several journals (one worksheet per year / one spreadsheet per account) via
+    # secrets journal_sources = [{name, spreadsheet_id, worksheet}]; new trades go to the first
+    sources = st.secrets.get("journal_sources")
+    if not sources:
+        return open_sheets_journal(_client, st.secrets["spreadsheet_id"])
+    members = {}
+    for source in sources:
+        spreadsheet_id = source.get("spreadsheet_id", st.secrets.get("spreadsheet_id"))
+        name = source.get("name") or source.get("worksheet") or spreadsheet_id
+        members[name] = open_sheets_journal(_client, spreadsheet_id, source.get("worksheet"))
+    return MultiJournalStore(members)
+
+def open_sheets_journal(client, spreadsheet_id, worksheet=None):
+    """Sheets JournalStore for one worksheet (None = first sheet)"""
+    return open_store("sheets", open_ws=lambda: client.worksheet(spreadsheet_id, worksheet),
+                      sync=get_journal_sync(spreadsheet_id, worksheet), poll_every=POLL_SECONDS)
+
+def journal_key():
+    """Identifies the configured journal in cache keys"""
+    if JOURNAL_BACKEND == "sheets":
+        return f"sheets:{st.secrets.get('spreadsheet_id', '')}"
+    return f"{JOURNAL_BACKEND}:{st.secrets.get('journal_path', '')}"
+
+@st.cache_data(ttl=60, max_entries=8)
+def load_data(_client, journal, version):
+    """Load journal data, cached per (journal, store version)"""
     try:
-        sheet = _client.open_by_key(st.secrets["spreadsheet_id"]).sheet1
-        
-        # Get all data
-        all_data = sheet.get_all_values()
+        # Sheets: returns the snapshot published by the background poller (delta syncs)
+        store = get_journal_store(_client)
+        df = store.load(max_age=POLL_SECONDS)
+        if not isinstance(store, SheetsJournalStore):
+            return df
         
         # Check if sheet has data
-        if not all_data:
+        if not store.sync.header:
             st.warning("⚠️ Google Sheet is empty. Please add headers first.")
             return pd.DataFrame()
         
-        # Check if header row exists
-        if len(all_data) < 1:
-            st.warning("⚠️ No header row found in Google Sheet.")
-            return pd.DataFrame()
-        
-        # Get headers
-        headers = all_data[0]
-        
-        # Expected headers
-        expected_headers = ['Buy Date', 'Stock Code', 'Qty Lot', 'Price (Buy)', 'Value (Buy)', 
-                          'Current Date', 'Current Price', 'Custom Date', 'Custom Price', 
-                          'Possition', 'Change %', 'P&L', 'Change % (Custom)', 'P&L (Custom)']
-        
-        # Check if we have enough columns
-        if len(headers) < len(expected_headers):
-            st.error(f"⚠️ Google Sheet hanya punya {len(headers)} kolom. Seharusnya {len(expected_headers)} kolom.")
+        # Check if we have enough columns (the Trade ID column is added by the app itself)
+        headers = store.sync.header
+        if len(headers) < ID_COL_INDEX:
+            st.error(f"⚠️ Google Sheet hanya punya {len(headers)} kolom. Seharusnya {ID_COL_INDEX} kolom.")
             st.error(f"Headers yang ada: {headers}")
-            st.error(f"Headers yang dibutuhkan: {expected_headers}")
+            st.error(f"Headers yang dibutuhkan: {COLUMNS[:ID_COL_INDEX]}")
             return pd.DataFrame()
         
-        # Get data rows (skip header)
-        data_rows = all_data[1:]
-        
-        # Filter out empty rows (where Buy Date is empty)
-        data_rows = [row for row in data_rows if row and len(row) > 0 and row[0].strip()]
-        
-        # If no data rows, return empty DataFrame with headers
-        if not data_rows:
-            return pd.DataFrame(columns=expected_headers)
-        
-        # Ensure all rows have the same number of columns
-        normalized_rows = []
-        for row in data_rows:
-            # Pad row with empty strings if it's too short
-            while len(row) < len(expected_headers):
-                row.append('')
-            # Trim row if it's too long
-            normalized_rows.append(row[:len(expected_headers)])
-        
-        # Create DataFrame
-        df = pd.DataFrame(normalized_rows, columns=expected_headers)
-        
-        # Convert date columns
-        date_columns = ['Buy Date', 'Current Date', 'Custom Date']
-        for col in date_columns:
-            if col in df.columns:
-                df[col] = pd.to_datetime(df[col], errors='coerce')
-        
-        # Convert numeric columns
-        numeric_columns = ['Qty Lot', 'Price (Buy)', 'Value (Buy)', 'Current Price', 
-                          'Custom Price', 'Change %', 'P&L', 'Change % (Custom)', 'P&L (Custom)']
-        for col in numeric_columns:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-        
         return df
         
     except gspread.exceptions.SpreadsheetNotFound:
@@ -328,25 +377,11 @@ def load_data(_client):
         return pd.DataFrame()
 
 def add_trade(client, buy_date, stock_code, qty_lot, price_buy):
-    """Add new trade to Google Sheets"""
+    """Add new trade to the journal"""
     try:
-        sheet = client.open_by_key(st.secrets["spreadsheet_id"]).sheet1
-        
         # Format date as string
         buy_date_str = buy_date.strftime('%Y-%m-%d')
         
-        # Find the next empty row (skip rows with formulas but no Buy Date)
-        all_values = sheet.get_all_values()
-        next_row = 2  # Start from row 2 (after header)
-        
-        for i, row in enumerate(all_values[1:], start=2):  # Skip header
-            if not row[0]:  # If Buy Date (column A) is empty
-                next_row = i
-                break
-        else:
-            # If all rows have data, append at the end
-            next_row = len(all_values) + 1
-        
         # Prepare row data
         row = [
             buy_date_str,
@@ -365,44 +400,41 @@ def add_trade(client, buy_date, stock_code, qty_lot, price_buy):
             ""   # P&L (Custom)
         ]
         
-        # Insert at the correct row
-        sheet.insert_row(row, next_row)
+        # Written into the next empty row (column A blank), same as before
+        # but without re-reading the whole sheet to find it
+        get_journal_store(client).append(row)
         
-        st.cache_data.clear()  # Clear cache to reload data
         return True
     except Exception as e:
         st.error(f"Error adding trade: {e}")
         return False
 
-def update_trade(client, row_index, column_name, new_value):
-    """Update specific cell in Google Sheets"""
+def update_trade(client, trade_id, column_name, new_value):
+    """Update one column of a trade, addressed by its Trade ID"""
     try:
-        sheet = client.open_by_key(st.secrets["spreadsheet_id"]).sheet1
-        
-        # Get header row to find column index
-        headers = sheet.row_values(1)
-        col_index = headers.index(column_name) + 1
-        
-        # Update cell (row_index + 2 because: +1 for header, +1 for 0-indexing)
-        sheet.update_cell(row_index + 2, col_index, new_value)
-        st.cache_data.clear()
+        get_journal_store(client).update(trade_id, {column_name: new_value})
         return True
     except Exception as e:
         st.error(f"Error updating trade: {e}")
         return False
 
-def delete_trade(client, row_index):
-    """Delete trade from Google Sheets"""
+def delete_trade(client, trade_id):
+    """Delete trade from the journal"""
     try:
-        sheet = client.open_by_key(st.secrets["spreadsheet_id"]).sheet1
-        # Delete row (row_index + 2 because: +1 for header, +1 for 0-indexing)
-        sheet.delete_rows(row_index + 2)
-        st.cache_data.clear()
+        get_journal_store(client).delete(trade_id)
         return True
     except Exception as e:
         st.error(f"Error deleting trade: {e}")
         return False
 
+def refresh_journal(client):
+    """Re-read the journal from its backend; only this journal's cache entry goes stale"""
+    store = get_journal_store(client)
+    store.invalidate()
+    if client is not None:
+        client.forget()
+    store.load()
+
 def format_currency(value):
     """Format number as Indonesian Rupiah"""
     if pd.isna(value):
@@ -415,6 +447,58 @@ def format_percentage(value):
         return "0.00%"
     return f"{value:.2f}%"
 
+# Table display: same text as format_currency / format_percentage, built per column
+DISPLAY_FORMATS = {
+    'Buy Date': partial(format_dates, fmt='%Y-%m-%d'),
+    'Price (Buy)': partial(format_number, sep=',', missing='-'),
+    'Current Price': partial(format_number, sep=',', missing='-'),
+    'Custom Price': partial(format_number, sep=',', missing='-'),
+    'Change %': partial(format_percent, missing='0.00%', decimals=2),
+    'Change % (Custom)': partial(format_percent, missing='0.00%', decimals=2),
+    'P&L': partial(format_rupiah, sep=','),
+    'P&L (Custom)': partial(format_rupiah, sep=','),
+}
+POSITIVE_STYLE = 'background-color: #d4edda; color: #155724; font-weight: 600'
+NEGATIVE_STYLE = 'background-color: #f8d7da; color: #721c24; font-weight: 600'
+PAGE_SIZES = [50, 100, 250]
+
+def styled_trades(rows, columns, colored):
+    """Formatted `columns` of `rows`, colored green/red by the sign of the numeric `colored` columns"""
+    display = format_frame(rows, columns, formats=DISPLAY_FORMATS)
+    values = rows[colored].to_numpy(dtype='float64', na_value=np.nan)
+    styles = pd.DataFrame('', index=display.index, columns=display.columns)
+    styles[colored] = np.where(values > 0, POSITIVE_STYLE, np.where(values < 0, NEGATIVE_STYLE, ''))
+    return display.style.apply(lambda _: styles, axis=None)
+
+@st.cache_resource(max_entries=8)
+def trade_query(_df, journal, version):
+    """Presorted / bitmap-filtered view of the journal, built once per (journal, store version)"""
+    return TradeQuery(_df)
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def export_trades(_query, _rows, journal, version, filters, sort_by, fmt):
+    """Export file of the selected rows; built when Download is clicked, once per (data, filters, format)"""
+    return export_bytes(_query.df.iloc[_rows], fmt)
+
+# Trade picker (Update / Delete): at most this many options go to the selectbox
+PICKER_LIMIT = 500
+
+@st.cache_resource(max_entries=8)
+def trade_picker(_df, journal, version, value_col=None):
+    """Trade labels + prefix search index, built once per (journal, store version)"""
+    return TradePicker(_df, value_col, key_col=ID_COL, date_fmt='%Y-%m-%d')
+
+def pick_trade(picker, label, key):
+    """Search box + selectbox over the matching trades; returns the chosen Trade ID"""
+    query = st.text_input("🔍 Search stock code / date", key=f"{key}_search",
+                          placeholder="BBCA, 2024-01...")
+    keys, total = picker.search(query, PICKER_LIMIT)
+    if total > len(keys):
+        st.caption(f"Showing {len(keys)} of {total} trades, type to narrow down")
+    elif not total:
+        st.caption(f"No trades match '{query}'")
+    return st.selectbox(label, keys, format_func=picker.label, key=key)
+
 # Main App
 def main():
     # Header with refresh button
@@ -422,27 +506,31 @@ def main():
     with col1:
         st.markdown("# 📈 IDX Trading Journal")
     with col2:
-        if st.button("🔄 Refresh", use_container_width=True):
-            st.cache_data.clear()
-            st.rerun()
+        refresh_clicked = st.button("🔄 Refresh", use_container_width=True)
     
     st.markdown("### Backtesting & Portfolio Management")
     
     # Initialize connection
-    client = init_connection()
-    if client is None:
+    client = init_connection() if JOURNAL_BACKEND == "sheets" else None
+    if JOURNAL_BACKEND == "sheets" and client is None:
         st.error("⚠️ Failed to connect to Google Sheets. Please check your credentials.")
         return
     
-    # Load data
-    df = load_data(client)
+    if refresh_clicked:
+        refresh_journal(client)
+    
+    # Load data (writes bump the store version, so the next call misses the cache)
+    version = get_journal_store(client).version
+    df = load_data(client, journal_key(), version)
+    # Filter / sort / position bitmaps, built once per data version and shared by every tab
+    query = trade_query(df, journal_key(), version)
     
     # Sidebar - Quick Stats Only
     with st.sidebar:
         st.markdown("### 📌 Quick Stats")
         if not df.empty:
-            open_positions = len(df[df['Possition'] == 'OPEN'])
-            closed_positions = len(df[df['Possition'] == 'CLOSE'])
+            open_positions = query.count('Possition', ['OPEN'])
+            closed_positions = query.count('Possition', ['CLOSE'])
             st.metric("Open Positions", open_positions)
             st.metric("Closed Positions", closed_positions)
             st.metric("Total Trades", len(df))
@@ -481,7 +569,7 @@ def main():
                      delta=format_percentage(df['Change %'].mean()))
         
         with col3:
-            open_trades = len(df[df['Possition'] == 'OPEN'])
+            open_trades = query.count('Possition', ['OPEN'])
             st.metric("🔓 Open", open_trades)
         
         with col4:
@@ -533,53 +621,13 @@ def main():
         
         # Recent Trades with color coding
         st.markdown("### 📋 Recent Trades")
-        recent_df = df.head(10).copy()
+        recent_df = df.head(10)
         
-        # Format display columns
-        display_df = recent_df[[
+        # Colors come from the numeric P&L / Change % values, not the formatted text
+        styled_df = styled_trades(recent_df, [
             'Buy Date', 'Stock Code', 'Qty Lot', 'Price (Buy)', 
             'Current Price', 'Change %', 'P&L', 'Possition'
-        ]].copy()
-        
-        # Format columns
-        display_df['Buy Date'] = display_df['Buy Date'].dt.strftime('%Y-%m-%d')
-        display_df['Price (Buy)'] = display_df['Price (Buy)'].apply(lambda x: f"{x:,.0f}" if pd.notna(x) else "-")
-        display_df['Current Price'] = display_df['Current Price'].apply(lambda x: f"{x:,.0f}" if pd.notna(x) else "-")
-        display_df['Change %'] = display_df['Change %'].apply(format_percentage)
-        display_df['P&L'] = display_df['P&L'].apply(format_currency)
-        
-        # Apply color styling using pandas Styler
-        def color_pnl(val):
-            """Color code P&L values"""
-            if 'Rp' in str(val):
-                # Extract number from formatted string
-                num_str = str(val).replace('Rp', '').replace(',', '').replace(' ', '')
-                try:
-                    num = float(num_str)
-                    if num > 0:
-                        return 'background-color: #d4edda; color: #155724; font-weight: 600'
-                    elif num < 0:
-                        return 'background-color: #f8d7da; color: #721c24; font-weight: 600'
-                except:
-                    pass
-            return ''
-        
-        def color_change(val):
-            """Color code Change % values"""
-            if '%' in str(val):
-                num_str = str(val).replace('%', '').replace(',', '')
-                try:
-                    num = float(num_str)
-                    if num > 0:
-                        return 'background-color: #d4edda; color: #155724; font-weight: 600'
-                    elif num < 0:
-                        return 'background-color: #f8d7da; color: #721c24; font-weight: 600'
-                except:
-                    pass
-            return ''
-        
-        # Apply styling
-        styled_df = display_df.style.applymap(color_pnl, subset=['P&L']).applymap(color_change, subset=['Change %'])
+        ], ['P&L', 'Change %'])
         
         st.dataframe(styled_df, use_container_width=True, hide_index=True, height=400)
     
@@ -642,12 +690,12 @@ def main():
             return
         
         # Select trade to update
-        trade_options = [f"{row['Stock Code']} - {row['Buy Date']}" for _, row in df.iterrows()]
-        selected_trade = st.selectbox("Select Trade to Update", trade_options)
+        picker = trade_picker(df, journal_key(), version)
+        selected_trade = pick_trade(picker, "Select Trade to Update", "update_trade")
         
         if selected_trade:
-            trade_index = trade_options.index(selected_trade)
-            trade = df.iloc[trade_index]
+            trade = df.iloc[picker.position[selected_trade]]
+            trade_id = trade[ID_COL]
             
             st.markdown(f"### Updating: {trade['Stock Code']}")
             
@@ -677,7 +725,7 @@ def main():
                     )
                     
                     if st.form_submit_button("💾 Update Position", use_container_width=True):
-                        if update_trade(client, trade_index, 'Possition', new_position):
+                        if update_trade(client, trade_id, 'Possition', new_position):
                             st.success("✅ Position updated successfully!")
                             st.rerun()
                 
@@ -689,7 +737,7 @@ def main():
                     
                     if st.form_submit_button("💾 Update Custom Date", use_container_width=True):
                         date_str = custom_date.strftime('%Y-%m-%d')
-                        if update_trade(client, trade_index, 'Custom Date', date_str):
+                        if update_trade(client, trade_id, 'Custom Date', date_str):
                             st.success("✅ Custom date updated successfully!")
                             st.rerun()
                 
@@ -702,7 +750,7 @@ def main():
                     )
                     
                     if st.form_submit_button("💾 Update Quantity", use_container_width=True):
-                        if update_trade(client, trade_index, 'Qty Lot', new_qty):
+                        if update_trade(client, trade_id, 'Qty Lot', new_qty):
                             st.success("✅ Quantity updated successfully!")
                             st.rerun()
                 
@@ -716,7 +764,7 @@ def main():
                     )
                     
                     if st.form_submit_button("💾 Update Price", use_container_width=True):
-                        if update_trade(client, trade_index, 'Price (Buy)', new_price):
+                        if update_trade(client, trade_id, 'Price (Buy)', new_price):
                             st.success("✅ Price updated successfully!")
                             st.rerun()
     
@@ -731,13 +779,12 @@ def main():
         st.warning("⚠️ Warning: This action cannot be undone!")
         
         # Select trade to delete
-        trade_options = [f"{row['Stock Code']} - {row['Buy Date']} - {row['Possition']}" 
-                        for _, row in df.iterrows()]
-        selected_trade = st.selectbox("Select Trade to Delete", trade_options)
+        picker = trade_picker(df, journal_key(), version, 'Possition')
+        selected_trade = pick_trade(picker, "Select Trade to Delete", "delete_trade")
         
         if selected_trade:
-            trade_index = trade_options.index(selected_trade)
-            trade = df.iloc[trade_index]
+            trade = df.iloc[picker.position[selected_trade]]
+            trade_id = trade[ID_COL]
             
             # Show trade details
             st.markdown("### Trade Details")
@@ -756,7 +803,7 @@ def main():
             col1, col2 = st.columns([1, 3])
             with col1:
                 if st.button("🗑️ Delete Trade", type="primary", use_container_width=True):
-                    if delete_trade(client, trade_index):
+                    if delete_trade(client, trade_id):
                         st.success("✅ Trade deleted successfully!")
                         st.rerun()
             with col2:
@@ -784,7 +831,7 @@ def main():
         with col2:
             stock_filter = st.multiselect(
                 "Stock",
-                options=df['Stock Code'].unique().tolist()
+                options=query.values['Stock Code'].tolist()
             )
         
         with col3:
@@ -797,72 +844,49 @@ def main():
             st.write("")
             st.write("")
             if st.button("🔄 Refresh Data", use_container_width=True):
-                st.cache_data.clear()
+                refresh_journal(client)
                 st.rerun()
         
-        # Apply filters
-        filtered_df = df.copy()
-        
-        if position_filter:
-            filtered_df = filtered_df[filtered_df['Possition'].isin(position_filter)]
-        
-        if stock_filter:
-            filtered_df = filtered_df[filtered_df['Stock Code'].isin(stock_filter)]
+        # Filter + sort on the prebuilt query (bitmaps and presorted row orders)
+        rows = query.select({'Possition': position_filter, 'Stock Code': stock_filter}, sort_by)
         
-        # Sort
-        filtered_df = filtered_df.sort_values(by=sort_by, ascending=False)
-        
-        # Display count
-        st.markdown(f"**Showing {len(filtered_df)} trades**")
+        # Only one page is formatted and styled (Styler cost grows with every cell sent)
+        col1, col2, col3 = st.columns([1, 1, 3])
+        with col2:
+            page_size = st.selectbox("Rows", PAGE_SIZES, key="all_trades_rows")
+        pages = max(1, -(-len(rows) // page_size))
+        if st.session_state.get("all_trades_page", 1) > pages:
+            st.session_state.all_trades_page = pages
+        with col1:
+            page = st.number_input("Page", min_value=1, max_value=pages, step=1, key="all_trades_page")
+        start = (page - 1) * page_size
+        page_df = query.df.iloc[rows[start:start + page_size]]
+        with col3:
+            st.write("")
+            st.markdown(f"**Showing {start + 1 if len(rows) else 0}-{start + len(page_df)} of {len(rows)} trades**")
         
-        # Format for display
-        display_df = filtered_df[[
+        colored = ['Change %', 'P&L', 'Change % (Custom)', 'P&L (Custom)']
+        styled_df = styled_trades(page_df, [
             'Buy Date', 'Stock Code', 'Qty Lot', 'Price (Buy)', 
             'Current Price', 'Custom Price', 'Change %', 'P&L', 
             'Change % (Custom)', 'P&L (Custom)', 'Possition'
-        ]].copy()
-        
-        # Format columns
-        display_df['Buy Date'] = display_df['Buy Date'].dt.strftime('%Y-%m-%d')
-        display_df['Price (Buy)'] = display_df['Price (Buy)'].apply(lambda x: f"{x:,.0f}" if pd.notna(x) else "-")
-        display_df['Current Price'] = display_df['Current Price'].apply(lambda x: f"{x:,.0f}" if pd.notna(x) else "-")
-        display_df['Custom Price'] = display_df['Custom Price'].apply(lambda x: f"{x:,.0f}" if pd.notna(x) else "-")
-        display_df['Change %'] = display_df['Change %'].apply(format_percentage)
-        display_df['P&L'] = display_df['P&L'].apply(format_currency)
-        display_df['Change % (Custom)'] = display_df['Change % (Custom)'].apply(format_percentage)
-        display_df['P&L (Custom)'] = display_df['P&L (Custom)'].apply(format_currency)
-        
-        # Apply color styling
-        def color_numeric(val):
-            """Color code numeric values"""
-            if 'Rp' in str(val) or '%' in str(val):
-                num_str = str(val).replace('Rp', '').replace('%', '').replace(',', '').replace(' ', '')
-                try:
-                    num = float(num_str)
-                    if num > 0:
-                        return 'background-color: #d4edda; color: #155724; font-weight: 600'
-                    elif num < 0:
-                        return 'background-color: #f8d7da; color: #721c24; font-weight: 600'
-                except:
-                    pass
-            return ''
-        
-        styled_df = display_df.style.applymap(
-            color_numeric, 
-            subset=['Change %', 'P&L', 'Change % (Custom)', 'P&L (Custom)']
-        )
+        ], colored)
         
         st.dataframe(styled_df, use_container_width=True, hide_index=True, height=500)
         
-        # Download button
-        col1, col2, col3 = st.columns([2, 1, 2])
+        # Download button: the file is only generated when clicked, not on every rerun
+        col1, col2, col3, col4 = st.columns([2, 1, 1, 2])
         with col2:
-            csv = filtered_df.to_csv(index=False)
+            export_format = st.selectbox("Format", list(EXPORT_FORMATS), key="export_format",
+                                         label_visibility="collapsed")
+        with col3:
+            filter_key = (tuple(position_filter), tuple(stock_filter))
             st.download_button(
-                label="📥 Download CSV",
-                data=csv,
-                file_name=f"idx_trades_{datetime.now().strftime('%Y%m%d')}.csv",
-                mime="text/csv",
+                label="📥 Download",
+                data=lambda: export_trades(query, rows, journal_key(), version, filter_key, sort_by,
+                                           export_format),
+                file_name=export_name(f"idx_trades_{datetime.now().strftime('%Y%m%d')}", export_format),
+                mime=EXPORT_FORMATS[export_format][1],
                 use_container_width=True
             )
 
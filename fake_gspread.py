@@ -0,0 +1,466 @@
+"""In-process stand-in for the gspread client, for profiling without network.
+
+Implements the gspread calls the apps use (open_by_key, sheet1, get_all_values,
+get_all_records, row_values, batch_get, batch_update, update, update_cell,
+insert_row, append_row, delete_rows, spreadsheet.batch_update) on an in-memory
+grid. Every call is counted, can be slowed down by a configurable latency and
+can fail with a 429 like the real Sheets quota. Values writes past the
+worksheet's row count fail with a 400 like the real grid limit (new sheets
+have 1000 rows; append_row, insert_row and add_rows grow it). Opening a spreadsheet and every
+worksheet lookup (sheet1, worksheet, worksheets, get_worksheet*) count as one
+fetch_sheet_metadata call each, as they do in gspread 5.x. Formula columns (Value (Buy),
+Current Price, Change %, P&L, ...) are filled in on read the way the journal
+sheet formulas do, with deterministic fake prices instead of GOOGLEFINANCE.
+"""
+import collections
+import contextlib
+import hashlib
+import itertools
+import json
+import math
+import random
+import threading
+import time
+from datetime import date, timedelta
+
+import requests
+from gspread.exceptions import APIError, WorksheetNotFound
+from gspread.utils import a1_range_to_grid_range, rowcol_to_a1
+
+from journal_data import COLUMNS, ID_COL, new_trade_id, normalize_row
+
+WIDTH = len(COLUMNS)
+DEFAULT_ROWS = 1000     # ukuran grid sheet baru di Google Sheets
+_COL = {c: i for i, c in enumerate(COLUMNS)}
+
+
+def api_error(code, message, status):
+    """APIError shaped like the one gspread raises for an HTTP error reply"""
+    response = requests.Response()
+    response.status_code = code
+    response._content = json.dumps({"error": {
+        "code": code, "message": message, "status": status,
+    }}).encode()
+    return APIError(response)
+
+
+def quota_error(message="Quota exceeded for quota metric 'Read requests'"):
+    return api_error(429, message, "RESOURCE_EXHAUSTED")
+
+
+# =========================================================================
+# FORMULA SHEET (harga palsu tapi deterministik)
+# =========================================================================
+def fake_price(code, day):
+    """Deterministic pseudo price for a stock code on a given day, IDX tick of 5"""
+    h = int.from_bytes(hashlib.blake2b(code.encode(), digest_size=4).digest(), 'big')
+    base = 100 + h % 9900
+    drift = 0.2 * math.sin(day.toordinal() / 30 + h)
+    return max(5, int(round(base * (1 + drift) / 5)) * 5)
+
+
+def _number(text):
+    return float(str(text).replace('Rp', '').replace(',', '').strip())
+
+
+def _rupiah(value):
+    return f"Rp {value:,.0f}"
+
+
+def formula_values(row, today):
+    """Fill the formula cells of one raw row (only where the cell is still empty)"""
+    row = list(row)
+    code = str(row[_COL["Stock Code"]]).strip()
+    if not code:
+        return row
+    out = {}
+    try:
+        qty, buy = _number(row[_COL["Qty Lot"]]), _number(row[_COL["Price (Buy)"]])
+    except ValueError:
+        qty = buy = None
+    out["Value (Buy)"] = _rupiah(qty * 100 * buy) if buy is not None else "#VALUE!"
+    out["Current Date"] = today.isoformat()
+
+    valid = code.isalpha() and code.isupper() and 2 <= len(code) <= 4
+    current = fake_price(code, today) if valid else None
+    out["Current Price"] = f"{current:,}" if valid else "#N/A"
+
+    custom = None
+    custom_date = str(row[_COL["Custom Date"]]).strip()
+    if custom_date:
+        try:
+            custom = fake_price(code, date.fromisoformat(custom_date[:10])) if valid else None
+            out["Custom Price"] = f"{custom:,}" if valid else "#N/A"
+        except ValueError:
+            out["Custom Price"] = "#VALUE!"
+
+    for price, change, pnl, shown in ((current, "Change %", "P&L", True),
+                                      (custom, "Change % (Custom)", "P&L (Custom)", bool(custom_date))):
+        if not shown:
+            continue
+        if price is None or not buy:
+            out[change] = out[pnl] = "#N/A"
+        else:
+            out[change] = f"{(price - buy) / buy * 100:.2f}%"
+            out[pnl] = _rupiah((price - buy) * qty * 100)
+
+    for col, value in out.items():
+        i = _COL[col]
+        if row[i] == '':
+            row[i] = value
+    return row
+
+
+def _rstrip(row):
+    row = list(row)
+    while row and row[-1] == '':
+        row.pop()
+    return row
+
+
+# =========================================================================
+# CLIENT / SPREADSHEET / WORKSHEET
+# =========================================================================
+class FakeClient:
+    """gspread.Client replacement; owns call stats, latency and the quota.
+
+    latency: seconds slept per API call; latency_per_cell: extra seconds per
+    cell read or written; quota: max calls per `quota_window` seconds before
+    raising 429 (Sheets default is 60 per user per minute); error_rate:
+    fraction of calls failing with a random 429.
+    """
+
+    def __init__(self, latency=0.0, latency_per_cell=0.0, quota=None, quota_window=60.0,
+                 error_rate=0.0, seed=0):
+        self.latency = latency
+        self.latency_per_cell = latency_per_cell
+        self.quota = quota
+        self.quota_window = quota_window
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.RLock()
+        self._window = collections.deque()
+        self.spreadsheets = {}
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self._lock:
+            self.calls = collections.Counter()
+            self.log = []
+            self.cells_read = 0
+            self.cells_written = 0
+            self.throttled = 0
+
+    @property
+    def total_calls(self):
+        return sum(self.calls.values())
+
+    def _call(self, name, cells_read=0, cells_written=0):
+        """Account for one API call; raises the 429 before sleeping, like the API"""
+        with self._lock:
+            now = time.monotonic()
+            while self._window and now - self._window[0] >= self.quota_window:
+                self._window.popleft()
+            limited = self.quota is not None and len(self._window) >= self.quota
+            if limited or (self.error_rate and self._random.random() < self.error_rate):
+                self.throttled += 1
+                self.log.append((name, 429))
+                raise quota_error()
+            self._window.append(now)
+            self.calls[name] += 1
+            self.log.append((name, cells_read + cells_written))
+            self.cells_read += cells_read
+            self.cells_written += cells_written
+        delay = self.latency + self.latency_per_cell * (cells_read + cells_written)
+        if delay:
+            time.sleep(delay)
+
+    def create(self, key, rows=(), title="Sheet1", row_count=None):
+        """Register a spreadsheet with one worksheet holding `rows` (header included)"""
+        spreadsheet = FakeSpreadsheet(self, key)
+        spreadsheet.add_worksheet(title, rows, row_count=row_count)
+        self.spreadsheets[key] = spreadsheet
+        return spreadsheet
+
+    def open_by_key(self, key):
+        # gspread: Spreadsheet(...) langsung mengambil metadata
+        spreadsheet = self.spreadsheets[key]
+        spreadsheet.fetch_sheet_metadata()
+        return spreadsheet
+
+
+class FakeSpreadsheet:
+    def __init__(self, client, key):
+        self.client = client
+        self.id = key
+        self._worksheets = []
+        self._sheet_ids = itertools.count(0)
+
+    def add_worksheet(self, title, rows=(), formulas=True, today=None, row_count=None):
+        ws = FakeWorksheet(self, next(self._sheet_ids), title, rows, formulas, today, row_count)
+        self._worksheets.append(ws)
+        return ws
+
+    def fetch_sheet_metadata(self, params=None):
+        self.client._call("fetch_sheet_metadata")
+        return {"sheets": [{"properties": {"sheetId": ws.id, "title": ws.title, "index": i,
+                                           "gridProperties": {"rowCount": ws.row_count,
+                                                              "columnCount": ws.width}}}
+                           for i, ws in enumerate(self._worksheets)]}
+
+    @property
+    def sheet1(self):
+        # gspread 5.x: get_worksheet(0) -> satu fetch_sheet_metadata
+        return self.get_worksheet(0)
+
+    def get_worksheet(self, index):
+        self.fetch_sheet_metadata()
+        return self._worksheets[index] if index < len(self._worksheets) else None
+
+    def worksheets(self):
+        self.fetch_sheet_metadata()
+        return list(self._worksheets)
+
+    def worksheet(self, title):
+        self.fetch_sheet_metadata()
+        for ws in self._worksheets:
+            if ws.title == title:
+                return ws
+        raise WorksheetNotFound(title)
+
+    def get_worksheet_by_id(self, sheet_id):
+        self.fetch_sheet_metadata()
+        return self._by_id(sheet_id)
+
+    def _by_id(self, sheet_id):
+        for ws in self._worksheets:
+            if ws.id == sheet_id:
+                return ws
+        raise WorksheetNotFound(sheet_id)
+
+    def batch_update(self, body):
+        """Supports the deleteDimension / insertDimension / appendDimension row requests"""
+        requests_ = body.get("requests", [])
+        self.client._call("spreadsheets.batchUpdate", cells_written=len(requests_))
+        for req in requests_:
+            kind, spec = next(iter(req.items()))
+            rng = spec.get("range", spec)
+            ws = self._by_id(rng["sheetId"])
+            with ws._lock:
+                if kind == "appendDimension":
+                    ws.row_count += spec["length"]
+                elif kind == "deleteDimension":
+                    del ws._rows[rng["startIndex"]:rng["endIndex"]]
+                    ws.row_count -= rng["endIndex"] - rng["startIndex"]
+                elif kind == "insertDimension":
+                    for _ in range(rng["endIndex"] - rng["startIndex"]):
+                        ws._rows.insert(rng["startIndex"], [''] * ws.width)
+                    ws.row_count += rng["endIndex"] - rng["startIndex"]
+                else:
+                    raise NotImplementedError(kind)
+        return {"replies": [{} for _ in requests_]}
+
+
+class FakeWorksheet:
+    def __init__(self, spreadsheet, sheet_id, title, rows, formulas=True, today=None, row_count=None):
+        self.spreadsheet = spreadsheet
+        self.client = spreadsheet.client
+        self.id = sheet_id
+        self.title = title
+        self.width = WIDTH
+        self.formulas = formulas
+        self.today = today or date.today()
+        self._rows = [normalize_row([str(c) for c in r], self.width) for r in rows]
+        self.row_count = max(row_count or DEFAULT_ROWS, len(self._rows))
+        self._formula_cache = {}    # isi baris -> hasil formula, supaya fake tidak mendominasi profil
+        self._lock = threading.RLock()
+
+    # -----------------------------------------------------------------
+    # Grid helpers
+    # -----------------------------------------------------------------
+    def _display(self, i):
+        row = self._rows[i]
+        if not self.formulas or i == 0:
+            return row
+        key = tuple(row)
+        shown = self._formula_cache.get(key)
+        if shown is None:
+            if len(self._formula_cache) > 4 * len(self._rows) + 1000:
+                self._formula_cache.clear()
+            shown = self._formula_cache[key] = formula_values(row, self.today)
+        return shown
+
+    def _used_height(self):
+        n = len(self._rows)
+        while n and not any(self._rows[n - 1]):
+            n -= 1
+        return n
+
+    def _read_grid(self, a1):
+        g = a1_range_to_grid_range(a1)
+        with self._lock:
+            r0, r1 = g.get("startRowIndex", 0), min(g.get("endRowIndex", len(self._rows)), self._used_height())
+            c0, c1 = g.get("startColumnIndex", 0), g.get("endColumnIndex", self.width)
+            out = [_rstrip(self._display(i)[c0:c1]) for i in range(r0, r1)]
+        while out and not out[-1]:
+            out.pop()
+        return out
+
+    def _check_grid(self, a1, values=((),)):
+        """400 like the API when a range reaches past the last grid row"""
+        r0 = a1_range_to_grid_range(a1).get("startRowIndex", 0)
+        if r0 + len(values) > self.row_count:
+            raise api_error(400, f"Range ('{self.title}'!{a1}) exceeds grid limits. "
+                                 f"Max rows: {self.row_count}, max columns: {self.width}", "INVALID_ARGUMENT")
+
+    def _write_grid(self, a1, values):
+        self._check_grid(a1, values)
+        g = a1_range_to_grid_range(a1)
+        r0, c0 = g.get("startRowIndex", 0), g.get("startColumnIndex", 0)
+        with self._lock:
+            for i, row in enumerate(values):
+                while len(self._rows) <= r0 + i:
+                    self._rows.append([''] * self.width)
+                for j, value in enumerate(row):
+                    self._rows[r0 + i][c0 + j] = '' if value is None else str(value)
+        return sum(len(r) for r in values)
+
+    @property
+    def values(self):
+        """Raw stored cells (no formulas), for assertions in benchmarks"""
+        with self._lock:
+            return [list(r) for r in self._rows]
+
+    # -----------------------------------------------------------------
+    # gspread API
+    # -----------------------------------------------------------------
+    def get_all_values(self, **kwargs):
+        # Seperti API: tiap baris berhenti di sel terisi terakhir, lalu gspread meratakan
+        # grid selebar baris terlebar (sheet 14 kolom tetap 14 kolom)
+        with self._lock:
+            rows = [_rstrip(self._display(i)) for i in range(self._used_height())]
+        width = max(map(len, rows), default=0)
+        rows = [r + [''] * (width - len(r)) for r in rows]
+        self.client._call("values.get", cells_read=len(rows) * width)
+        return rows
+
+    def get_all_records(self, **kwargs):
+        values = self.get_all_values()
+        if not values:
+            return []
+        header = values[0]
+        return [dict(zip(header, r)) for r in values[1:]]
+
+    def row_values(self, row, **kwargs):
+        values = self._read_grid(f"A{row}:{rowcol_to_a1(row, self.width)}")
+        self.client._call("values.get", cells_read=self.width)
+        return values[0] if values else []
+
+    def get(self, range_name, **kwargs):
+        values = self._read_grid(range_name)
+        self.client._call("values.get", cells_read=sum(len(r) for r in values))
+        return values
+
+    get_values = get
+
+    def batch_get(self, ranges, **kwargs):
+        for r in ranges:
+            self._check_grid(r)
+        out = [self._read_grid(r) for r in ranges]
+        self.client._call("values.batchGet", cells_read=sum(len(r) for vr in out for r in vr))
+        return out
+
+    def update(self, range_name, values=None, **kwargs):
+        # gspread 5.x: update(range, values); juga terima update(values) mulai A1
+        if values is None:
+            range_name, values = "A1", range_name
+        cells = self._write_grid(range_name, values)
+        self.client._call("values.update", cells_written=cells)
+        return {"updatedCells": cells}
+
+    def batch_update(self, data, **kwargs):
+        # Satu batch ditolak utuh, seperti API
+        for d in data:
+            self._check_grid(d["range"], d["values"])
+        cells = sum(self._write_grid(d["range"], d["values"]) for d in data)
+        self.client._call("values.batchUpdate", cells_written=cells)
+        return {"totalUpdatedCells": cells}
+
+    def update_cell(self, row, col, value):
+        self._write_grid(rowcol_to_a1(row, col), [[value]])
+        self.client._call("values.update", cells_written=1)
+
+    def insert_row(self, values, index=1, **kwargs):
+        with self._lock:
+            while len(self._rows) < index - 1:
+                self._rows.append([''] * self.width)
+            self._rows.insert(index - 1, normalize_row(['' if v is None else str(v) for v in values],
+                                                       self.width))
+            self.row_count = max(self.row_count + 1, len(self._rows))
+        self.client._call("spreadsheets.batchUpdate")
+        self.client._call("values.update", cells_written=len(values))
+
+    def append_row(self, values, **kwargs):
+        with self._lock:
+            index = self._used_height() + 1
+            # values.append menambah baris grid sendiri
+            self.row_count = max(self.row_count, index)
+        self._write_grid(f"A{index}", [values])
+        self.client._call("values.append", cells_written=len(values))
+
+    def delete_rows(self, start_index, end_index=None):
+        with self._lock:
+            del self._rows[start_index - 1:end_index or start_index]
+            self.row_count -= (end_index or start_index) - start_index + 1
+        self.client._call("spreadsheets.batchUpdate")
+
+    def add_rows(self, rows):
+        self.client._call("spreadsheets.batchUpdate")
+        with self._lock:
+            self.row_count += rows
+
+
+# =========================================================================
+# DATA JURNAL SINTETIS + PATCH gspread
+# =========================================================================
+def journal_rows(n, seed=0, today=None, formula_row=False, with_ids=True):
+    """Header + `n` trades with only the manual input columns filled.
+
+    with_ids=False gives a sheet from before the Trade ID column existed.
+    """
+    rng = random.Random(seed)
+    today = today or date.today()
+    codes = ["BBCA", "BMRI", "TLKM", "ASII", "BBRI", "GOTO", "ANTM", "UNVR", "ADRO", "ICBP"]
+    rows = [list(COLUMNS) if with_ids else [c for c in COLUMNS if c != ID_COL]]
+    if formula_row:
+        rows.append([''] * WIDTH)   # baris formula kosong di bawah header (layout app.py)
+    for i in range(n):
+        row = [''] * WIDTH
+        buy_date = today - timedelta(days=rng.randint(0, 1500))
+        row[_COL["Buy Date"]] = buy_date.isoformat()
+        row[_COL["Stock Code"]] = rng.choice(codes)
+        row[_COL["Qty Lot"]] = str(rng.randint(1, 200))
+        row[_COL["Price (Buy)"]] = f"{rng.randint(10, 2400) * 5:,}"
+        row[_COL["Possition"]] = "OPEN" if rng.random() < 0.4 else "CLOSE"
+        if rng.random() < 0.2:
+            row[_COL["Custom Date"]] = (buy_date + timedelta(days=rng.randint(1, 90))).isoformat()
+        if with_ids:
+            row[_COL[ID_COL]] = new_trade_id()
+        rows.append(row)
+    return rows
+
+
+@contextlib.contextmanager
+def patch_gspread(client):
+    """Make gspread.authorize / Credentials.from_service_account_info return `client`"""
+    import gspread
+    from google.oauth2.service_account import Credentials
+
+    saved = gspread.authorize, Credentials.__dict__["from_service_account_info"]
+    gspread.authorize = lambda *args, **kwargs: client
+    Credentials.from_service_account_info = classmethod(lambda cls, *args, **kwargs: object())
+    try:
+        yield client
+    finally:
+        gspread.authorize = saved[0]
+        Credentials.from_service_account_info = saved[1]
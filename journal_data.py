@@ -0,0 +1,266 @@
+import hashlib
+import os
+import uuid
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# =========================================================================
+# SKEMA SHEET JURNAL
+# =========================================================================
+COLUMNS = [
+    "Buy Date", "Stock Code", "Qty Lot", "Price (Buy)", "Value (Buy)",
+    "Current Date", "Current Price", "Custom Date", "Custom Price",
+    "Possition", "Change %", "P&L", "Change % (Custom)", "P&L (Custom)",
+    "Trade ID"
+]
+
+# Kolom O: ID unik per trade, tidak ikut bergeser saat baris disisipkan / dihapus
+ID_COL = "Trade ID"
+ID_COL_INDEX = COLUMNS.index(ID_COL)
+
+# Kolom tambahan saat beberapa jurnal digabung: asal trade (worksheet / spreadsheet)
+SOURCE_COL = "Source"
+
+NUMERIC_COLS = ["Price (Buy)", "Value (Buy)", "Current Price", "Custom Price",
+                "P&L", "P&L (Custom)", "Change %", "Change % (Custom)", "Qty Lot"]
+
+DATE_COLS = ["Buy Date", "Current Date", "Custom Date"]
+
+# Kolom yang diisi manual (bukan formula). Perubahan di kolom ini yang dipakai
+# untuk mendeteksi baris mana yang berubah sejak sync terakhir.
+INPUT_COLS = ["Buy Date", "Stock Code", "Qty Lot", "Price (Buy)", "Custom Date", "Possition", ID_COL]
+INPUT_COL_INDEXES = [COLUMNS.index(c) for c in INPUT_COLS]
+
+# Sisanya dihitung formula sheet (harga live, P&L), berubah tanpa edit di kolom input
+FORMULA_COLS = [c for c in COLUMNS if c not in INPUT_COLS]
+FORMULA_COL_INDEXES = [COLUMNS.index(c) for c in FORMULA_COLS]
+
+# Baris 1 = header, data mulai baris 2
+FIRST_DATA_ROW = 2
+
+
+def normalize_row(row, width=len(COLUMNS)):
+    """Pad or trim a raw sheet row to exactly `width` string cells"""
+    row = list(row[:width])
+    if len(row) < width:
+        row.extend([''] * (width - len(row)))
+    return row
+
+
+def new_trade_id():
+    """Random 12-char trade ID"""
+    return uuid.uuid4().hex[:12].upper()
+
+
+def row_fingerprint(cells):
+    """Stable short hash of a row's cells"""
+    raw = '\x1f'.join(str(c) for c in cells).encode('utf-8')
+    return hashlib.blake2b(raw, digest_size=8).hexdigest()
+
+
+# Nilai error / placeholder dari formula sheet -> NaN
+ERROR_SENTINELS = ['#N/A', '#ERROR!', '#VALUE!', '#REF!', '#DIV/0!', '#NAME?', '#NUM!',
+                   'No Data', 'Loading...', '-', '']
+
+PERCENT_COLS = ["Change %", "Change % (Custom)"]
+
+# Urutan hari/bulan tanggal bergaris miring ikut locale sheet, satu pilihan untuk semua sel:
+# default 02/01/2024 = 1 Feb (locale US), JOURNAL_DAYFIRST=1 -> 13/01/2024 = 13 Jan
+DAYFIRST = os.environ.get("JOURNAL_DAYFIRST", "0").strip().lower() in ("1", "true", "yes")
+
+
+def date_formats(dayfirst=DAYFIRST):
+    """Date formats tried in order; text matching none of them parses to NaT"""
+    slash = "%d/%m/%Y" if dayfirst else "%m/%d/%Y"
+    # Tahun 2 digit (02/01/24) baru dicoba setelah tahun 4 digit gagal; %y: 00-68 -> 20xx, 69-99 -> 19xx
+    short = slash.replace("%Y", "%y")
+    return ["%Y-%m-%d", "%Y-%m-%d %H:%M:%S", "%Y/%m/%d", slash, f"{slash} %H:%M:%S",
+            short, f"{short} %H:%M:%S"]
+
+
+DATE_FORMATS = date_formats()
+
+# Kolom angka yang diparse bersama (satu factorize + satu pass atas unique-nya)
+MONEY_COLS = [c for c in NUMERIC_COLS if c not in PERCENT_COLS]
+
+# Dibuang dari kedua ujung sel angka sebelum dicek: "Rp 1.500", "5,5%", "(Rp 1.500)"
+_NUMBER_EDGES = ' Rp()%'
+
+
+def _as_strings(values):
+    return pd.Series(values, dtype='string').str.strip()
+
+
+def _factorize(values):
+    """(codes, unique stripped strings); journal columns repeat a lot, so parse uniques only"""
+    codes, uniques = pd.factorize(np.asarray(values, dtype=object).ravel(), use_na_sentinel=True)
+    return codes, pd.Series(uniques, dtype='string').str.strip()
+
+
+def _take(codes, parsed, fill):
+    out = parsed.take(np.where(codes >= 0, codes, 0)) if len(parsed) else np.full(len(codes), fill)
+    out[codes < 0] = fill
+    return out
+
+
+def _number_values(t, percent):
+    """float64 of Arrow strings holding only digits, '.', ',' and '-' (anything else -> NaN)"""
+    # Jarak separator terakhir dari ujung kanan = jumlah digit desimal kandidat
+    backwards = pc.utf8_reverse(t)
+    at = np.stack([pc.find_substring(backwards, sep).to_numpy(zero_copy_only=False) for sep in '.,'])
+    last = np.where(at >= 0, at, np.inf).min(axis=0)
+    decimals = np.where((last >= 1) & (last < np.inf) & (percent | (last <= 2)), last, 0)
+
+    digits = pc.replace_substring(pc.replace_substring(t, '.', ''), ',', '')
+    digits = pc.if_else(pc.match_substring_regex(digits, r'^-?\d+$'), digits, pa.scalar(None, pa.string()))
+    values = pc.cast(digits, pa.float64()).to_numpy(zero_copy_only=False)
+    # Bilangan bulat / 10^k dibulatkan sama persis dengan float("123.45")
+    return values / 10.0 ** decimals
+
+
+def _parse_number_strings(s, percent):
+    s = pa.array(s, type=pa.string())
+    missing = pc.fill_null(pc.is_in(s, pa.array(ERROR_SENTINELS)), True).to_numpy(zero_copy_only=False)
+    negative = pc.fill_null(pc.starts_with(s, '('), False).to_numpy(zero_copy_only=False)
+
+    t = pc.utf8_trim(s, _NUMBER_EDGES)
+    out = _number_values(t, percent)
+
+    # Sisa teks lain (IDR, spasi di tengah, ...) dibuang hanya di sel yang memang punya
+    junk = pc.fill_null(pc.match_substring_regex(t, r'[^\d.,-]'), False).to_numpy(zero_copy_only=False)
+    if junk.any():
+        rest = pc.replace_substring_regex(t.filter(pa.array(junk)), r'[^\d.,-]', '')
+        out[junk] = _number_values(rest, percent)
+
+    out[negative] = -out[negative]
+    out[missing] = np.nan
+    return out
+
+
+def parse_numbers(values, percent=False):
+    """Vectorized Rupiah / percent text -> float64 ndarray of the same shape, error sentinels -> NaN.
+
+    Rupiah: '.' or ',' followed by 3 digits is a thousands separator, a final
+    separator followed by 1-2 digits is the decimal point ("Rp 1.500.000",
+    "Rp 1,500,000", "Rp 12.345,67"). Percent: the last separator is always
+    the decimal point ("5.5%", "5,5%"). "(...)" means negative.
+    """
+    values = np.asarray(values, dtype=object)
+    codes, uniques = _factorize(values)
+    return _take(codes, _parse_number_strings(uniques, percent), np.nan).reshape(values.shape)
+
+
+def _parse_date_strings(s, formats):
+    s = s.mask(s.isin(ERROR_SENTINELS))
+    out = pd.Series(pd.NaT, index=s.index, dtype='datetime64[ns]')
+    for fmt in formats:
+        todo = (out.isna() & s.notna()).to_numpy()
+        if not todo.any():
+            break
+        out[todo] = pd.to_datetime(s[todo], format=fmt, errors='coerce').to_numpy()
+    return out.to_numpy()
+
+
+def parse_dates(values, dayfirst=DAYFIRST):
+    """Parse sheet date text with the explicit date_formats(dayfirst), unparseable -> NaT.
+
+    There is no per-value guessing: one journal never mixes 02/01 = 1 Feb
+    with 13/01 = 13 Jan. Two-digit years (02/01/24) follow the same order.
+    """
+    values = np.asarray(values, dtype=object)
+    codes, uniques = _factorize(values)
+    parsed = _parse_date_strings(uniques, date_formats(dayfirst))
+    return _take(codes, parsed, np.datetime64('NaT', 'ns')).reshape(values.shape)
+
+
+def parse_rows(rows, row_numbers, dayfirst=DAYFIRST):
+    """Parse raw sheet rows into the typed journal DataFrame, indexed by sheet row number"""
+    width = len(COLUMNS)
+    if any(len(r) != width for r in rows):
+        rows = [normalize_row(r, width) for r in rows]
+    grid = np.array(rows, dtype=object).reshape(len(rows), width)
+    index = pd.Index(list(row_numbers), name='Row', dtype='int64')
+
+    keep = _as_strings(grid[:, COLUMNS.index('Stock Code')]).fillna('').ne('').to_numpy(bool)
+    grid, index = grid[keep], index[keep]
+
+    # Kolom sejenis berbagi banyak nilai (tanggal, harga): parse bersama, sekali per nilai unik
+    data = {}
+    for cols, parse in ((MONEY_COLS, parse_numbers),
+                        (PERCENT_COLS, lambda v: parse_numbers(v, percent=True)),
+                        (DATE_COLS, lambda v: parse_dates(v, dayfirst))):
+        parsed = parse(grid[:, [COLUMNS.index(c) for c in cols]])
+        data.update(zip(cols, parsed.T))
+
+    for i, col in enumerate(COLUMNS):
+        if col in data:
+            continue
+        if col == POSITION_COL:
+            data[col] = parse_positions(grid[:, i])
+        elif col in CATEGORY_COLS:
+            data[col] = pd.Categorical(pd.array(grid[:, i], dtype='str'))
+        else:
+            data[col] = pd.array(grid[:, i], dtype='str')
+    return pd.DataFrame(data, index=index, columns=COLUMNS)
+
+
+# =========================================================================
+# KOLOM KATEGORI (POSISI, KODE SAHAM)
+# =========================================================================
+# Posisi dinormalisasi sekali saat parse: teks sheet apa pun yang mengandung
+# Open / Floating -> OPEN, sisanya CLOSE, kosong -> NaN
+POSITION_COL = "Possition"
+POSITIONS = ["OPEN", "CLOSE"]
+POSITION_DTYPE = pd.CategoricalDtype(POSITIONS)
+OPEN_PATTERN = r'open|floating'
+
+# Kolom teks berulang yang disimpan sebagai category
+CATEGORY_COLS = [POSITION_COL, "Stock Code"]
+
+
+def parse_positions(values):
+    """Position text -> Categorical of POSITION_DTYPE (blank / error sentinel -> NaN)"""
+    codes, uniques = _factorize(values)
+    uniques = uniques.mask(uniques.isin(ERROR_SENTINELS))
+    status = np.where(uniques.str.contains(OPEN_PATTERN, case=False).fillna(False).to_numpy(bool), 0, 1)
+    status[uniques.isna().to_numpy(bool)] = -1
+    return pd.Categorical.from_codes(_take(codes, status, -1), dtype=POSITION_DTYPE)
+
+
+def categorize(df):
+    """Store CATEGORY_COLS of a journal frame as category (in place, returns df)"""
+    for col in CATEGORY_COLS:
+        if col not in df.columns:
+            continue
+        if col == POSITION_COL:
+            if df[col].dtype != POSITION_DTYPE:
+                df[col] = parse_positions(df[col].astype(object))
+        elif not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('str').astype('category')
+    return df
+
+
+def concat_frames(frames):
+    """pd.concat that keeps category columns as category (categories unioned, sorted)"""
+    frames = [f for f in frames if not f.empty] or frames[:1]
+    if len(frames) == 1:
+        return frames[0]
+    first = frames[0]
+    for col in first.columns:
+        if not isinstance(first[col].dtype, pd.CategoricalDtype):
+            continue
+        if all(f[col].dtype == first[col].dtype for f in frames):
+            continue
+        if first[col].dtype == POSITION_DTYPE:
+            frames = [categorize(f.copy()) if f[col].dtype != POSITION_DTYPE else f for f in frames]
+            continue
+        seen = set()
+        for f in frames:
+            s = f[col]
+            seen.update(s.cat.categories if isinstance(s.dtype, pd.CategoricalDtype) else s.dropna().unique())
+        dtype = pd.CategoricalDtype(sorted(seen))
+        frames = [f.assign(**{col: f[col].astype(dtype)}) for f in frames]
+    return pd.concat(frames)
@@ -0,0 +1,46 @@
+import gzip
+import io
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# =========================================================================
+# EXPORT JURNAL (CSV / CSV GZIP / PARQUET)
+# =========================================================================
+
+# Label -> (ekstensi file, MIME type)
+EXPORT_FORMATS = {
+    "CSV": ("csv", "text/csv"),
+    "CSV (gzip)": ("csv.gz", "application/gzip"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+}
+CHUNK_ROWS = 10000
+GZIP_LEVEL = 6     # level 9 ~4x lebih lambat untuk file ~2% lebih kecil
+
+
+def write_csv(df, stream, chunk_rows=CHUNK_ROWS):
+    """CSV of `df` into a binary stream, `chunk_rows` rows at a time (never one full-size string)"""
+    text = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+    for start in range(0, max(len(df), 1), chunk_rows):
+        df.iloc[start:start + chunk_rows].to_csv(text, index=False, header=start == 0)
+    text.flush()
+    text.detach()
+
+
+def export_bytes(df, fmt, chunk_rows=CHUNK_ROWS):
+    """File contents of `df` in one of EXPORT_FORMATS"""
+    buf = io.BytesIO()
+    if fmt == "CSV":
+        write_csv(df, buf, chunk_rows)
+    elif fmt == "CSV (gzip)":
+        with gzip.GzipFile(fileobj=buf, mode='wb', compresslevel=GZIP_LEVEL, mtime=0) as gz:
+            write_csv(df, gz, chunk_rows)
+    elif fmt == "Parquet":
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), buf, row_group_size=chunk_rows)
+    else:
+        raise ValueError(f"Unknown export format: {fmt}")
+    return buf.getvalue()
+
+
+def export_name(prefix, fmt):
+    return f"{prefix}.{EXPORT_FORMATS[fmt][0]}"
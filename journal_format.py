@@ -0,0 +1,161 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# =========================================================================
+# FORMAT TAMPILAN (VECTORIZED)
+# =========================================================================
+# Semua formatter menerima array / Series dan mengembalikan Series string
+# dengan index yang sama, tanpa satu panggilan Python per sel.
+
+
+def _text(values):
+    """int / object array -> Arrow string array"""
+    return pc.cast(pa.array(values), pa.string())
+
+
+def _series(array, index):
+    return pd.Series(array, index=index, dtype='str')
+
+
+def format_number(values, sep='.', prefix='', missing=None):
+    """'1.234.567' per value (thousands separator `sep`, no decimals) after `prefix`;
+    NaN -> `missing` (formatted as 0 when None)"""
+    series = pd.Series(values)
+    x = series.to_numpy(dtype='float64', na_value=np.nan)
+    n = np.rint(np.abs(np.nan_to_num(x))).astype('int64')
+    digits = _text(n)
+    width = pc.utf8_length(digits)
+    groups = ((pc.max(width).as_py() or 1) - 1) // 3 + 1
+
+    # Potong per 3 digit dari kanan, separator hanya kalau angkanya cukup panjang
+    text = pc.utf8_slice_codeunits(digits, -3, len(str(np.iinfo('int64').max)))
+    for k in range(1, groups):
+        group = pc.utf8_slice_codeunits(digits, -3 * k - 3, -3 * k)
+        text = pc.if_else(pc.greater(width, 3 * k), pc.binary_join_element_wise(group, text, sep), text)
+    sign = pc.if_else(pa.array((x < 0) & (n > 0)), prefix + '-', prefix)
+    text = pc.binary_join_element_wise(sign, text, '')
+    if missing is not None:
+        text = pc.if_else(pa.array(np.isnan(x)), missing, text)
+    return _series(text, series.index)
+
+
+def format_rupiah(values, sep='.'):
+    """'Rp 1.234.567' per value; NaN -> 'Rp 0'"""
+    return format_number(values, sep, prefix='Rp ')
+
+
+def format_percent(values, missing='-', decimals=1):
+    """'5.5%' per value (`decimals` decimals); NaN -> `missing`"""
+    series = pd.Series(values)
+    x = series.to_numpy(dtype='float64', na_value=np.nan)
+    scale = 10 ** decimals
+    magnitude = np.abs(np.nan_to_num(x))
+    scaled = np.rint(magnitude * scale)
+    # x * scale bisa jatuh tepat di .5 padahal nilai binernya di sisi lain (82.45 -> 824.5):
+    # nilai di sekitar setengah dibulatkan ulang oleh round() seperti f"{x:.1f}"
+    tie = np.abs(magnitude * scale % 1 - 0.5) < 1e-6
+    if tie.any():
+        scaled[tie] = np.rint(np.array([round(v, decimals) for v in magnitude[tie].tolist()]) * scale)
+    scaled = scaled.astype('int64')
+    parts = [pa.array(np.where((x < 0) & (scaled > 0), '-', '')), _text(scaled // scale)]
+    if decimals:
+        parts += ['.', pc.utf8_lpad(_text(scaled % scale), decimals, padding='0')]
+    text = pc.binary_join_element_wise(*parts, '%', '')
+    return _series(pc.if_else(pa.array(np.isnan(x)), missing, text), series.index)
+
+
+def format_dates(values, fmt='%d/%m/%y', missing='-'):
+    """strftime on the distinct dates only (journals repeat dates a lot); NaT -> `missing`"""
+    series = pd.Series(values)
+    codes, uniques = pd.factorize(series.to_numpy())
+    labels = pd.DatetimeIndex(uniques).strftime(fmt).to_numpy(dtype=object)
+    out = np.where(codes >= 0, labels.take(np.maximum(codes, 0)) if len(labels) else missing, missing)
+    return _series(out.astype(str) if len(out) else out.astype(object), series.index)
+
+
+# Jenis format per kolom jurnal
+COLUMN_FORMATS = {
+    "Buy Date": format_dates,
+    "Current Date": format_dates,
+    "Custom Date": format_dates,
+    "Price (Buy)": format_rupiah,
+    "Value (Buy)": format_rupiah,
+    "Current Price": format_rupiah,
+    "Custom Price": format_rupiah,
+    "P&L": format_rupiah,
+    "P&L (Custom)": format_rupiah,
+    "Change %": format_percent,
+    "Change % (Custom)": format_percent,
+}
+
+
+def format_frame(df, columns, rename=None, formats=COLUMN_FORMATS):
+    """Display copy of `columns` with money / percent / date columns turned into text"""
+    out = pd.DataFrame({
+        c: formats[c](df[c]) if c in formats else df[c] for c in columns
+    }, index=df.index)
+    return out.rename(columns=rename) if rename else out
+
+
+def trade_labels(df, value_col, date_fmt='%d/%m/%y'):
+    """'BBCA - 02/01/24 - Rp 1.000.000' per trade, built column-wise"""
+    parts = [df['Stock Code'].astype('str'), format_dates(df['Buy Date'], date_fmt)]
+    if value_col is not None:
+        value = df[value_col]
+        parts.append(value.astype('str') if value_col not in COLUMN_FORMATS else COLUMN_FORMATS[value_col](value))
+    return pd.Series(
+        pc.binary_join_element_wise(*(pa.array(p.to_numpy(dtype=object), pa.string()) for p in parts), ' - '),
+        index=df.index, dtype='str'
+    )
+
+
+# =========================================================================
+# PENCARIAN TRADE (PREFIX INDEX)
+# =========================================================================
+class TradePicker:
+    """Trade labels + a prefix index on stock code and buy date.
+
+    Built once per data version. The index keeps the distinct stock codes and
+    dates (dd/mm/yy and yyyy-mm-dd) sorted, so `search()` is two binary
+    searches plus one lookup per trade; typing in the picker stays fast on
+    very large journals.
+    """
+
+    def __init__(self, df, value_col=None, key_col='Trade ID', date_fmt='%d/%m/%y'):
+        self.keys = df[key_col].to_numpy(dtype=object)
+        self.labels = trade_labels(df, value_col, date_fmt).to_numpy(dtype=object)
+        self.position = {key: i for i, key in enumerate(self.keys)}
+
+        codes, stocks = pd.factorize(df['Stock Code'].astype('str').str.lower())
+        date_codes, dates = pd.factorize(df['Buy Date'])
+        dates = pd.DatetimeIndex(dates)
+        self._fields = [(codes, np.asarray(stocks, dtype=str)),
+                        (date_codes, np.asarray(dates.strftime('%d/%m/%y'), dtype=str)),
+                        (date_codes, np.asarray(dates.strftime('%Y-%m-%d'), dtype=str))]
+        # Per field: urutan nilai unik (sorted) untuk binary search
+        self._fields = [(codes, terms, np.argsort(terms)) for codes, terms in self._fields]
+
+    def __len__(self):
+        return len(self.keys)
+
+    def label(self, key):
+        return self.labels[self.position[key]]
+
+    def search(self, query='', limit=None):
+        """(keys of trades matching the prefix `query` in journal order, match count); all trades when empty"""
+        query = query.strip().lower()
+        if not query:
+            rows = np.arange(len(self.keys))
+        else:
+            match = np.zeros(len(self.keys), dtype=bool)
+            for codes, terms, order in self._fields:
+                ordered = terms[order]
+                lo = np.searchsorted(ordered, query, side='left')
+                hi = np.searchsorted(ordered, query + '\uffff', side='left')
+                hit = np.zeros(len(terms) + 1, dtype=bool)      # slot terakhir: kode -1 (kosong)
+                hit[order[lo:hi]] = True
+                match |= hit[codes]
+            rows = np.flatnonzero(match)
+        return self.keys[rows[:limit]].tolist(), len(rows)
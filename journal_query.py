@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+
+# =========================================================================
+# QUERY TABEL TRADE (FILTER, SORT, PAGING)
+# =========================================================================
+
+SORT_COLS = ('Buy Date', 'P&L', 'Change %', 'Stock Code')
+FILTER_COLS = ('Possition', 'Stock Code')
+
+
+def descending_order(values):
+    """Row positions sorted high -> low (ties keep journal order, missing values last)"""
+    codes, _ = pd.factorize(pd.Series(values), sort=True)
+    # Kode -1 (kosong) diberi nilai terbesar supaya jatuh paling akhir
+    key = np.where(codes < 0, 1, -codes.astype('int64'))
+    return np.argsort(key, kind='stable')
+
+
+class TradeQuery:
+    """Paged filter / sort over one journal snapshot.
+
+    Built once per data version: one presorted row permutation per sort
+    column and one code array per filter column. A query is then a lookup
+    table per filter (a bitmap over all rows) and one pass of the chosen
+    permutation through that bitmap; callers slice the result per page, so
+    only the visible rows ever get turned into a frame. Bitmaps and counts
+    are kept with the snapshot, so every view asking for e.g. the open
+    positions reuses the same array.
+    """
+
+    def __init__(self, df, sort_cols=SORT_COLS, filter_cols=FILTER_COLS):
+        self.df = df
+        self._order = {c: descending_order(df[c]) for c in sort_cols if c in df.columns}
+        self._codes = {}
+        self._masks = {}
+        self.values = {}
+        for c in filter_cols:
+            if c in df.columns:
+                self._codes[c], self.values[c] = pd.factorize(df[c])
+
+    def __len__(self):
+        return len(self.df)
+
+    def mask(self, column, values):
+        """Bitmap of rows whose `column` is one of `values` (read-only, shared between callers)"""
+        key = (column, tuple(values))
+        if key not in self._masks:
+            hit = np.zeros(len(self.values[column]) + 1, dtype=bool)    # slot terakhir: kode -1 (kosong)
+            hit[self.values[column].get_indexer(list(values))] = True
+            hit[-1] = False
+            bitmap = hit[self._codes[column]]
+            bitmap.flags.writeable = False
+            self._masks[key] = bitmap
+        return self._masks[key]
+
+    def count(self, column, values):
+        """Number of rows whose `column` is one of `values`"""
+        return int(np.count_nonzero(self.mask(column, values)))
+
+    def select(self, filters=None, sort_by=None):
+        """Row positions matching every {column: values} filter (empty = no filter), sorted descending"""
+        match = None
+        for column, values in (filters or {}).items():
+            if values:
+                bitmap = self.mask(column, values)
+                match = bitmap if match is None else match & bitmap
+        rows = self._order[sort_by] if sort_by else np.arange(len(self.df))
+        return rows if match is None else rows[match[rows]]
@@ -0,0 +1,657 @@
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+from journal_data import (COLUMNS, DATE_COLS, FIRST_DATA_ROW, ID_COL, ID_COL_INDEX, NUMERIC_COLS,
+                          PERCENT_COLS, POSITION_COL, SOURCE_COL, categorize, concat_frames, new_trade_id,
+                          normalize_row, parse_dates, parse_numbers, parse_positions)
+from sheet_sync import SheetPoller
+from sheet_writer import (WriteConflict, append_rows_request, cells_update_data, delete_rows_request, grid_rows,
+                          row_cells)
+from sheets_client import is_grid_error, is_retryable
+
+# Lokasi default backend lokal
+DEFAULT_PATHS = {"sqlite": "journal.db", "parquet": "journal.parquet"}
+
+
+class JournalStore:
+    """Storage backend for the trading journal.
+
+    `load()` returns the typed journal DataFrame; every trade carries a
+    stable Trade ID and mutations address trades by it. `append` takes a row
+    of values in COLUMNS order (a Trade ID is generated when empty) and
+    `update` a {column name: value} dict. `batch(ops)` applies several
+    mutations at once, each op being ('append', values), ('update', id, cells)
+    or ('delete', id), and returns the IDs of the appended trades.
+
+    `version` goes up whenever the data may have changed (a local write or a
+    reload that saw changes), so (journal, version) can key caches.
+
+    `load(columns=[...])` returns just those columns; views pass what they
+    read so a Sheets store only keeps those formula columns fresh.
+    """
+
+    version = 0
+    synced_at = None
+    error = None
+    revalidating = False
+
+    def load(self, max_age=None, columns=None):
+        raise NotImplementedError
+
+    def batch(self, ops):
+        raise NotImplementedError
+
+    def append(self, values):
+        """Add one trade; returns its Trade ID"""
+        return self.batch([("append", list(values))])[0]
+
+    def update(self, key, cells):
+        """Overwrite the given {column name: value} cells of a trade"""
+        self.batch([("update", key, dict(cells))])
+
+    def delete(self, key):
+        """Remove a trade"""
+        self.batch([("delete", key)])
+
+    def invalidate(self):
+        """Make the next `load()` re-read the backend"""
+
+    def close(self):
+        """Stop background work (e.g. a poller thread); called when the store is discarded"""
+
+
+def split_ops(ops):
+    """(appends, {id: merged cells}, deletes) from a list of batch ops; appends get their ID here"""
+    appends, updates, deletes = {}, {}, []
+    for op in ops:
+        if op[0] == "append":
+            values = normalize_row(list(op[1]))
+            if not str(values[ID_COL_INDEX]).strip():
+                values[ID_COL_INDEX] = new_trade_id()
+            appends[values[ID_COL_INDEX]] = values
+        elif op[0] == "update" and op[1] in appends:
+            # Trade yang baru ditambah di batch yang sama: edit langsung masuk ke baris barunya
+            for column, value in op[2].items():
+                appends[op[1]][COLUMNS.index(column)] = value
+        elif op[0] == "update":
+            updates.setdefault(op[1], {}).update(op[2])
+        elif op[0] == "delete" and op[1] in appends:
+            del appends[op[1]]
+        elif op[0] == "delete":
+            updates.pop(op[1], None)
+            deletes.append(op[1])
+        else:
+            raise ValueError(f"Operasi tidak dikenal: {op[0]!r}")
+    return list(appends.values()), updates, deletes
+
+
+# =========================================================================
+# GOOGLE SHEETS
+# =========================================================================
+class SheetsJournalStore(JournalStore):
+    """Journal kept in a worksheet; reads go through a SheetSync snapshot.
+
+    Trade IDs are resolved to sheet rows through the SheetSync ID index. A
+    batch sends every value write in one batch_update and every row delete
+    in one spreadsheet batch_update, then patches the snapshot with what it
+    wrote so the next `load()` already shows the change without re-reading
+    the sheet (the poller / next delta sync picks up the formula values).
+
+    With `poll_every` a SheetPoller keeps the snapshot fresh in the
+    background and `load(max_age=...)` never touches the sheet itself.
+
+    Before writing, the key cells (Trade ID included) of every target row are
+    read back in one batch_get and compared with the snapshot fingerprints;
+    on a mismatch (someone inserted, deleted or edited rows meanwhile) the
+    snapshot is delta-synced and the IDs resolved again, up to
+    `max_attempts` times. The Sheets API has no conditional write, so a
+    change landing between that check and the write itself is still possible.
+
+    A row delete is not idempotent: after a timeout / 5xx it may already have
+    happened, so instead of resending it the remaining deletes go through
+    `_resolve` again (trades already gone are dropped, moved rows re-mapped).
+
+    New trades go into the next empty row with a values write, which cannot
+    go past the worksheet grid, so the grid is grown first (appendDimension,
+    `grow_rows` at a time) once the claimed row lies beyond it. The grid
+    size is taken from the worksheet handle and kept up to date with this
+    store's own row changes; when Sheets still rejects a range as past the
+    grid (rows removed outside the app) it is measured again and the batch
+    resolved once more.
+    """
+
+    max_attempts = 3
+    grow_rows = 100     # baris grid yang ditambah sekaligus saat ADD melewati ujung sheet
+
+    def __init__(self, open_ws, sync, poll_every=None):
+        self.open_ws = open_ws
+        self.sync = sync
+        self._grid_rows = None  # perkiraan jumlah baris grid, ikut tambah/hapus baris dari store ini
+        self.poller = SheetPoller(sync, open_ws, interval=poll_every) if poll_every else None
+
+    version = property(lambda self: self.sync.version)
+    synced_at = property(lambda self: self.sync.synced_at)
+    error = property(lambda self: self.sync.error)
+    revalidating = property(lambda self: self.sync.revalidating)
+
+    def load(self, max_age=None, columns=None):
+        """Fresh snapshot, or stale-while-revalidate when `max_age` is given"""
+        self.sync.want(range(len(COLUMNS)) if columns is None else [COLUMNS.index(c) for c in columns])
+        if max_age is None:
+            df = self.sync.refresh(self.open_ws())
+        elif self.poller is not None:
+            self.poller.touch()
+            df = self.sync.snapshot(self.open_ws, max_age=float("inf"))
+        else:
+            df = self.sync.snapshot(self.open_ws, max_age=max_age)
+        return project(df, columns)
+
+    def invalidate(self):
+        self.sync.invalidate()
+        if self.poller is not None:
+            self.poller.notify()
+
+    def close(self):
+        if self.poller is not None:
+            self.poller.stop()
+
+    def _resolve(self, ws, appends, updates, deletes):
+        """Map IDs / new trades to sheet rows and check them against the live sheet.
+
+        Returns (appends, update rows, delete rows, claimed rows); when a row
+        moved or changed since the snapshot, delta-syncs and resolves again.
+        Trades an earlier attempt of the same batch already wrote (their ID is
+        on the sheet) are dropped from the appends, and trades no longer on
+        the sheet from the deletes, so a retried batch never writes twice.
+        """
+        for attempt in range(self.max_attempts):
+            # Satu index untuk seluruh percobaan ini; poller bisa memasang index baru kapan saja
+            row_ids = self.sync.row_ids
+            appends = [values for values in appends if values[ID_COL_INDEX] not in row_ids]
+            deletes = [k for k in deletes if k in row_ids]
+            update_rows = {self.sync.row_of(k, row_ids): cells for k, cells in updates.items()}
+            delete_rows = [self.sync.row_of(k, row_ids) for k in deletes]
+            claimed = [self.sync.claim_free_row() for _ in appends]
+            try:
+                self._ensure_rows(ws, max(claimed, default=0))
+                stale = self.sync.stale_rows(ws, [*update_rows, *delete_rows, *claimed])
+            except Exception:
+                for row_number in claimed:
+                    self.sync.release_row(row_number)
+                raise
+            if not stale:
+                return appends, update_rows, delete_rows, claimed
+            for row_number in claimed:
+                self.sync.release_row(row_number)
+            self.sync.refresh(ws)
+        raise WriteConflict(f"Baris {stale} terus berubah di sheet, tulis dibatalkan")
+
+    def _ensure_rows(self, ws, last_row):
+        """Grow the grid when a claimed row lies past it (values writes cannot add rows)"""
+        if self._grid_rows is None:
+            self._grid_rows = ws.row_count
+        if last_row > self._grid_rows:
+            count = max(last_row - self._grid_rows, self.grow_rows)
+            ws.spreadsheet.batch_update(append_rows_request(ws, count))
+            self._grid_rows += count
+
+    def batch(self, ops):
+        appends, updates, deletes = split_ops(ops)
+        ids = [values[ID_COL_INDEX] for values in appends]
+        ws = self.open_ws()
+        if not self.sync.rows_loaded:
+            # Pointer baris kosong & index ID butuh isi sheet, bukan cuma mirror
+            self.sync.refresh(ws, force_full=True)
+        for attempt in range(2):
+            claimed = []
+            try:
+                new_rows, update_rows, delete_rows, claimed = self._resolve(ws, appends, updates, deletes)
+                written = {}
+                for row_number, values in zip(claimed, new_rows):
+                    written[row_number] = row_cells(values)
+                for row_number, cells in update_rows.items():
+                    written[row_number] = {COLUMNS.index(c): v for c, v in cells.items()}
+                data = [d for row_number, cells in written.items() for d in cells_update_data(row_number, cells)]
+                if data:
+                    ws.batch_update(data, value_input_option='USER_ENTERED')
+                break
+            except Exception as e:
+                for row_number in claimed:
+                    self.sync.release_row(row_number)
+                if attempt or not is_grid_error(e):
+                    raise
+                # Grid lebih kecil dari perkiraan (baris dihapus di luar app): ukur ulang
+                self._grid_rows = grid_rows(ws)
+        # Snapshot ditambal dengan isi yang baru ditulis, tanpa membaca ulang sheet
+        self.sync.patch_rows(written)
+
+        for attempt in range(self.max_attempts):
+            if not delete_rows:
+                break
+            try:
+                ws.spreadsheet.batch_update(delete_rows_request(ws, delete_rows))
+                break
+            except Exception as e:
+                if attempt == self.max_attempts - 1 or not is_retryable(e):
+                    raise
+                # Bisa jadi sudah terhapus: cek ulang sheet, jangan kirim ulang buta
+                self.sync.refresh(ws)
+                _, _, delete_rows, _ = self._resolve(ws, [], {}, deletes)
+        # Geser snapshot lokal ikut baris yang dihapus, delta sync tidak perlu baca ulang
+        self.sync.remove_rows(delete_rows)
+        if self._grid_rows is not None:
+            self._grid_rows -= len(delete_rows)
+        return ids
+
+
+# =========================================================================
+# BACKEND LOKAL
+# =========================================================================
+def typed_value(column, value):
+    """Convert a UI/sheet cell value to the stored type of `column` (None = empty)"""
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    if column in NUMERIC_COLS:
+        if isinstance(value, (int, float, np.number)):
+            number = float(value)
+        else:
+            number = parse_numbers([str(value)], percent=column in PERCENT_COLS)[0]
+        return None if np.isnan(number) else number
+    if column in DATE_COLS:
+        if isinstance(value, (date, datetime, np.datetime64)):
+            return pd.Timestamp(value)
+        parsed = parse_dates([str(value)])[0]
+        return None if np.isnat(parsed) else pd.Timestamp(parsed)
+    if column == POSITION_COL:
+        position = parse_positions([str(value)])[0]
+        return None if pd.isna(position) else position
+    return str(value)
+
+
+def typed_record(values):
+    """{column: typed value} for a row given in COLUMNS order"""
+    return {c: typed_value(c, v) for c, v in zip(COLUMNS, values)}
+
+
+def coerce_frame(df):
+    """Give a journal frame the same dtypes parse_rows produces"""
+    df = df.reindex(columns=COLUMNS)
+    for col in COLUMNS:
+        if col in NUMERIC_COLS:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype('float64')
+        elif col in DATE_COLS:
+            df[col] = pd.to_datetime(df[col], format='ISO8601', errors='coerce').astype('datetime64[ns]')
+        elif df[col].dtype != 'category':
+            df[col] = df[col].fillna('').astype('str')
+    df.index = df.index.astype('int64').rename('Row')
+    return categorize(df)
+
+
+def set_cells(df, rows, column, value):
+    """df.loc[rows, column] = value; a new value of a category column is added to its categories first"""
+    dtype = df[column].dtype
+    if isinstance(dtype, pd.CategoricalDtype):
+        if value is None or value == '':
+            value = np.nan
+        elif value not in dtype.categories:
+            df[column] = df[column].cat.set_categories(sorted([*dtype.categories, value]))
+    df.loc[rows, column] = value
+
+
+def project(df, columns=None):
+    """Only `columns` of a journal frame (all of them when None)"""
+    return df if columns is None else df[list(columns)]
+
+
+def fill_ids(df):
+    """Give trades without a (unique) Trade ID a new one"""
+    ids = df[ID_COL].astype('str').str.strip()
+    missing = (ids == '') | ids.duplicated()
+    if missing.any():
+        df = df.copy()
+        df.loc[missing, ID_COL] = [new_trade_id() for _ in range(int(missing.sum()))]
+    return df
+
+
+# Kolom yang di sheet dihitung dari lot / harga. Backend lokal tidak menyimpannya
+# (NULL), selalu dihitung ulang saat load supaya ikut berubah kalau lot / harga diedit.
+DERIVED_COLS = ["Value (Buy)", "Change %", "P&L", "Change % (Custom)", "P&L (Custom)"]
+
+
+def fill_derived(df):
+    """Compute the DERIVED_COLS the sheet formulas would show (1 lot = 100 lembar)"""
+    shares = df['Qty Lot'] * 100
+    df['Value (Buy)'] = shares * df['Price (Buy)']
+    for price, change, pnl in (("Current Price", "Change %", "P&L"),
+                               ("Custom Price", "Change % (Custom)", "P&L (Custom)")):
+        df[change] = (df[price] / df['Price (Buy)'] - 1) * 100
+        df[pnl] = (df[price] - df['Price (Buy)']) * shares
+    return df
+
+
+def stored_frame(df):
+    """Journal frame as a local backend stores it: typed, with IDs, DERIVED_COLS empty"""
+    df = fill_ids(coerce_frame(df.copy()))
+    df[DERIVED_COLS] = np.nan
+    return df
+
+
+def apply_ops(df, ops):
+    """Journal frame with batch ops applied locally, for showing queued writes before they land"""
+    if not ops:
+        return df
+    appends, updates, deletes = split_ops(ops)
+    df = df.copy()
+    ids = df[ID_COL].to_numpy()
+    for key, cells in updates.items():
+        hit = ids == key
+        for column, value in cells.items():
+            if column not in df.columns:
+                continue    # frame proyeksi tanpa kolom ini
+            value = typed_value(column, value)
+            if value is None and column not in NUMERIC_COLS and column not in DATE_COLS:
+                value = ''
+            set_cells(df, hit, column, value)
+    # Append yang sudah masuk snapshot (commit selesai, status belum diperbarui) dilewati
+    known = set(ids)
+    appends = [values for values in appends if values[ID_COL_INDEX] not in known]
+    if appends:
+        start = int(df.index.max()) + 1 if len(df) else FIRST_DATA_ROW
+        new = pd.DataFrame([typed_record(values) for values in appends],
+                           index=range(start, start + len(appends)))
+        df = concat_frames([df, fill_derived(coerce_frame(new)).reindex(columns=df.columns)])
+    if deletes:
+        df = df[~df[ID_COL].isin(deletes)]
+    return df
+
+
+def _quote(column):
+    return '"' + column.replace('"', '""') + '"'
+
+
+class SQLiteJournalStore(JournalStore):
+    """Journal in a local SQLite file; trades are looked up by a unique Trade ID index.
+
+    Stock Code, Buy Date and Possition are indexed too. `load()` re-reads the
+    table only when a commit happened since the last read (tracked with
+    PRAGMA data_version, so writes from other processes are seen too).
+    """
+
+    def __init__(self, path=DEFAULT_PATHS["sqlite"]):
+        self.path = str(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._df = None
+        self._data_version = None
+        self.version = 0
+        self._create()
+
+    def _create(self):
+        types = {c: "REAL" if c in NUMERIC_COLS else "TEXT" for c in COLUMNS}
+        cols = ", ".join(f"{_quote(c)} {types[c]}" for c in COLUMNS)
+        with self._conn:
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS trades (id INTEGER PRIMARY KEY AUTOINCREMENT, {cols})")
+            # Database lama tanpa kolom Trade ID: tambah kolom lalu isi ID-nya
+            existing = {r[1] for r in self._conn.execute("PRAGMA table_info(trades)")}
+            if ID_COL not in existing:
+                self._conn.execute(f"ALTER TABLE trades ADD COLUMN {_quote(ID_COL)} TEXT")
+            missing = self._conn.execute(f"SELECT id FROM trades WHERE {_quote(ID_COL)} IS NULL").fetchall()
+            self._conn.executemany(f"UPDATE trades SET {_quote(ID_COL)} = ? WHERE id = ?",
+                                   [(new_trade_id(), r[0]) for r in missing])
+            self._conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS idx_trades_trade_id ON trades ({_quote(ID_COL)})")
+            for name, col in (("stock", "Stock Code"), ("buy_date", "Buy Date"), ("position", "Possition")):
+                self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_trades_{name} ON trades ({_quote(col)})")
+
+    @staticmethod
+    def _sql_value(value):
+        if isinstance(value, pd.Timestamp):
+            return value.isoformat(sep=' ')
+        return value
+
+    def _changed(self):
+        data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        changed = data_version != self._data_version
+        self._data_version = data_version
+        return changed
+
+    def load(self, max_age=None, columns=None):
+        with self._lock:
+            changed = self._changed()
+            if self._df is None or changed:
+                cols = ", ".join(_quote(c) for c in COLUMNS)
+                df = pd.read_sql_query(f"SELECT id, {cols} FROM trades ORDER BY id",
+                                       self._conn, index_col="id")
+                self._df = fill_derived(coerce_frame(df))
+                self.version += 1
+                self.synced_at = time.time()
+            return project(self._df, columns)
+
+    def invalidate(self):
+        self._df = None
+
+    def batch(self, ops):
+        appends, updates, deletes = split_ops(ops)
+        where = f"WHERE {_quote(ID_COL)} = ?"
+        with self._lock, self._conn:
+            for values in appends:
+                record = typed_record(values)
+                self._conn.execute(
+                    f"INSERT INTO trades ({', '.join(_quote(c) for c in COLUMNS)}) "
+                    f"VALUES ({', '.join('?' * len(COLUMNS))})",
+                    [self._sql_value(record[c]) for c in COLUMNS],
+                )
+            for trade_id, cells in updates.items():
+                sets = ", ".join(f"{_quote(c)} = ?" for c in cells)
+                params = [self._sql_value(typed_value(c, v)) for c, v in cells.items()]
+                cur = self._conn.execute(f"UPDATE trades SET {sets} {where}", params + [trade_id])
+                if cur.rowcount == 0:
+                    raise KeyError(f"Trade {trade_id} tidak ditemukan")
+            if deletes:
+                self._conn.executemany(f"DELETE FROM trades {where}", [(k,) for k in deletes])
+            # Koneksi sendiri tidak menaikkan data_version, jadi tandai manual
+            self._df = None
+            self.version += 1
+        return [values[ID_COL_INDEX] for values in appends]
+
+    def import_frame(self, df):
+        """Replace the whole table with a parsed journal DataFrame (e.g. from Sheets)"""
+        records = stored_frame(df)
+        rows = [[self._sql_value(None if pd.isna(v) or v == '' else v) for v in r]
+                for r in records.itertuples(index=False)]
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM trades")
+            self._conn.executemany(
+                f"INSERT INTO trades ({', '.join(_quote(c) for c in COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(COLUMNS))})",
+                rows,
+            )
+            self._df = None
+            self.version += 1
+
+
+class ParquetJournalStore(JournalStore):
+    """Journal in a single local Parquet file, kept in memory between writes.
+
+    Parquet cannot be updated in place, so each batch rewrites the file once
+    (atomically, via a temp file) regardless of how many ops it holds.
+    """
+
+    def __init__(self, path=DEFAULT_PATHS["parquet"]):
+        self.path = str(path)
+        self._lock = threading.Lock()
+        self._df = None         # isi file apa adanya
+        self._view = None       # + kolom formula, dipakai ulang sampai tulis berikutnya
+        self._pos = {}          # Trade ID -> index baris
+        self.version = 0
+
+    def _read(self):
+        if os.path.exists(self.path):
+            df = coerce_frame(pd.read_parquet(self.path))
+            with_ids = fill_ids(df)
+            if with_ids is not df:
+                # File lama / ID hilang: simpan ID baru supaya tetap sama antar proses
+                self._write(with_ids)
+                return
+        else:
+            df = coerce_frame(pd.DataFrame(columns=COLUMNS, index=pd.Index([], dtype='int64')))
+        self._set(df)
+
+    def _write(self, df):
+        tmp = self.path + ".tmp"
+        df.to_parquet(tmp)
+        os.replace(tmp, self.path)
+        self._set(df)
+
+    def _set(self, df):
+        self._df, self._view = df, None
+        self._pos = dict(zip(df[ID_COL], df.index))
+        self.version += 1
+        self.synced_at = time.time()
+
+    def load(self, max_age=None, columns=None):
+        with self._lock:
+            if self._df is None:
+                self._read()
+            if self._view is None:
+                self._view = fill_derived(self._df.copy())
+            return project(self._view, columns)
+
+    def invalidate(self):
+        self._df = None
+
+    def batch(self, ops):
+        appends, updates, deletes = split_ops(ops)
+        with self._lock:
+            if self._df is None:
+                self._read()
+            df = self._df.copy()
+            for trade_id, cells in updates.items():
+                if trade_id not in self._pos:
+                    raise KeyError(f"Trade {trade_id} tidak ditemukan")
+                for col, value in cells.items():
+                    value = typed_value(col, value)
+                    if value is None:
+                        value = '' if col not in NUMERIC_COLS and col not in DATE_COLS else np.nan
+                    set_cells(df, self._pos[trade_id], col, value)
+            df = df.drop(index=[self._pos[k] for k in deletes if k in self._pos])
+            if appends:
+                next_key = int(self._df.index.max()) + 1 if len(self._df) else 1
+                index = pd.Index(range(next_key, next_key + len(appends)), dtype='int64')
+                new = coerce_frame(pd.DataFrame([typed_record(v) for v in appends], index=index))
+                df = coerce_frame(concat_frames([df, new]))
+            self._write(df)
+            return [values[ID_COL_INDEX] for values in appends]
+
+    def import_frame(self, df):
+        """Replace the journal with a parsed journal DataFrame (e.g. from Sheets)"""
+        with self._lock:
+            self._write(stored_frame(df))
+
+
+# =========================================================================
+# BEBERAPA JURNAL SEKALIGUS
+# =========================================================================
+class MultiJournalStore(JournalStore):
+    """Several journals (e.g. one worksheet per year, one spreadsheet per account) read as one.
+
+    Members load in parallel on a thread pool and are concatenated with a
+    SOURCE_COL column naming the member; the combined frame is rebuilt only
+    when a member's version changes. Updates and deletes go to the member
+    holding the Trade ID, appends to the first member.
+    """
+
+    def __init__(self, stores):
+        self.stores = dict(stores)
+        self._pool = ThreadPoolExecutor(max_workers=min(8, len(self.stores)),
+                                        thread_name_prefix="journal-load")
+        self._lock = threading.Lock()
+        self._frames = {}       # kolom proyeksi -> (versi member, frame gabungan)
+        self._owner = {}        # Trade ID -> nama member
+
+    # Versi member hanya naik, jadi jumlahnya juga selalu naik
+    version = property(lambda self: sum(s.version for s in self.stores.values()))
+    revalidating = property(lambda self: any(s.revalidating for s in self.stores.values()))
+
+    @property
+    def synced_at(self):
+        return min((s.synced_at for s in self.stores.values() if s.synced_at is not None), default=None)
+
+    @property
+    def error(self):
+        return next((s.error for s in self.stores.values() if s.error is not None), None)
+
+    def load(self, max_age=None, columns=None):
+        # ID selalu ikut: dipakai untuk merutekan update / delete
+        if columns is not None:
+            columns = tuple(dict.fromkeys([*columns, ID_COL]))
+        # Versi dibaca sebelum load: kalau member berubah di tengah jalan, load berikutnya merakit ulang
+        versions = tuple(s.version for s in self.stores.values())
+        frames = list(self._pool.map(lambda store: store.load(max_age=max_age, columns=columns),
+                                     self.stores.values()))
+        with self._lock:
+            cached = self._frames.get(columns)
+            if cached is None or cached[0] != versions:
+                parts = [df.assign(**{SOURCE_COL: name}) for name, df in zip(self.stores, frames)]
+                df = concat_frames(parts)
+                self._owner = dict(zip(df[ID_COL], df[SOURCE_COL]))
+                cached = self._frames[columns] = (versions, df)
+            return cached[1]
+
+    def owner(self, key):
+        """Name of the member holding this Trade ID (KeyError if none)"""
+        if key not in self._owner:
+            self.load(max_age=float("inf"))
+        try:
+            return self._owner[key]
+        except KeyError:
+            raise KeyError(f"ID {key} tidak ditemukan di jurnal mana pun") from None
+
+    def batch(self, ops):
+        first = next(iter(self.stores))
+        routed = {name: [] for name in self.stores}
+        appended = set()
+        for op in ops:
+            if op[0] == "append":
+                appended.add(str(normalize_row(list(op[1]))[ID_COL_INDEX]).strip())
+                routed[first].append(op)
+            else:
+                routed[first if op[1] in appended else self.owner(op[1])].append(op)
+        # Tiap member ditulis terpisah: kalau satu gagal, member sebelumnya sudah tersimpan
+        ids = []
+        for name, member_ops in routed.items():
+            if member_ops:
+                ids += self.stores[name].batch(member_ops)
+        return ids
+
+    def invalidate(self):
+        for store in self.stores.values():
+            store.invalidate()
+
+    def close(self):
+        for store in self.stores.values():
+            store.close()
+        self._pool.shutdown(wait=False)
+
+
+def open_store(backend="sheets", path=None, open_ws=None, sync=None, poll_every=None):
+    """Build the JournalStore named by `backend`: 'sheets', 'sqlite' or 'parquet'"""
+    if backend == "sheets":
+        return SheetsJournalStore(open_ws, sync, poll_every=poll_every)
+    if backend == "sqlite":
+        return SQLiteJournalStore(path or DEFAULT_PATHS["sqlite"])
+    if backend == "parquet":
+        return ParquetJournalStore(path or DEFAULT_PATHS["parquet"])
+    raise ValueError(f"Backend jurnal tidak dikenal: {backend!r}")
+
+
+def copy_journal(source, target):
+    """Copy every trade from one store into a local store, e.g. Sheets -> SQLite"""
+    target.import_frame(source.load())
@@ -0,0 +1,36 @@
+import os
+import re
+from pathlib import Path
+
+import pandas as pd
+
+# Lokasi snapshot lokal (Parquet), bisa diganti lewat env var
+MIRROR_DIR = Path(os.environ.get("JOURNAL_MIRROR_DIR", ".journal_cache"))
+
+
+def mirror_path(key):
+    """Parquet file used to mirror the journal identified by `key`"""
+    safe = re.sub(r'[^A-Za-z0-9_.-]', '_', str(key))
+    return MIRROR_DIR / f"journal_{safe}.parquet"
+
+
+def save_snapshot(df, key):
+    """Atomically write the parsed journal DataFrame to the local mirror"""
+    path = mirror_path(key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix('.parquet.tmp')
+    df.to_parquet(tmp)
+    os.replace(tmp, path)
+
+
+def load_snapshot(key):
+    """Return (DataFrame, saved_at epoch seconds) from the mirror, or (None, None)"""
+    path = mirror_path(key)
+    if not path.exists():
+        return None, None
+    try:
+        return pd.read_parquet(path), path.stat().st_mtime
+    except Exception:
+        # Snapshot rusak / format lama - abaikan, nanti ditulis ulang
+        return None, None
+
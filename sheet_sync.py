@@ -0,0 +1,599 @@
+import bisect
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from gspread.utils import rowcol_to_a1
+
+from journal_data import categorize, concat_frames, new_trade_id, normalize_row, row_fingerprint
+from local_mirror import load_snapshot, save_snapshot
+
+
+def col_letter(col_idx):
+    """0-based column index -> sheet column letter"""
+    return rowcol_to_a1(1, col_idx + 1).rstrip('0123456789')
+
+
+def contiguous_spans(indexes):
+    """Group sorted indexes into contiguous (start, end) spans, end inclusive"""
+    spans = []
+    for i in indexes:
+        if spans and i == spans[-1][1] + 1:
+            spans[-1][1] = i
+        else:
+            spans.append([i, i])
+    return [tuple(s) for s in spans]
+
+
+class SheetSync:
+    """Keeps the last worksheet snapshot and re-fetches only rows that changed.
+
+    A delta sync reads just the manually-entered key columns, compares their
+    per-row fingerprints with the previous snapshot, then fetches and re-parses
+    only the changed/new rows. Formula columns (live prices, P&L) change without
+    any key edit, so a full read still happens every `full_every` seconds.
+
+    With a `mirror_key` every new snapshot is also written to a local Parquet
+    mirror, and `snapshot()` serves last-known data (memory, then mirror) right
+    away while revalidating against the sheet on a background thread.
+
+    With `formula_cols` the periodic refresh no longer re-reads the whole
+    sheet: after the delta sync it fetches only the formula columns some
+    view asked for through `want()` within the last two `full_every`
+    periods (key columns are always current through the delta probe). A
+    formula column that is wanted but was not read within `full_every`
+    (e.g. a view opened after a long pause) makes the snapshot stale, so it
+    is fetched on the next refresh instead of at the next periodic one.
+
+    With an `id_col` every data row carries a stable ID in that column (missing
+    or duplicated IDs are backfilled on sync) and `row_of(id)` maps it to the
+    current sheet row through a hash index, so writes never scan the sheet.
+    """
+
+    def __init__(self, parse, width, key_cols, first_row=2, full_every=300, mirror_key=None,
+                 append_from=None, id_col=None, id_header="ID", formula_cols=None):
+        self.parse = parse
+        self.width = width
+        self.key_cols = list(key_cols)
+        self.first_row = first_row
+        self.full_every = full_every
+        self.mirror_key = mirror_key
+        self.append_from = append_from or first_row
+        self.id_col = id_col
+        self.id_header = id_header
+        self.formula_cols = None if formula_cols is None else sorted(formula_cols)
+
+        self.header = []
+        self.rows = []
+        self.fingerprints = []
+        self.df = None
+        self.version = 0
+        self._saved_version = 0
+        self.last_full = 0.0
+        self.last_sync = 0.0
+        self.synced_at = None   # epoch detik data terakhir (dari sheet atau mirror)
+        self.error = None
+        self._force_full = False
+        self.row_ids = {}       # ID -> nomor baris sheet
+        self._wanted = {}       # index kolom -> kapan terakhir diminta view
+        self._col_read = {}     # index kolom formula -> kapan terakhir dibaca dari sheet
+        self._due = set()       # kolom formula yang diminta tapi sudah lama tidak dibaca
+        self._free = None       # index baris kosong berikutnya untuk ADD
+        self._claimed = set()   # baris yang sudah diklaim tapi belum terlihat di snapshot
+        self._dirty = set()     # baris yang baru ditulis app, dibaca ulang penuh di delta sync berikutnya
+        self._lock = threading.Lock()
+        self._bg_lock = threading.Lock()
+        self._bg = None
+
+    # -----------------------------------------------------------------
+    # Helpers
+    # -----------------------------------------------------------------
+    def _key(self, row):
+        return [row[c] if c < len(row) else '' for c in self.key_cols]
+
+    def _trim(self, keys):
+        """Drop trailing rows whose key cells are all empty"""
+        n = len(keys)
+        while n and not any(str(c).strip() for c in keys[n - 1]):
+            n -= 1
+        return n
+
+    def _key_ranges(self):
+        return [f"{col_letter(s)}{self.first_row}:{col_letter(e)}"
+                for s, e in contiguous_spans(sorted(self.key_cols))]
+
+    def _probe_keys(self, ws):
+        """Read only the key columns and rebuild one key list per row"""
+        spans = contiguous_spans(sorted(self.key_cols))
+        value_ranges = ws.batch_get(self._key_ranges())
+        n_rows = max((len(vr) for vr in value_ranges), default=0)
+        by_col = {}
+        for (start, end), vr in zip(spans, value_ranges):
+            for offset, col in enumerate(range(start, end + 1)):
+                by_col[col] = [r[offset] if offset < len(r) else '' for r in vr]
+                by_col[col] += [''] * (n_rows - len(by_col[col]))
+        return [[by_col[c][i] for c in self.key_cols] for i in range(n_rows)]
+
+    def _row_numbers(self, indexes):
+        return [self.first_row + i for i in indexes]
+
+    def _has_data(self, row):
+        return any(str(row[c]).strip() for c in self.key_cols if c != self.id_col)
+
+    def _row_id(self, i):
+        return str(self.rows[i][self.id_col]).strip()
+
+    def _is_free(self, i):
+        if i in self._claimed:
+            return False
+        return i >= len(self.rows) or not str(self.rows[i][0]).strip()
+
+    def _scan_free(self, start):
+        i = max(start, self.append_from - self.first_row)
+        while not self._is_free(i):
+            i += 1
+        return i
+
+    # -----------------------------------------------------------------
+    # ID -> row index
+    # -----------------------------------------------------------------
+    def row_of(self, row_id, row_ids=None):
+        """Current sheet row of the row with this ID (KeyError if unknown).
+
+        `row_ids`: an index read earlier, so several lookups see the same sync.
+        """
+        try:
+            return (self.row_ids if row_ids is None else row_ids)[row_id]
+        except KeyError:
+            raise KeyError(f"ID {row_id} tidak ditemukan di sheet") from None
+
+    def _index_ids(self, indexes=None, old_rows=None):
+        """Rebuild the ID index, or only for `indexes` whose previous content was `old_rows`"""
+        if self.id_col is None:
+            return []
+        # Index baru dirakit terpisah lalu dipasang sekaligus: penulis yang membaca
+        # row_ids tanpa lock tidak pernah melihat ID yang sedang dipindah
+        if indexes is None:
+            row_ids = {}
+            indexes = range(len(self.rows))
+        else:
+            row_ids = dict(self.row_ids)
+            for i in indexes:
+                old = old_rows[i] if i < len(old_rows) else None
+                old_id = str(old[self.id_col]).strip() if old else ''
+                if old_id and row_ids.get(old_id) == self.first_row + i:
+                    del row_ids[old_id]
+            indexes = [i for i in indexes if i < len(self.rows)]
+
+        missing = []
+        for i in indexes:
+            if not self._has_data(self.rows[i]):
+                continue
+            row_id = self._row_id(i)
+            if not row_id or row_id in row_ids:
+                # Kosong, atau duplikat hasil copy-paste baris
+                missing.append(i)
+            else:
+                row_ids[row_id] = self.first_row + i
+        self.row_ids = row_ids
+        return missing
+
+    def _header_missing(self):
+        """Sheet has a header row but not the ID column header (e.g. a 14-column journal)"""
+        if self.id_col is None or not any(str(c).strip() for c in self.header):
+            return False
+        return len(self.header) <= self.id_col or self.header[self.id_col] != self.id_header
+
+    def _backfill_ids(self, ws, missing):
+        """Write fresh IDs for rows without one plus the ID header if absent (single batch_update)
+        and patch the snapshot"""
+        col = col_letter(self.id_col)
+        data = []
+        if len(self.header) <= self.id_col or self.header[self.id_col] != self.id_header:
+            data.append({"range": f"{col}1", "values": [[self.id_header]]})
+        ids = {i: new_trade_id() for i in missing}
+        for start, end in contiguous_spans(missing):
+            data.append({"range": f"{col}{self.first_row + start}:{col}{self.first_row + end}",
+                         "values": [[ids[i]] for i in range(start, end + 1)]})
+        if not data:
+            return
+        ws.batch_update(data, value_input_option='RAW')
+
+        self.header = normalize_row(self.header, self.width)
+        self.header[self.id_col] = self.id_header
+        row_ids = dict(self.row_ids)
+        for i, row_id in ids.items():
+            self.rows[i][self.id_col] = row_id
+            self.fingerprints[i] = row_fingerprint(self._key(self.rows[i]))
+            row_ids[row_id] = self.first_row + i
+        self.row_ids = row_ids
+        rows = pd.Index(self._row_numbers(list(ids)))
+        present = rows.isin(self.df.index)
+        if present.any():
+            self.df = self.df.copy()
+            self.df.loc[rows[present], self.id_header] = [ids[i] for i, p in zip(ids, present) if p]
+        self.version += 1
+
+    def patch_rows(self, cells):
+        """Apply cells just written to the sheet ({row number: {col index: value}}) to the snapshot.
+
+        Saves a re-read after every write; the rows are still fetched in full
+        (formula values, the sheet's own formatting) on the next delta sync.
+        """
+        with self._lock:
+            if self.df is None or not cells:
+                return
+            old_rows = list(self.rows)
+            indexes = sorted(n - self.first_row for n in cells if n >= self.first_row)
+            for i in indexes:
+                while len(self.rows) <= i:
+                    self.rows.append([''] * self.width)
+                    self.fingerprints.append(row_fingerprint(self._key([''] * self.width)))
+                row = list(self.rows[i])
+                for c, value in cells[self.first_row + i].items():
+                    row[c] = '' if value is None else str(value)
+                self.rows[i] = row
+                self.fingerprints[i] = row_fingerprint(self._key(row))
+            self._dirty.update(indexes)
+            self._claimed -= {i for i in indexes if str(self.rows[i][0]).strip()}
+
+            row_numbers = self._row_numbers(indexes)
+            df = self.df[~self.df.index.isin(row_numbers)]
+            part = self.parse([self.rows[i] for i in indexes], row_numbers)
+            self.df = concat_frames([df, part]).sort_index() if not part.empty else df
+            self._index_ids(indexes, old_rows)
+            self.version += 1
+
+    def remove_rows(self, row_numbers):
+        """Apply rows deleted on the sheet to the snapshot so the next delta sees no shift"""
+        with self._lock:
+            if self.df is None:
+                return
+            gone = sorted(n - self.first_row for n in row_numbers
+                          if 0 <= n - self.first_row < len(self.rows))
+            if not gone:
+                return
+            for i in reversed(gone):
+                del self.rows[i]
+                del self.fingerprints[i]
+
+            def shift(i):
+                return i - bisect.bisect_left(gone, i)
+
+            df = self.df[~self.df.index.isin(self._row_numbers(gone))]
+            index = df.index.to_numpy()
+            offsets = np.searchsorted(np.asarray(self._row_numbers(gone)), index, side='left')
+            df.index = pd.Index(index - offsets, name=df.index.name, dtype=df.index.dtype)
+            self.df = df
+            self._claimed = {shift(i) for i in self._claimed if i not in gone}
+            self._dirty = {shift(i) for i in self._dirty if i not in gone}
+            if self._free is not None:
+                self._free = shift(self._free)
+            self._index_ids()
+            self.version += 1
+
+    # -----------------------------------------------------------------
+    # Compare-and-swap check sebelum tulis
+    # -----------------------------------------------------------------
+    def stale_rows(self, ws, row_numbers):
+        """Rows whose live key cells (ID included) no longer match the snapshot fingerprint.
+
+        One batch_get for all rows; an empty row is expected to still be empty.
+        """
+        if not row_numbers:
+            return []
+        last_col = col_letter(self.width - 1)
+        live = ws.batch_get([f"A{n}:{last_col}{n}" for n in row_numbers])
+        empty = row_fingerprint(self._key([''] * self.width))
+        stale = []
+        with self._lock:
+            for n, vr in zip(row_numbers, live):
+                i = n - self.first_row
+                expected = self.fingerprints[i] if 0 <= i < len(self.fingerprints) else empty
+                row = normalize_row(vr[0] if vr else [], self.width)
+                if row_fingerprint(self._key(row)) != expected:
+                    stale.append(n)
+        return stale
+
+    # -----------------------------------------------------------------
+    # Next empty row pointer
+    # -----------------------------------------------------------------
+    def claim_free_row(self):
+        """Reserve the next empty sheet row (column A blank) without reading the sheet"""
+        with self._lock:
+            if self._free is None:
+                self._free = self._scan_free(0)
+            i = self._free
+            self._claimed.add(i)
+            self._free = self._scan_free(i + 1)
+            return self.first_row + i
+
+    def release_row(self, row_number):
+        """Give back a claimed row whose write failed"""
+        with self._lock:
+            i = row_number - self.first_row
+            self._claimed.discard(i)
+            if self._free is None or (i < self._free and self._is_free(i)):
+                self._free = i
+
+    # -----------------------------------------------------------------
+    # Sync
+    # -----------------------------------------------------------------
+    def refresh(self, ws, force_full=False, max_age=0):
+        """Bring the snapshot up to date with `ws` and return the parsed DataFrame.
+
+        Skipped when another thread synced less than `max_age` seconds ago.
+        """
+        with self._lock:
+            if max_age and self.df is not None and not (force_full or self._force_full) \
+                    and not self.is_stale(max_age):
+                return self.df
+            stale = time.monotonic() - self.last_full >= self.full_every
+            if self.df is None or force_full or self._force_full or (stale and self.formula_cols is None):
+                missing = self._full_sync(ws)
+            else:
+                missing = self._delta_sync(ws)
+                due = set(self._due)
+                cols = due | set(self._wanted_formula_cols()) if stale else due
+                self._refresh_columns(ws, sorted(cols))
+                self._due -= due
+                if stale:
+                    self.last_full = time.monotonic()
+            if missing or self._header_missing():
+                try:
+                    self._backfill_ids(ws, missing)
+                except Exception:
+                    pass  # dicoba lagi di full sync berikutnya
+            self.last_sync = time.monotonic()
+            self.synced_at = time.time()
+            if self.mirror_key and self.version != self._saved_version:
+                try:
+                    save_snapshot(self.df, self.mirror_key)
+                    self._saved_version = self.version
+                except OSError:
+                    pass  # mirror hanya cache, gagal tulis tidak fatal
+            return self.df
+
+    # -----------------------------------------------------------------
+    # Proyeksi kolom
+    # -----------------------------------------------------------------
+    def want(self, cols):
+        """Record that a view reads these column indexes"""
+        now = time.monotonic()
+        for c in cols:
+            self._wanted[c] = now
+            if self.formula_cols is not None and c in self.formula_cols \
+                    and now - self._col_read.get(c, -np.inf) >= self.full_every:
+                self._due.add(c)
+
+    def _wanted_formula_cols(self):
+        since = time.monotonic() - 2 * self.full_every
+        return [c for c in self.formula_cols if self._wanted.get(c, -np.inf) >= since]
+
+    def _refresh_columns(self, ws, cols):
+        """Re-read whole columns (one batch_get) and re-parse if any cell changed"""
+        if not cols or not self.rows:
+            return
+        spans = contiguous_spans(cols)
+        last_row = self.first_row + len(self.rows) - 1
+        ranges = [f"{col_letter(s)}{self.first_row}:{col_letter(e)}{last_row}" for s, e in spans]
+        value_ranges = ws.batch_get(ranges)
+        now = time.monotonic()
+        for c in cols:
+            self._col_read[c] = now
+        changed = False
+        for (start, end), vr in zip(spans, value_ranges):
+            for i, row in enumerate(self.rows):
+                cells = vr[i] if i < len(vr) else []
+                for offset, c in enumerate(range(start, end + 1)):
+                    value = cells[offset] if offset < len(cells) else ''
+                    if row[c] != value:
+                        row[c] = value
+                        changed = True
+        if changed:
+            self.df = self.parse(self.rows, self._row_numbers(range(len(self.rows))))
+            self.version += 1
+
+    # -----------------------------------------------------------------
+    # Stale-while-revalidate
+    # -----------------------------------------------------------------
+    @property
+    def rows_loaded(self):
+        """True once raw rows came from the sheet (not only from the mirror)"""
+        return self.last_full > 0
+
+    @property
+    def revalidating(self):
+        return self._bg is not None and self._bg.is_alive()
+
+    def is_stale(self, max_age):
+        return bool(self._due) or time.monotonic() - self.last_sync >= max_age
+
+    def invalidate(self):
+        """Mark the snapshot stale; the next refresh re-reads the whole sheet (formula values too)"""
+        self.last_sync = 0.0
+        self._force_full = True
+
+    def _load_mirror(self):
+        with self._lock:
+            if self.df is not None:
+                return
+            df, saved_at = load_snapshot(self.mirror_key)
+            if df is not None and self.id_col is not None and self.id_header not in df.columns:
+                df = None   # mirror format lama tanpa kolom ID
+            if df is not None:
+                self.df = categorize(df)    # mirror lama: posisi / kode saham masih teks
+                self.synced_at = saved_at
+                self.version += 1
+                self._saved_version = self.version
+
+    def snapshot(self, open_ws, max_age):
+        """Return last-known data immediately; refresh in the background once older than `max_age`"""
+        if self.df is None and self.mirror_key:
+            self._load_mirror()
+        if self.df is None:
+            # Belum ada data sama sekali - terpaksa menunggu sheet (atau poller yang sedang membaca)
+            return self.refresh(open_ws(), max_age=max_age)
+        if self.is_stale(max_age):
+            self.revalidate(open_ws)
+        return self.df
+
+    def revalidate(self, open_ws, wait=False, max_age=0):
+        """Start a single background refresh unless one is already running"""
+        with self._bg_lock:
+            if not self.revalidating:
+                self._bg = threading.Thread(target=self._revalidate, args=(open_ws, max_age), daemon=True)
+                self._bg.start()
+            bg = self._bg
+        if wait:
+            bg.join()
+
+    def _revalidate(self, open_ws, max_age=0):
+        try:
+            self.refresh(open_ws(), max_age=max_age)
+            self.error = None
+        except Exception as e:
+            # Sheets down / quota habis: tetap tampilkan data terakhir
+            self.error = e
+
+    def _full_sync(self, ws):
+        values = ws.get_all_values()
+        self.header = values[0] if values else []
+        rows = [normalize_row(r, self.width) for r in values[self.first_row - 1:]]
+        keys = [self._key(r) for r in rows]
+        n = self._trim(keys)
+
+        self.rows = rows[:n]
+        self.fingerprints = [row_fingerprint(k) for k in keys[:n]]
+        self.df = self.parse(self.rows, self._row_numbers(range(n)))
+        self._claimed = {i for i in self._claimed if i >= n or not str(self.rows[i][0]).strip()}
+        self._free = self._scan_free(0)
+        self._dirty = set()
+        self.version += 1
+        self.last_full = time.monotonic()
+        for c in self.formula_cols or []:
+            self._col_read[c] = self.last_full
+        self._due.clear()
+        self._force_full = False
+        return self._index_ids()
+
+    def _delta_sync(self, ws):
+        keys = self._probe_keys(ws)
+        keys = keys[:self._trim(keys)]
+        fps = [row_fingerprint(k) for k in keys]
+
+        old = self.fingerprints
+        changed = [i for i, fp in enumerate(fps) if i >= len(old) or fp != old[i] or i in self._dirty]
+        removed = list(range(len(fps), len(old)))
+        self._dirty = set()
+        if not changed and not removed:
+            return []
+        old_rows = self.rows
+
+        rows = self.rows[:len(fps)]
+        rows += [[''] * self.width for _ in range(len(fps) - len(rows))]
+
+        if changed:
+            last_col = col_letter(self.width - 1)
+            spans = contiguous_spans(changed)
+            ranges = [f"A{self.first_row + s}:{last_col}{self.first_row + e}" for s, e in spans]
+            for (start, end), vr in zip(spans, ws.batch_get(ranges)):
+                for offset in range(end - start + 1):
+                    raw = vr[offset] if offset < len(vr) else []
+                    rows[start + offset] = normalize_row(raw, self.width)
+
+        self.rows = rows
+        self.fingerprints = fps
+
+        # Geser pointer baris kosong hanya di sekitar baris yang berubah
+        self._claimed = {i for i in self._claimed if i >= len(rows) or not str(rows[i][0]).strip()}
+        if self._free is not None:
+            emptied = [i for i in changed if self._is_free(i)]
+            self._free = min([self._free, len(rows)] + emptied)
+            self._free = self._scan_free(self._free)
+
+        dropped = set(self._row_numbers(changed + removed))
+        df = self.df[~self.df.index.isin(dropped)]
+        if changed:
+            part = self.parse([rows[i] for i in changed], self._row_numbers(changed))
+            if not part.empty:
+                df = concat_frames([df, part])
+        self.df = df.sort_index()
+        self.version += 1
+        return self._index_ids(changed + removed, old_rows)
+
+
+class SheetPoller:
+    """One background refresher per SheetSync, shared by every session of the process.
+
+    Sessions only read the published snapshot (`sync.df` is replaced on each
+    sync, never changed in place), so the sheet is read once per `interval`
+    no matter how many viewers are connected. `notify()` polls right away,
+    e.g. after an invalidation. Polling pauses once nobody has called
+    `touch()` for `idle_after` seconds and resumes on the next read.
+
+    A failed poll leaves `last_sync` behind, so the next one is timed from
+    the attempt instead: `interval`, doubled after each further failure up
+    to `max_backoff` seconds, back to normal after a successful sync.
+
+    `stop()` ends the thread after the poll in progress (if any).
+    """
+
+    def __init__(self, sync, open_ws, interval=30, idle_after=300, max_backoff=300):
+        self.sync = sync
+        self.open_ws = open_ws
+        self.interval = interval
+        self.idle_after = idle_after
+        self.max_backoff = max_backoff
+        self.polls = 0
+        self.failures = 0       # poll gagal berturut-turut
+        self.last_attempt = 0.0
+        self.last_read = time.monotonic()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @property
+    def idle(self):
+        return time.monotonic() - self.last_read >= self.idle_after
+
+    def touch(self):
+        """A session read the snapshot; wakes the poller if it was idle"""
+        idle = self.idle
+        self.last_read = time.monotonic()
+        if idle:
+            self._wake.set()
+
+    def notify(self):
+        self._wake.set()
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+
+    def _due(self):
+        """Seconds until the next poll"""
+        if self.failures:
+            # Sheets sedang gagal: mundur bertahap, jangan langsung coba lagi
+            backoff = min(self.interval * 2 ** (self.failures - 1), self.max_backoff)
+            return backoff - (time.monotonic() - self.last_attempt)
+        return self.interval - (time.monotonic() - self.sync.last_sync)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.wait(None if self.idle else max(self._due(), 0))
+            self._wake.clear()
+            if self._stopped.is_set():
+                break
+            # Tanpa pembaca tidak perlu polling; sync lain (mis. setelah tulis) sudah cukup baru.
+            # invalidate() menolkan last_sync, jadi selalu dianggap basi.
+            if self.idle or not self.sync.is_stale(self.interval):
+                continue
+            # Lewat revalidate: tetap satu refresh sekaligus, error tercatat di sync.error.
+            # max_age: load pertama yang sedang jalan di thread lain tidak diulang.
+            self.last_attempt = time.monotonic()
+            self.sync.revalidate(self.open_ws, wait=True, max_age=self.interval)
+            self.polls += 1
+            self.failures = 0 if self.sync.error is None else self.failures + 1
@@ -0,0 +1,239 @@
+import itertools
+import threading
+import time
+
+from journal_data import ID_COL_INDEX, new_trade_id, normalize_row
+from sheet_sync import col_letter, contiguous_spans
+
+
+def cells_update_data(row_number, cells):
+    """batch_update payload for the given {column index: value} cells of one sheet row"""
+    return [
+        {
+            "range": f"{col_letter(start)}{row_number}:{col_letter(end)}{row_number}",
+            "values": [[cells[c] for c in range(start, end + 1)]],
+        }
+        for start, end in contiguous_spans(sorted(cells))
+    ]
+
+
+def row_cells(values):
+    """{column index: value} of a new row; empty cells are skipped so formulas stay intact"""
+    return {i: v for i, v in enumerate(values) if v != ""}
+
+
+def row_update_data(row_number, values):
+    """batch_update payload for one sheet row (see row_cells)"""
+    return cells_update_data(row_number, row_cells(values))
+
+
+def delete_rows_request(ws, row_numbers):
+    """Spreadsheet batch_update body deleting rows bottom-up so indexes stay valid"""
+    return {
+        "requests": [
+            {"deleteDimension": {"range": {
+                "sheetId": ws.id, "dimension": "ROWS",
+                "startIndex": row - 1, "endIndex": row,
+            }}}
+            for row in sorted(row_numbers, reverse=True)
+        ]
+    }
+
+
+def grid_rows(ws):
+    """Row count of the worksheet grid, from freshly fetched spreadsheet metadata"""
+    for sheet in ws.spreadsheet.fetch_sheet_metadata()["sheets"]:
+        if sheet["properties"]["sheetId"] == ws.id:
+            return sheet["properties"]["gridProperties"]["rowCount"]
+    raise KeyError(f"Worksheet {ws.id} tidak ada di spreadsheet")
+
+
+def append_rows_request(ws, count):
+    """Spreadsheet batch_update body adding `count` empty rows below the grid.
+
+    Relative, unlike Worksheet.add_rows (a resize to an absolute size computed
+    from the handle's possibly outdated row count, which can shrink the sheet).
+    """
+    return {"requests": [{"appendDimension": {"sheetId": ws.id, "dimension": "ROWS", "length": count}}]}
+
+
+class WriteConflict(RuntimeError):
+    """Target rows kept changing on the sheet while resolving a write"""
+
+
+# Gagal karena isi jurnal / sheet, bukan gangguan sementara: dicoba ulang pun hasilnya sama
+PERMANENT_ERRORS = (KeyError, ValueError, WriteConflict)
+
+
+class WriteQueue:
+    """Write-behind queue for journal mutations, flushed by a background worker.
+
+    Edits to the same trade are merged into one write and a delete drops any
+    pending edits of its trade (they end committed or failed with the delete). Each flush hands everything queued so far to
+    a single `store.batch()` call (for Sheets: one batch_update for values,
+    one for row deletes), retrying with exponential backoff before marking
+    the batch as failed. PERMANENT_ERRORS (unknown trade, bad value, rows
+    that kept changing) fail the batch right away.
+
+    Until a mutation is committed or failed it is listed by `pending_ops()`,
+    so the UI can show it right away (optimistic apply); a failed write
+    simply drops out of that list, which rolls the local view back.
+
+    `close()` stops accepting mutations; the worker writes what is already
+    queued, then exits.
+    """
+
+    def __init__(self, store, flush_delay=0.5, max_retries=4, backoff=1.0):
+        self._store = store
+        self.flush_delay = flush_delay
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+        self.status = {}        # id -> {'state': pending/committed/failed, 'label', 'error'}
+        self.revision = 0       # naik tiap kali isi pending_ops() berubah
+        self._ops = {}          # id -> op yang belum committed/failed, urut masuk antrian
+        self._inflight_deletes = set()
+        self._closed = False
+        self._ids = itertools.count(1)
+        self._cond = threading.Condition()
+        self._reset()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _reset(self):
+        self._appends = []      # [(id, values)]
+        self._updates = {}      # key -> {column: value}
+        self._deletes = {}      # key -> [id] delete + edit yang digantikannya
+        self._row_ids = {}      # key -> [id] untuk update yang digabung
+
+    def _submit(self, label):
+        if self._closed:
+            raise RuntimeError("Antrian tulis sudah ditutup")
+        if len(self.status) > 500:
+            # Buang status lama yang sudah selesai
+            done = [i for i, s in list(self.status.items()) if s['state'] != 'pending']
+            for i in done[:len(done) // 2]:
+                del self.status[i]
+        mutation_id = next(self._ids)
+        self.status[mutation_id] = {'state': 'pending', 'label': label, 'error': None}
+        self.revision += 1
+        return mutation_id
+
+    # -----------------------------------------------------------------
+    # Public API
+    # -----------------------------------------------------------------
+    def append(self, values, label=''):
+        """Queue a new trade row (formula cells left empty); returns the mutation id"""
+        values = normalize_row(list(values))
+        if not str(values[ID_COL_INDEX]).strip():
+            # ID dibuat sekarang supaya trade baru bisa langsung diedit / dihapus sebelum tersimpan
+            values[ID_COL_INDEX] = new_trade_id()
+        with self._cond:
+            mutation_id = self._submit(label)
+            self._appends.append((mutation_id, values))
+            self._ops[mutation_id] = ('append', values)
+            self._cond.notify()
+            return mutation_id
+
+    def update(self, key, cells, label=''):
+        """Queue {column name: value} edits for a trade; returns the mutation id"""
+        with self._cond:
+            mutation_id = self._submit(label)
+            if key in self._deletes or key in self._inflight_deletes:
+                self._finish([mutation_id], 'failed', 'Baris sudah dihapus')
+                return mutation_id
+            self._updates.setdefault(key, {}).update(cells)
+            self._row_ids.setdefault(key, []).append(mutation_id)
+            self._ops[mutation_id] = ('update', key, dict(cells))
+            self._cond.notify()
+            return mutation_id
+
+    def delete(self, key, label=''):
+        """Queue deletion of a trade; returns the mutation id"""
+        with self._cond:
+            mutation_id = self._submit(label)
+            if key in self._inflight_deletes:
+                # Key lama, snapshot belum ikut hapus yang sedang dikirim
+                self._finish([mutation_id], 'failed', 'Baris sudah dihapus')
+                return mutation_id
+            # Edit yang belum terkirim ke trade ini tidak perlu ditulis lagi,
+            # tapi statusnya baru selesai bersama delete (bisa saja delete gagal)
+            self._updates.pop(key, None)
+            self._deletes.setdefault(key, []).extend([mutation_id, *self._row_ids.pop(key, [])])
+            self._ops[mutation_id] = ('delete', key)
+            self._cond.notify()
+            return mutation_id
+
+    def pending_ops(self):
+        """Batch ops of every mutation not yet committed or failed, in submission order"""
+        with self._cond:
+            return list(self._ops.values())
+
+    def close(self):
+        """Refuse new mutations and let the worker exit once the queue is flushed"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+
+    @property
+    def pending(self):
+        return sum(1 for s in list(self.status.values()) if s['state'] == 'pending')
+
+    def wait(self, timeout=None):
+        """Block until every queued mutation has been committed or failed"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.pending:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    # -----------------------------------------------------------------
+    # Worker
+    # -----------------------------------------------------------------
+    def _finish(self, ids, state, error=None):
+        with self._cond:
+            for mutation_id in ids:
+                self.status[mutation_id].update(state=state, error=error)
+                self._ops.pop(mutation_id, None)
+            self.revision += 1
+
+    def _has_work(self):
+        return bool(self._appends or self._updates or self._deletes)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._has_work():
+                    if self._closed:
+                        return
+                    self._cond.wait()
+            # Tunggu sebentar supaya klik berikutnya ikut digabung dalam satu batch
+            time.sleep(self.flush_delay)
+            with self._cond:
+                appends, updates, deletes, row_ids = (
+                    self._appends, self._updates, self._deletes, self._row_ids
+                )
+                self._inflight_deletes = set(deletes)
+                self._reset()
+            self._flush(appends, updates, deletes, row_ids)
+            with self._cond:
+                self._inflight_deletes = set()
+
+    def _flush(self, appends, updates, deletes, row_ids):
+        ids = [i for i, _ in appends] + [i for k in updates for i in row_ids.get(k, [])]
+        ids += [i for group in deletes.values() for i in group]
+        ops = [('append', values) for _, values in appends]
+        ops += [('update', key, cells) for key, cells in updates.items()]
+        ops += [('delete', key) for key in deletes]
+        for attempt in range(self.max_retries + 1):
+            try:
+                # Store ikut menyegarkan snapshot dulu, baru status committed (UI rerun setelahnya)
+                self._store.batch(ops)
+                break
+            except Exception as e:
+                if attempt == self.max_retries or isinstance(e, PERMANENT_ERRORS):
+                    self._finish(ids, 'failed', str(e))
+                    return
+                time.sleep(self.backoff * 2 ** attempt)
+        self._finish(ids, 'committed')
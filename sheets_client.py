@@ -0,0 +1,268 @@
+import functools
+import os
+import random
+import threading
+import time
+from datetime import datetime, timezone
+
+import gspread
+import requests
+from google.auth.transport.requests import Request
+from gspread.exceptions import APIError
+
+# Status yang layak dicoba ulang: kuota (429) dan error sementara server
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# Atribut gspread yang hasilnya spreadsheet/worksheet -> ikut dibungkus limiter
+_HANDLE_ATTRS = {"open", "open_by_key", "open_by_url", "sheet1", "worksheet", "worksheets",
+                 "get_worksheet", "get_worksheet_by_id", "add_worksheet", "duplicate", "spreadsheet"}
+# Properti yang diam-diam memanggil API (bukan method)
+_API_PROPERTIES = {"sheet1"}
+# Atribut yang cuma pegangan lokal, tidak menghabiskan kuota
+_LOCAL_ATTRS = {"spreadsheet"}
+# Call baca: aman diulang setelah error apa pun. Selain ini dianggap tulis
+# (batch_update, delete_rows, append_row, ...) dan hanya diulang setelah 429.
+_READ_ATTRS = {"open", "open_by_key", "open_by_url", "openall", "list_spreadsheet_files", "sheet1",
+               "worksheet", "worksheets", "get_worksheet", "get_worksheet_by_id", "fetch_sheet_metadata",
+               "get", "get_values", "batch_get", "get_all_values", "get_all_records", "row_values",
+               "col_values", "acell", "cell", "range", "find", "findall", "values_get",
+               "values_batch_get", "export"}
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, bursts up to `capacity`"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    @property
+    def remaining(self):
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+    def acquire(self):
+        """Take one token, sleeping until one is available; returns seconds waited"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def drain(self):
+        """Server said 429: our estimate was too generous, make everyone wait"""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens, 0.0)
+
+
+def is_retryable(exc):
+    if isinstance(exc, APIError):
+        return getattr(exc.response, "status_code", None) in RETRY_STATUS
+    return isinstance(exc, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+
+
+def is_grid_error(exc):
+    """400 for a range past the worksheet grid (values writes never add rows)"""
+    return (isinstance(exc, APIError) and getattr(exc.response, "status_code", None) == 400
+            and "exceeds grid limits" in str(exc))
+
+
+def is_throttled(exc):
+    """429: the request was refused before doing anything, so even a write can be resent"""
+    return isinstance(exc, APIError) and getattr(exc.response, "status_code", None) == 429
+
+
+class SheetsRateLimiter:
+    """Shared budget for Google Sheets API calls with jittered exponential backoff.
+
+    Every call takes a token first; a 429 / 5xx / connection error drains the
+    bucket and is retried after a random sleep in [0, min(max_backoff,
+    backoff * 2**attempt)] ("full jitter"), up to `max_retries` times.
+
+    Writes (`call_write`) are only retried after a 429. After a 5xx or a
+    timeout the write may already have been applied, and resending e.g. a
+    row delete would remove the next row, so the error goes back to the
+    caller, which checks the sheet before writing again.
+    """
+
+    def __init__(self, per_minute=60, burst=10, max_retries=5, backoff=1.0, max_backoff=32.0):
+        self.bucket = TokenBucket(per_minute / 60.0, burst)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "throttled": 0, "retries": 0, "failed": 0, "waited": 0.0}
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self._stats[key] += amount
+
+    def call(self, fn, *args, **kwargs):
+        """fn(*args, **kwargs) for a read: retried on 429 / 5xx / connection errors"""
+        return self._call(is_retryable, fn, args, kwargs)
+
+    def call_write(self, fn, *args, **kwargs):
+        """fn(*args, **kwargs) for a write: retried on 429 only"""
+        return self._call(is_throttled, fn, args, kwargs)
+
+    def _call(self, retryable, fn, args, kwargs):
+        for attempt in range(self.max_retries + 1):
+            self._count("waited", self.bucket.acquire())
+            self._count("calls")
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                if not retryable(e):
+                    raise
+                if getattr(getattr(e, "response", None), "status_code", None) == 429:
+                    self._count("throttled")
+                    self.bucket.drain()
+                if attempt == self.max_retries:
+                    self._count("failed")
+                    raise
+                self._count("retries")
+                time.sleep(random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt)))
+
+    def metrics(self):
+        """Snapshot: remaining/capacity tokens, calls, throttled (429s), retries, failed, waited seconds"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update(remaining=self.bucket.remaining, capacity=self.bucket.capacity)
+        return stats
+
+
+# Satu limiter untuk semua sesi di proses ini (kuota Sheets dihitung per service account)
+LIMITER = SheetsRateLimiter(
+    per_minute=int(os.environ.get("SHEETS_REQUESTS_PER_MIN", 60)),
+    burst=int(os.environ.get("SHEETS_BURST", 10)),
+)
+
+
+class RateLimited:
+    """Proxy routing every gspread call of a client/spreadsheet/worksheet through a limiter.
+
+    Reads (_READ_ATTRS) go through `limiter.call`, everything else through
+    `limiter.call_write`.
+    """
+
+    def __init__(self, target, limiter=LIMITER):
+        self._target = target
+        self._limiter = limiter
+
+    def _wrap(self, name, value):
+        if name not in _HANDLE_ATTRS:
+            return value
+        if isinstance(value, list):
+            return [RateLimited(v, self._limiter) for v in value]
+        return RateLimited(value, self._limiter)
+
+    def __getattr__(self, name):
+        if name in _API_PROPERTIES:
+            return self._wrap(name, self._limiter.call(getattr, self._target, name))
+        value = getattr(self._target, name)
+        if name in _LOCAL_ATTRS or name.startswith("_") or not callable(value):
+            return self._wrap(name, value)
+
+        call = self._limiter.call if name in _READ_ATTRS else self._limiter.call_write
+
+        @functools.wraps(value)
+        def limited(*args, **kwargs):
+            return self._wrap(name, call(value, *args, **kwargs))
+        return limited
+
+
+def rate_limited(client, limiter=LIMITER):
+    """Wrap an authorized gspread client so all its API calls share `limiter`"""
+    return RateLimited(client, limiter)
+
+
+class SheetsPool:
+    """One authorized client per process plus cached Spreadsheet / Worksheet handles.
+
+    gspread keeps a single AuthorizedSession (keep-alive HTTP connections) per
+    client, so reusing the client and its handles turns `open_by_key` +
+    `sheet1` (two metadata round-trips) into a dict lookup. A daemon thread
+    refreshes the OAuth token `refresh_margin` seconds before it expires, so
+    requests never stop to re-authorize; `close()` stops it.
+    """
+
+    def __init__(self, credentials, limiter=LIMITER, refresh_margin=300):
+        self.credentials = credentials
+        self.client = rate_limited(gspread.authorize(credentials), limiter)
+        self.refresh_margin = refresh_margin
+        self.token_refreshes = 0
+        self.error = None
+        self._handles = {}
+        self._opening = {}      # key -> lock selama handle sedang dibuka
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        if hasattr(credentials, "refresh"):
+            threading.Thread(target=self._keep_fresh, daemon=True).start()
+
+    def _handle(self, key, open_handle):
+        with self._lock:
+            if key in self._handles:
+                return self._handles[key]
+            opening = self._opening.setdefault(key, threading.Lock())
+        # Thread lain yang minta handle sama menunggu, bukan ikut membuka
+        with opening:
+            with self._lock:
+                if key in self._handles:
+                    return self._handles[key]
+            handle = open_handle()
+            with self._lock:
+                self._handles[key] = handle
+                self._opening.pop(key, None)
+            return handle
+
+    def spreadsheet(self, spreadsheet_id):
+        return self._handle((spreadsheet_id,), lambda: self.client.open_by_key(spreadsheet_id))
+
+    def worksheet(self, spreadsheet_id, title=None):
+        """Cached worksheet handle; `title=None` is the first sheet"""
+        def open_handle():
+            spreadsheet = self.spreadsheet(spreadsheet_id)
+            return spreadsheet.sheet1 if title is None else spreadsheet.worksheet(title)
+        return self._handle((spreadsheet_id, title), open_handle)
+
+    def forget(self, spreadsheet_id=None):
+        """Drop cached handles (e.g. after a worksheet was renamed or deleted)"""
+        with self._lock:
+            for key in [k for k in self._handles if spreadsheet_id in (None, k[0])]:
+                del self._handles[key]
+
+    def close(self):
+        self._stopped.set()
+
+    def _keep_fresh(self):
+        while not self._stopped.is_set():
+            expiry = self.credentials.expiry
+            if self.credentials.token and expiry is not None:
+                # expiry google-auth: UTC naive
+                now = datetime.now(timezone.utc).replace(tzinfo=None)
+                wait = (expiry - now).total_seconds() - self.refresh_margin
+                if wait > 0:
+                    self._stopped.wait(wait)
+                    continue
+            try:
+                self.credentials.refresh(Request())
+                self.token_refreshes += 1
+                self.error = None
+            except Exception as e:
+                self.error = e
+                self._stopped.wait(30)
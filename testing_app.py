@@ -1,11 +1,17 @@
 import streamlit as st
-import gspread
 from google.oauth2.service_account import Credentials
+from streamlit.errors import StreamlitSecretNotFoundError
 import pandas as pd
 from datetime import datetime, timedelta
 import plotly.graph_objects as go
 import plotly.express as px
 
+from journal_export import export_bytes
+from journal_data import COLUMNS, FORMULA_COL_INDEXES, ID_COL, ID_COL_INDEX, INPUT_COL_INDEXES, categorize
+from journal_store import MultiJournalStore, open_store
+from sheet_sync import SheetSync
+from sheets_client import SheetsPool
+
 # Page config
 st.set_page_config(
     page_title="IDX Trading Journal",
@@ -204,8 +210,25 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+def secret(name, default=None):
+    """Secret value, or `default` when there is no secrets.toml (init_connection reports that)"""
+    try:
+        return st.secrets.get(name, default)
+    except StreamlitSecretNotFoundError:
+        return default
+
+# Journal backend: "sheets" (default), or local "sqlite" / "parquet" (path in journal_path)
+JOURNAL_BACKEND = secret("journal_backend", "sheets")
+# One poller per process refreshes the journal snapshot for every session (seconds)
+POLL_SECONDS = secret("journal_poll_seconds", 30)
+
+def close_resource(resource):
+    """Stop the background threads of a resource dropped from the cache"""
+    if resource is not None:
+        resource.close()
+
 # Initialize connection to Google Sheets
-@st.cache_resource
+@st.cache_resource(on_release=close_resource)
 def init_connection():
     """Initialize connection to Google Sheets"""
     try:
@@ -216,50 +239,105 @@ def init_connection():
                 "https://www.googleapis.com/auth/drive"
             ]
         )
-        client = gspread.authorize(credentials)
-        return client
+        # One pooled client per process: cached spreadsheet/worksheet handles,
+        # background token refresh, all API calls through the shared limiter
+        return SheetsPool(credentials)
     except Exception as e:
         st.error(f"Error connecting to Google Sheets: {e}")
         return None
 
-@st.cache_data(ttl=60)
-def load_data(_client):
-    """Load data from Google Sheets with caching"""
+def parse_trade_rows(rows, row_numbers):
+    """Parse raw sheet rows into a typed DataFrame indexed by sheet row"""
+    df = pd.DataFrame(rows, columns=COLUMNS, index=pd.Index(list(row_numbers), name='Row'))
+    
+    # Convert date columns
+    date_columns = ['Buy Date', 'Current Date', 'Custom Date']
+    for col in date_columns:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], errors='coerce')
+    
+    # Convert numeric columns
+    numeric_columns = ['Qty Lot', 'Price (Buy)', 'Value (Buy)', 'Current Price', 
+                      'Custom Price', 'Change %', 'P&L', 'Change % (Custom)', 'P&L (Custom)']
+    for col in numeric_columns:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+    
+    # Position as OPEN/CLOSE categories, Stock Code as category
+    return categorize(df)
+
+@st.cache_resource
+def get_journal_sync(spreadsheet_id, worksheet=None):
+    """Per-process snapshot of one worksheet, used for incremental (delta) syncs"""
+    return SheetSync(parse=parse_trade_rows, width=len(COLUMNS), key_cols=INPUT_COL_INDEXES,
+                     id_col=ID_COL_INDEX, id_header=ID_COL, formula_cols=FORMULA_COL_INDEXES)
+
+@st.cache_resource(on_release=close_resource)
+def get_journal_store(_client):
+    """JournalStore for the configured backend; every read and write goes through it"""
+    if JOURNAL_BACKEND != "sheets":
+        return open_store(JOURNAL_BACKEND, path=st.secrets.get("journal_path"))
+    # Several journals (one worksheet per year / one spreadsheet per account) via
+    # secrets journal_sources = [{name, spreadsheet_id, worksheet}]; new trades go to the first
+    sources = st.secrets.get("journal_sources")
+    if not sources:
+        return open_sheets_journal(_client, st.secrets["spreadsheet_id"])
+    members = {}
+    for source in sources:
+        spreadsheet_id = source.get("spreadsheet_id", st.secrets.get("spreadsheet_id"))
+        name = source.get("name") or source.get("worksheet") or spreadsheet_id
+        members[name] = open_sheets_journal(_client, spreadsheet_id, source.get("worksheet"))
+    return MultiJournalStore(members)
+
+def open_sheets_journal(client, spreadsheet_id, worksheet=None):
+    """Sheets JournalStore for one worksheet (None = first sheet)"""
+    return open_store("sheets", open_ws=lambda: client.worksheet(spreadsheet_id, worksheet),
+                      sync=get_journal_sync(spreadsheet_id, worksheet), poll_every=POLL_SECONDS)
+
+def journal_key():
+    """Identifies the configured journal in cache keys"""
+    if JOURNAL_BACKEND == "sheets":
+        return f"sheets:{st.secrets.get('spreadsheet_id', '')}"
+    return f"{JOURNAL_BACKEND}:{st.secrets.get('journal_path', '')}"
+
+# Columns each page reads (None = all, e.g. for the CSV export); the sidebar
+# quick stats need Possition on every page
+PAGE_COLUMNS = {
+    "📊 Dashboard": ["Buy Date", "Stock Code", "Qty Lot", "Price (Buy)", "Value (Buy)",
+                    "Current Price", "Possition", "Change %", "P&L"],
+    "➕ Add Trade": [],
+    "✏️ Update Trade": ["Buy Date", "Stock Code", "Qty Lot", "Price (Buy)", "Current Price",
+                       "Custom Date", "Possition", ID_COL],
+    "🗑️ Delete Trade": ["Buy Date", "Stock Code", "Qty Lot", "Price (Buy)", "Possition", "P&L", ID_COL],
+    "📋 All Trades": None,
+}
+SIDEBAR_COLUMNS = ["Possition"]
+
+def page_columns(page):
+    """Columns to load for a page, in sheet order"""
+    if PAGE_COLUMNS[page] is None:
+        return None
+    wanted = set(PAGE_COLUMNS[page] + SIDEBAR_COLUMNS)
+    return [c for c in COLUMNS if c in wanted]
+
+@st.cache_data(ttl=60, max_entries=16)
+def load_data(_client, journal, version, columns=None):
+    """Load journal data, cached per (journal, store version, projected columns)"""
     try:
-        sheet = _client.open_by_key(st.secrets["spreadsheet_id"]).sheet1
-        data = sheet.get_all_records()
-        df = pd.DataFrame(data)
-        
-        # Convert date columns
-        date_columns = ['Buy Date', 'Current Date', 'Custom Date']
-        for col in date_columns:
-            if col in df.columns:
-                df[col] = pd.to_datetime(df[col], errors='coerce')
-        
-        # Convert numeric columns
-        numeric_columns = ['Qty Lot', 'Price (Buy)', 'Value (Buy)', 'Current Price', 
-                          'Custom Price', 'Change %', 'P&L', 'Change % (Custom)', 'P&L (Custom)']
-        for col in numeric_columns:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-        
-        return df
+        # Sheets: returns the snapshot published by the background poller (delta syncs);
+        # only formula columns some page asked for are re-read periodically
+        return get_journal_store(_client).load(max_age=POLL_SECONDS, columns=columns)
     except Exception as e:
         st.error(f"Error loading data: {e}")
         return pd.DataFrame()
 
 def add_trade(client, buy_date, stock_code, qty_lot, price_buy):
-    """Add new trade to Google Sheets"""
+    """Add new trade to the journal"""
     try:
-        sheet = client.open_by_key(st.secrets["spreadsheet_id"]).sheet1
-        
         # Format date as string
         buy_date_str = buy_date.strftime('%Y-%m-%d')
         
-        # Calculate Value (Buy)
-        value_buy = qty_lot * 100 * price_buy  # 1 lot = 100 shares
-        
-        # Append row
+        # Prepare row data
         row = [
             buy_date_str,
             stock_code.upper(),
@@ -277,42 +355,39 @@ def add_trade(client, buy_date, stock_code, qty_lot, price_buy):
             ""   # P&L (Custom)
         ]
         
-        sheet.append_row(row)
-        st.cache_data.clear()  # Clear cache to reload data
+        get_journal_store(client).append(row)
+        
         return True
     except Exception as e:
         st.error(f"Error adding trade: {e}")
         return False
 
-def update_trade(client, row_index, column_name, new_value):
-    """Update specific cell in Google Sheets"""
+def update_trade(client, trade_id, column_name, new_value):
+    """Update one column of a trade, addressed by its Trade ID"""
     try:
-        sheet = client.open_by_key(st.secrets["spreadsheet_id"]).sheet1
-        
-        # Get header row to find column index
-        headers = sheet.row_values(1)
-        col_index = headers.index(column_name) + 1
-        
-        # Update cell (row_index + 2 because: +1 for header, +1 for 0-indexing)
-        sheet.update_cell(row_index + 2, col_index, new_value)
-        st.cache_data.clear()
+        get_journal_store(client).update(trade_id, {column_name: new_value})
         return True
     except Exception as e:
         st.error(f"Error updating trade: {e}")
         return False
 
-def delete_trade(client, row_index):
-    """Delete trade from Google Sheets"""
+def delete_trade(client, trade_id):
+    """Delete trade from the journal"""
     try:
-        sheet = client.open_by_key(st.secrets["spreadsheet_id"]).sheet1
-        # Delete row (row_index + 2 because: +1 for header, +1 for 0-indexing)
-        sheet.delete_rows(row_index + 2)
-        st.cache_data.clear()
+        get_journal_store(client).delete(trade_id)
         return True
     except Exception as e:
         st.error(f"Error deleting trade: {e}")
         return False
 
+def refresh_journal(client):
+    """Re-read the journal from its backend; only this journal's cache entry goes stale"""
+    store = get_journal_store(client)
+    store.invalidate()
+    if client is not None:
+        client.forget()
+    store.load()
+
 def format_currency(value):
     """Format number as Indonesian Rupiah"""
     if pd.isna(value):
@@ -332,28 +407,33 @@ def main():
     st.markdown("### Backtesting & Portfolio Management System")
     
     # Initialize connection
-    client = init_connection()
-    if client is None:
+    client = init_connection() if JOURNAL_BACKEND == "sheets" else None
+    if JOURNAL_BACKEND == "sheets" and client is None:
         st.error("⚠️ Failed to connect to Google Sheets. Please check your credentials.")
         return
     
-    # Load data
-    df = load_data(client)
-    
     # Sidebar
     with st.sidebar:
         st.markdown("## 🎯 Navigation")
         page = st.radio(
             "Select Page",
-            ["📊 Dashboard", "➕ Add Trade", "✏️ Update Trade", "🗑️ Delete Trade", "📋 All Trades"],
+            list(PAGE_COLUMNS),
             label_visibility="collapsed"
         )
-        
+    
+    # Load only the columns this page reads (writes bump the store version,
+    # so the next call misses the cache)
+    df = load_data(client, journal_key(), get_journal_store(client).version, page_columns(page))
+    # Counted once per rerun; on the category column this is a count over its codes
+    # (a failed load returns a frame without columns)
+    position_counts = None if df.empty else df['Possition'].value_counts()
+    
+    with st.sidebar:
         st.markdown("---")
         st.markdown("### 📌 Quick Stats")
         if not df.empty:
-            open_positions = len(df[df['Possition'] == 'OPEN'])
-            closed_positions = len(df[df['Possition'] == 'CLOSE'])
+            open_positions = position_counts.get('OPEN', 0)
+            closed_positions = position_counts.get('CLOSE', 0)
             st.metric("Open Positions", open_positions)
             st.metric("Closed Positions", closed_positions)
             st.metric("Total Trades", len(df))
@@ -379,7 +459,7 @@ def main():
                      delta=format_percentage(df['Change %'].mean()))
         
         with col3:
-            open_trades = len(df[df['Possition'] == 'OPEN'])
+            open_trades = position_counts.get('OPEN', 0)
             st.metric("🔓 Open Positions", open_trades)
         
         with col4:
@@ -411,7 +491,6 @@ def main():
         
         with col2:
             st.markdown("### 🥧 Position Status")
-            position_counts = df['Possition'].value_counts()
             fig_pie = px.pie(
                 values=position_counts.values,
                 names=position_counts.index,
@@ -503,6 +582,7 @@ def main():
         if selected_trade:
             trade_index = trade_options.index(selected_trade)
             trade = df.iloc[trade_index]
+            trade_id = trade[ID_COL]
             
             st.markdown(f"### Updating: {trade['Stock Code']}")
             
@@ -532,7 +612,7 @@ def main():
                     )
                     
                     if st.form_submit_button("💾 Update Position", use_container_width=True):
-                        if update_trade(client, trade_index, 'Possition', new_position):
+                        if update_trade(client, trade_id, 'Possition', new_position):
                             st.success("✅ Position updated successfully!")
                             st.rerun()
                 
@@ -544,7 +624,7 @@ def main():
                     
                     if st.form_submit_button("💾 Update Custom Date", use_container_width=True):
                         date_str = custom_date.strftime('%Y-%m-%d')
-                        if update_trade(client, trade_index, 'Custom Date', date_str):
+                        if update_trade(client, trade_id, 'Custom Date', date_str):
                             st.success("✅ Custom date updated successfully!")
                             st.rerun()
                 
@@ -557,7 +637,7 @@ def main():
                     )
                     
                     if st.form_submit_button("💾 Update Quantity", use_container_width=True):
-                        if update_trade(client, trade_index, 'Qty Lot', new_qty):
+                        if update_trade(client, trade_id, 'Qty Lot', new_qty):
                             st.success("✅ Quantity updated successfully!")
                             st.rerun()
                 
@@ -571,7 +651,7 @@ def main():
                     )
                     
                     if st.form_submit_button("💾 Update Price", use_container_width=True):
-                        if update_trade(client, trade_index, 'Price (Buy)', new_price):
+                        if update_trade(client, trade_id, 'Price (Buy)', new_price):
                             st.success("✅ Price updated successfully!")
                             st.rerun()
     
@@ -593,6 +673,7 @@ def main():
         if selected_trade:
             trade_index = trade_options.index(selected_trade)
             trade = df.iloc[trade_index]
+            trade_id = trade[ID_COL]
             
             # Show trade details
             st.markdown("### Trade Details")
@@ -611,7 +692,7 @@ def main():
             col1, col2 = st.columns([1, 3])
             with col1:
                 if st.button("🗑️ Delete Trade", type="primary", use_container_width=True):
-                    if delete_trade(client, trade_index):
+                    if delete_trade(client, trade_id):
                         st.success("✅ Trade deleted successfully!")
                         st.rerun()
             with col2:
@@ -680,11 +761,10 @@ def main():
         
         st.dataframe(display_df, use_container_width=True, hide_index=True)
         
-        # Download button
-        csv = filtered_df.to_csv(index=False)
+        # Download button (CSV is written only when clicked)
         st.download_button(
             label="📥 Download as CSV",
-            data=csv,
+            data=lambda: export_bytes(filtered_df, "CSV"),
             file_name=f"idx_trades_{datetime.now().strftime('%Y%m%d')}.csv",
             mime="text/csv",
             use_container_width=True
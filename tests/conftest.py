@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+
+# Mirror Parquet jangan sampai menimpa cache lokal yang asli
+os.environ.setdefault("JOURNAL_MIRROR_DIR", tempfile.mkdtemp(prefix="test_mirror_"))
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
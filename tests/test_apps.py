@@ -0,0 +1,57 @@
+"""End-to-end reruns of the Streamlit apps (AppTest) on the fake gspread."""
+import os
+
+import pytest
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+from fake_gspread import FakeClient, journal_rows, patch_gspread
+from journal_data import COLUMNS, ID_COL_INDEX
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APPS = ["app.py", "claude_app.py", "testing_app.py"]
+
+
+def run_app(app, client, spreadsheet_id, secrets=True):
+    st.cache_resource.clear()
+    st.cache_data.clear()
+    with patch_gspread(client):
+        at = AppTest.from_file(os.path.join(ROOT, app), default_timeout=60)
+        if secrets:
+            at.secrets["spreadsheet_id"] = spreadsheet_id
+            at.secrets["gcp_service_account"] = {"type": "service_account"}
+        return at.run()
+
+
+@pytest.mark.parametrize("app", APPS)
+def test_failed_load_shows_error(app):
+    client = FakeClient()
+    # ID spreadsheet unik: mirror Parquet dari test lain tidak ikut terbaca
+    spreadsheet = client.create(f"down-{app}", journal_rows(10, formula_row=True))
+
+    def down(**kwargs):
+        raise RuntimeError("sheet down")
+
+    spreadsheet.sheet1.get_all_values = down
+    at = run_app(app, client, f"down-{app}")
+
+    assert not at.exception
+    assert any("sheet down" in e.value for e in at.error)
+
+
+@pytest.mark.parametrize("app", APPS)
+def test_missing_secrets_shows_connection_error(app):
+    at = run_app(app, FakeClient(), "unused", secrets=False)
+
+    assert not at.exception
+    assert any("No secrets found" in e.value for e in at.error)
+
+
+def test_claude_app_adds_id_column_to_14_column_sheet():
+    client = FakeClient()
+    sheet = client.create("narrow-claude_app", [COLUMNS[:ID_COL_INDEX]]).sheet1
+    at = run_app("claude_app.py", client, "narrow-claude_app")
+
+    assert not at.exception
+    assert not at.error
+    assert sheet.values[0] == COLUMNS
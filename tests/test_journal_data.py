@@ -0,0 +1,69 @@
+"""Parsing sheet text into typed journal columns."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from journal_data import COLUMNS, ERROR_SENTINELS, parse_dates, parse_numbers, parse_rows
+
+
+@pytest.mark.parametrize("text, value", [
+    ("Rp 1.500.000", 1500000.0),
+    ("Rp 1,500,000", 1500000.0),
+    ("Rp 12.345,67", 12345.67),
+    ("Rp1,500.75", 1500.75),
+    ("12.5", 12.5),
+    ("-1.500", -1500.0),
+    ("Rp -1,500", -1500.0),
+    ("(Rp 1.500)", -1500.0),
+    ("IDR 1.500", 1500.0),
+    (" 7 ", 7.0),
+])
+def test_rupiah(text, value):
+    assert parse_numbers([text])[0] == value
+
+
+@pytest.mark.parametrize("text, value", [
+    ("5.5%", 5.5), ("5,5%", 5.5), ("1.234,5%", 1234.5), ("12,3456%", 12.3456), ("(3,25%)", -3.25), ("-0,01%", -0.01),
+])
+def test_percent_last_separator_is_decimal(text, value):
+    assert parse_numbers([text], percent=True)[0] == value
+
+
+@pytest.mark.parametrize("percent", [False, True])
+def test_sentinels_and_garbage_are_nan(percent):
+    values = ERROR_SENTINELS + [None, "abc", "1-2", "--5"]
+    assert np.isnan(parse_numbers(values, percent=percent)).all()
+
+
+def test_numbers_keep_shape():
+    grid = np.array([["1.500", "#N/A"], ["1.500", "2,5"]], dtype=object)
+    np.testing.assert_array_equal(parse_numbers(grid), [[1500.0, np.nan], [1500.0, 2.5]])
+
+
+@pytest.mark.parametrize("dayfirst, expected", [
+    (False, ["2024-02-01", "NaT", "2024-02-01", "2024-02-01 10:30:00", "2024-02-01"]),
+    (True, ["2024-01-02", "2024-01-13", "2024-01-02", "2024-01-02 10:30:00", "2024-02-01"]),
+])
+def test_slash_dates_follow_dayfirst_including_short_years(dayfirst, expected):
+    values = ["02/01/2024", "13/01/2024", "02/01/24", "02/01/24 10:30:00", "2024-02-01"]
+    np.testing.assert_array_equal(parse_dates(values, dayfirst=dayfirst), [pd.Timestamp(e).to_datetime64() for e in expected])
+
+
+def test_date_sentinels_are_nat():
+    assert pd.isna(parse_dates(["#N/A", "Loading...", "", "soon"])).all()
+
+
+def test_rows_parse_each_column_with_its_own_rules():
+    row = ["02/01/24", "BBCA", "2", "9.000", "Rp 1.800.000", "2024-06-28", "#N/A", "", "",
+           "Floating", "1,5%", "(Rp 27.000)", "", "", "T1"]
+    blank = [""] * len(COLUMNS)
+    df = parse_rows([row, blank], [2, 3])
+
+    assert list(df.index) == [2]
+    trade = df.loc[2]
+    assert trade["Buy Date"] == pd.Timestamp("2024-02-01")
+    assert trade["Current Date"] == pd.Timestamp("2024-06-28")
+    assert (trade["Qty Lot"], trade["Price (Buy)"], trade["Value (Buy)"]) == (2.0, 9000.0, 1800000.0)
+    assert np.isnan(trade["Current Price"]) and pd.isna(trade["Custom Date"])
+    assert (trade["Change %"], trade["P&L"]) == (1.5, -27000.0)
+    assert (trade["Possition"], trade["Trade ID"]) == ("OPEN", "T1")
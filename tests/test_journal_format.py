@@ -0,0 +1,73 @@
+"""Vectorized display formatters against the per-cell formatting they replaced."""
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from journal_format import format_dates, format_frame, format_number, format_percent, format_rupiah
+
+
+# Formatter per sel lama (app.py format_rupiah, claude_app format_currency / format_percentage)
+def old_rupiah(x):
+    if pd.isna(x) or x == 0:
+        return "Rp 0"
+    return f"Rp {float(x):,.0f}".replace(',', '.')
+
+
+def old_currency(x):
+    return "Rp 0" if pd.isna(x) else f"Rp {x:,.0f}"
+
+
+def old_percentage(x):
+    return "0.00%" if pd.isna(x) else f"{x:.2f}%"
+
+
+def sample():
+    rng = np.random.default_rng(7)
+    return np.concatenate([
+        rng.uniform(-1e9, 1e9, 2000), rng.uniform(-100, 100, 2000), np.round(rng.uniform(-100, 100, 2000), 2),
+        [0.0, 0.5, 1.5, 2.5, 999.5, 1000, 1e15, -1234567.89, 82.45, -58.45, 8.95, 0.05, np.nan],
+    ])
+
+
+def without_negative_zero(text):
+    # Bedanya yang disengaja: nilai yang dibulatkan jadi 0 tidak diberi tanda minus
+    return re.sub(r'^(Rp )?-(?=[0.,]+%?$)', r'\1', text)
+
+
+@pytest.mark.parametrize("new, old", [
+    (format_rupiah, old_rupiah),
+    (lambda v: format_rupiah(v, sep=','), old_currency),
+    (lambda v: format_number(v, sep=',', missing='-'), lambda x: "-" if pd.isna(x) else f"{x:,.0f}"),
+    (format_percent, lambda x: "-" if pd.isna(x) else f"{x:.1f}%"),
+    (lambda v: format_percent(v, missing='0.00%', decimals=2), old_percentage),
+])
+def test_matches_per_cell_output(new, old):
+    values = sample()
+    assert new(values).tolist() == [without_negative_zero(old(x)) for x in values]
+
+
+def test_negative_zero_has_no_sign():
+    assert format_rupiah([-0.4, -0.6]).tolist() == ["Rp 0", "Rp -1"]
+    assert format_percent([-0.04, -0.06]).tolist() == ["0.0%", "-0.1%"]
+
+
+def test_dates_match_strftime():
+    dates = pd.Series(pd.to_datetime(["2024-01-02", None, "2023-12-31", "2024-01-02"]), index=[5, 3, 9, 2])
+    expected = [d.strftime('%d/%m/%y') if pd.notna(d) else '-' for d in dates]
+
+    out = format_dates(dates)
+    assert out.tolist() == expected
+    assert list(out.index) == [5, 3, 9, 2]
+    assert format_dates(dates.iloc[:0]).tolist() == []
+
+
+def test_format_frame_formats_known_columns_only():
+    df = pd.DataFrame({"Stock Code": ["BBCA", "TLKM"], "P&L": [1500.0, np.nan], "Change %": [5.55, -1.25]},
+                      index=[4, 2])
+    out = format_frame(df, ["Stock Code", "P&L", "Change %"], rename={"P&L": "PnL"})
+
+    assert list(out.columns) == ["Stock Code", "PnL", "Change %"]
+    assert list(out.index) == [4, 2]
+    assert out.values.tolist() == [["BBCA", "Rp 1.500", f"{5.55:.1f}%"], ["TLKM", "Rp 0", f"{-1.25:.1f}%"]]
@@ -0,0 +1,49 @@
+"""TradeQuery against plain pandas filtering / sorting of the same frame."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from fake_gspread import journal_rows
+from journal_data import FIRST_DATA_ROW, parse_rows
+from journal_query import SORT_COLS, TradeQuery
+
+
+@pytest.fixture(scope="module")
+def df():
+    rows = journal_rows(400, seed=3)[1:]
+    df = parse_rows(rows, range(FIRST_DATA_ROW, FIRST_DATA_ROW + len(rows)))
+    rng = np.random.default_rng(3)
+    # Banyak nilai kembar + kosong: urutan stabil dan posisi NaN ikut diuji
+    df["P&L"] = rng.integers(-5, 5, len(df)) * 1000.0
+    df["Change %"] = np.where(rng.random(len(df)) < 0.2, np.nan, rng.integers(-3, 3, len(df)) / 2)
+    df.loc[df.index[::7], "Buy Date"] = pd.NaT
+    return df
+
+
+@pytest.mark.parametrize("column", SORT_COLS)
+def test_order_matches_stable_descending_sort(df, column):
+    expected = df.sort_values(column, ascending=False, kind="stable", na_position="last").index
+
+    assert list(df.index[TradeQuery(df).select(sort_by=column)]) == list(expected)
+
+
+@pytest.mark.parametrize("filters", [
+    {},
+    {"Possition": ["OPEN"]},
+    {"Possition": ["OPEN", "CLOSE"], "Stock Code": []},
+    {"Possition": ["CLOSE"], "Stock Code": ["BBCA", "TLKM", "NOPE"]},
+])
+@pytest.mark.parametrize("sort_by", [None, "P&L"])
+def test_filters_match_boolean_masks(df, filters, sort_by):
+    hit = np.ones(len(df), dtype=bool)
+    for column, values in filters.items():
+        if values:
+            hit &= df[column].isin(values).to_numpy()
+    expected = df[hit]
+    if sort_by:
+        expected = expected.sort_values(sort_by, ascending=False, kind="stable", na_position="last")
+
+    query = TradeQuery(df)
+    assert list(df.index[query.select(filters, sort_by)]) == list(expected.index)
+    if filters.get("Possition"):
+        assert query.count("Possition", filters["Possition"]) == int(df["Possition"].isin(filters["Possition"]).sum())
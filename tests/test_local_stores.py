@@ -0,0 +1,114 @@
+"""SQLite / Parquet journal backends: round trips, derived columns, imports."""
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from fake_gspread import journal_rows
+from journal_data import COLUMNS, FIRST_DATA_ROW, ID_COL, parse_rows
+from journal_store import DERIVED_COLS, open_store
+
+BACKENDS = {"sqlite": "journal.db", "parquet": "journal.parquet"}
+
+
+def trade(code="BBCA", lot=2, price=9000, trade_id=""):
+    values = [""] * len(COLUMNS)
+    values[:4] = ["2024-06-03", code, lot, price]
+    values[COLUMNS.index("Possition")] = "Open"
+    values[-1] = trade_id
+    return values
+
+
+@pytest.fixture(params=sorted(BACKENDS))
+def path(request, tmp_path):
+    return tmp_path / BACKENDS[request.param]
+
+
+def store_at(path):
+    return open_store("sqlite" if path.suffix == ".db" else "parquet", path=str(path))
+
+
+def test_append_round_trip_with_derived_columns(path):
+    store = store_at(path)
+    key = store.append(trade())
+    store.update(key, {"Current Price": "Rp 9.900"})
+    df = store.load()
+
+    row = df.set_index(ID_COL).loc[key]
+    assert row["Buy Date"] == pd.Timestamp("2024-06-03")
+    assert (row["Stock Code"], row["Possition"]) == ("BBCA", "OPEN")
+    assert row["Value (Buy)"] == 2 * 100 * 9000
+    assert row["P&L"] == 900 * 200
+    assert row["Change %"] == pytest.approx(10.0)
+    # Sama dengan dtype hasil parse sheet, jadi view tidak membedakan backend
+    assert df.dtypes.astype(str).to_dict() == parse_rows([], []).dtypes.astype(str).to_dict()
+
+
+def test_edits_recompute_derived_columns_and_persist(path):
+    store = store_at(path)
+    keep, drop = store.append(trade()), store.append(trade("TLKM"))
+    store.batch([("update", keep, {"Qty Lot": 5, "Possition": "CLOSE"}), ("delete", drop)])
+
+    df = store_at(path).load()    # proses lain membaca file yang sama
+    assert list(df[ID_COL]) == [keep]
+    assert df["Value (Buy)"].iloc[0] == 5 * 100 * 9000
+    assert df["Possition"].iloc[0] == "CLOSE"
+
+
+def test_append_then_edit_in_one_batch(path):
+    store = store_at(path)
+    keys = store.batch([("append", trade(trade_id="NEW1")), ("update", "NEW1", {"Qty Lot": 7}),
+                        ("append", trade(trade_id="NEW2")), ("delete", "NEW2")])
+
+    assert keys == ["NEW1"]
+    assert store.load()[["Trade ID", "Qty Lot"]].values.tolist() == [["NEW1", 7.0]]
+
+
+def test_update_of_unknown_trade_fails_without_writing(path):
+    store = store_at(path)
+    key = store.append(trade())
+    with pytest.raises(KeyError):
+        store.batch([("update", key, {"Qty Lot": 9}), ("update", "MISSING", {"Qty Lot": 1})])
+
+    assert store_at(path).load()["Qty Lot"].tolist() == [2.0]
+
+
+def test_import_keeps_trades_ids_and_recomputes_derived(path):
+    rows = journal_rows(30)[1:]
+    rows[0][COLUMNS.index(ID_COL)] = ""     # trade tanpa ID dapat ID baru
+    sheet = parse_rows(rows, range(FIRST_DATA_ROW, FIRST_DATA_ROW + len(rows)))
+    sheet.loc[sheet.index[1], "Value (Buy)"] = -1.0    # angka formula basi tidak ikut tersimpan
+
+    store_at(path).import_frame(sheet)
+    df = store_at(path).load()
+
+    assert len(df) == 30 and df[ID_COL].is_unique and df[ID_COL].ne("").all()
+    assert list(df[ID_COL].iloc[1:]) == list(sheet[ID_COL].iloc[1:])
+    pd.testing.assert_series_equal(df["Stock Code"].astype(str), sheet["Stock Code"].astype(str),
+                                   check_index=False)
+    np.testing.assert_array_equal(df["Value (Buy)"], df["Qty Lot"] * 100 * df["Price (Buy)"])
+    assert df["Buy Date"].tolist() == sheet["Buy Date"].tolist()
+
+
+def test_derived_columns_are_not_stored(path):
+    store = store_at(path)
+    store.append(trade())
+    if path.suffix == ".db":
+        with sqlite3.connect(path) as conn:
+            stored = conn.execute("SELECT " + ", ".join(f'"{c}"' for c in DERIVED_COLS) + " FROM trades").fetchone()
+    else:
+        stored = pd.read_parquet(path)[DERIVED_COLS].iloc[0].tolist()
+    assert all(v is None or np.isnan(v) for v in stored)
+
+
+def test_sqlite_load_sees_writes_from_another_connection(tmp_path):
+    path = tmp_path / "journal.db"
+    store = store_at(path)
+    store.append(trade())
+    assert len(store.load()) == 1
+
+    other = store_at(path)
+    other.append(trade("TLKM"))
+
+    assert store.load()["Stock Code"].tolist() == ["BBCA", "TLKM"]
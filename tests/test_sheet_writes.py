@@ -0,0 +1,226 @@
+"""Sheets writes against the fake gspread while other users edit the same sheet."""
+import threading
+import time
+
+import pytest
+import requests
+
+from fake_gspread import FakeClient, journal_rows
+from journal_data import COLUMNS, FIRST_DATA_ROW, ID_COL, ID_COL_INDEX, INPUT_COL_INDEXES, parse_rows
+from journal_store import SheetsJournalStore
+from sheet_sync import SheetSync
+from sheet_writer import WriteConflict, WriteQueue
+from sheets_client import RateLimited, SheetsRateLimiter
+
+QTY = COLUMNS.index("Qty Lot")
+
+
+def new_trade(trade_id=""):
+    return ["2024-06-03", "TLKM", 10, 3000] + [""] * 5 + ["OPEN"] + [""] * 4 + [trade_id]
+
+
+@pytest.fixture
+def sheet():
+    client = FakeClient()
+    spreadsheet = client.create("journal", journal_rows(20, formula_row=True))
+    return spreadsheet.sheet1
+
+
+@pytest.fixture
+def store(sheet):
+    sync = SheetSync(parse=parse_rows, width=len(COLUMNS), key_cols=INPUT_COL_INDEXES,
+                     first_row=FIRST_DATA_ROW, append_from=3, id_col=ID_COL_INDEX, id_header=ID_COL)
+    store = SheetsJournalStore(lambda: sheet, sync)
+    store.load()
+    return store
+
+
+def row_of(sheet, trade_id):
+    """Raw sheet row holding `trade_id` (1-based), or None"""
+    for n, row in enumerate(sheet.values, start=1):
+        if row[ID_COL_INDEX] == trade_id:
+            return n
+    return None
+
+
+def trade_ids(sheet):
+    return [row[ID_COL_INDEX] for row in sheet.values[FIRST_DATA_ROW:] if row[ID_COL_INDEX]]
+
+
+def external_rows(sheet, kind, row_number):
+    """Another user inserts / deletes a sheet row behind the store's back"""
+    sheet.spreadsheet.batch_update({"requests": [{kind: {"range": {
+        "sheetId": sheet.id, "dimension": "ROWS", "startIndex": row_number - 1, "endIndex": row_number,
+    }}}]})
+
+
+def target(store, position=10):
+    return store.sync.df[ID_COL].iloc[position]
+
+
+def test_update_after_row_inserted_above(sheet, store):
+    key = target(store)
+    external_rows(sheet, "insertDimension", 5)
+    sheet.update("A5", [journal_rows(1, seed=3)[1]])
+    before = sheet.values
+
+    store.update(key, {"Qty Lot": 77})
+
+    after = sheet.values
+    n = row_of(sheet, key)
+    assert after[n - 1][QTY] == "77"
+    assert [r for i, r in enumerate(after) if i != n - 1] == [r for i, r in enumerate(before) if i != n - 1]
+
+
+def test_delete_after_row_deleted_above(sheet, store):
+    key = target(store)
+    external_rows(sheet, "deleteDimension", 5)
+    expected = [k for k in trade_ids(sheet) if k != key]
+
+    store.delete(key)
+
+    assert trade_ids(sheet) == expected
+
+
+def test_append_when_slot_taken_by_another_user(sheet, store):
+    slot = FIRST_DATA_ROW + len(store.sync.df) + 1
+    other = list(journal_rows(1, seed=7)[1])
+    sheet.update(f"A{slot}", [other])
+
+    new_id = store.append(new_trade())
+
+    assert row_of(sheet, other[ID_COL_INDEX]) == slot
+    assert row_of(sheet, new_id) not in (None, slot)
+    assert new_id in set(store.load()[ID_COL])
+
+
+def test_write_conflict_when_rows_keep_changing(sheet, store, monkeypatch):
+    key = target(store)
+    monkeypatch.setattr(store.sync, "stale_rows", lambda ws, rows: list(rows))
+    before = sheet.values
+
+    with pytest.raises(WriteConflict):
+        store.update(key, {"Qty Lot": 77})
+    assert sheet.values == before
+
+
+def test_queue_does_not_retry_write_conflict(store, monkeypatch):
+    calls = []
+
+    def conflict(ops):
+        calls.append(ops)
+        raise WriteConflict("rows keep changing")
+
+    monkeypatch.setattr(store, "batch", conflict)
+    queue = WriteQueue(store, flush_delay=0, backoff=5)
+    mutation_id = queue.update(target(store), {"Qty Lot": 77})
+
+    assert queue.wait(timeout=2)
+    assert queue.status[mutation_id]["state"] == "failed"
+    assert len(calls) == 1
+
+
+def test_retry_after_failed_delete_does_not_duplicate_append(sheet, store, monkeypatch):
+    key = target(store)
+    applied = sheet.spreadsheet.batch_update
+    fails = [ConnectionResetError("applied, then the connection dropped")]
+
+    def flaky(body):
+        applied(body)
+        if fails:
+            raise fails.pop()
+
+    monkeypatch.setattr(sheet.spreadsheet, "batch_update", flaky)
+    queue = WriteQueue(store, flush_delay=0, backoff=0.01)
+    ids = [queue.append(new_trade("NEW-1")), queue.delete(key)]
+
+    assert queue.wait(timeout=5)
+    assert [queue.status[i]["state"] for i in ids] == ["committed", "committed"]
+    # Batch dicoba ulang utuh: append & delete yang sudah jalan tidak diulang
+    assert trade_ids(sheet).count("NEW-1") == 1
+    assert key not in trade_ids(sheet)
+    assert len(trade_ids(sheet)) == 20
+
+
+def test_timed_out_delete_is_rechecked_not_resent(sheet, store, monkeypatch):
+    limiter = SheetsRateLimiter(per_minute=6000, burst=100, backoff=0.01)
+    ws = RateLimited(sheet, limiter)
+    store.open_ws = lambda: ws
+    key, next_key = target(store), target(store, 11)
+    applied = sheet.spreadsheet.batch_update
+    fails = [requests.exceptions.Timeout("applied, reply lost")]
+
+    def flaky(body):
+        applied(body)
+        if fails:
+            raise fails.pop()
+
+    monkeypatch.setattr(sheet.spreadsheet, "batch_update", flaky)
+    store.delete(key)
+
+    assert key not in trade_ids(sheet)
+    assert next_key in trade_ids(sheet)
+    assert limiter.metrics()["retries"] == 0
+
+
+def test_flush_during_poll_sees_whole_id_index(sheet, store, monkeypatch):
+    key = target(store)
+    indexing, resume = threading.Event(), threading.Event()
+    row_id = store.sync._row_id
+
+    def paused_row_id(i):
+        # Poller berhenti di tengah membangun index ID
+        indexing.set()
+        resume.wait(5)
+        return row_id(i)
+
+    monkeypatch.setattr(store.sync, "_row_id", paused_row_id)
+    poll = threading.Thread(target=store.sync.refresh, args=(sheet,), kwargs={"force_full": True})
+    poll.start()
+    assert indexing.wait(5)
+
+    queue = WriteQueue(store, flush_delay=0, backoff=0.01)
+    mutation_id = queue.update(key, {"Qty Lot": 77})
+    time.sleep(0.2)
+    resume.set()
+    poll.join(5)
+
+    assert queue.wait(timeout=5)
+    assert queue.status[mutation_id]["state"] == "committed"
+    assert sheet.values[row_of(sheet, key) - 1][QTY] == "77"
+
+
+@pytest.mark.parametrize("deleted", [0, 2])
+def test_append_grows_a_full_grid(deleted):
+    rows = journal_rows(20, formula_row=True)
+    sheet = FakeClient().create("full", rows, row_count=len(rows)).sheet1
+    sync = SheetSync(parse=parse_rows, width=len(COLUMNS), key_cols=INPUT_COL_INDEXES,
+                     first_row=FIRST_DATA_ROW, append_from=3, id_col=ID_COL_INDEX, id_header=ID_COL)
+    store = SheetsJournalStore(lambda: sheet, sync)
+    store.load()
+    store.append(new_trade())   # grid sudah ditambah sekali
+    sheet.spreadsheet.batch_update({"requests": [{"deleteDimension": {"range": {
+        "sheetId": sheet.id, "dimension": "ROWS", "startIndex": sheet.row_count - 50, "endIndex": sheet.row_count,
+    }}}]})  # sheet dirapikan di luar app: grid kembali penuh
+    store.sync.invalidate()
+    for key in list(store.sync.df[ID_COL].iloc[:deleted]):
+        store.delete(key)
+
+    ids = [store.append(new_trade()) for _ in range(60)]
+
+    assert len(set(trade_ids(sheet)) & set(ids)) == 60
+    assert sheet.row_count >= len(trade_ids(sheet)) + FIRST_DATA_ROW
+
+
+@pytest.mark.parametrize("trades", [0, 5])
+def test_id_header_written_on_14_column_sheet(trades):
+    # Header asli tanpa kolom Trade ID; baris yang ada (kalau ada) sudah punya ID
+    rows = [COLUMNS[:ID_COL_INDEX]] + journal_rows(trades)[1:]
+    sheet = FakeClient().create("narrow", rows).sheet1
+    assert len(sheet.get_all_values()[0]) == (ID_COL_INDEX + 1 if trades else ID_COL_INDEX)
+    sync = SheetSync(parse=parse_rows, width=len(COLUMNS), key_cols=INPUT_COL_INDEXES,
+                     first_row=FIRST_DATA_ROW, append_from=3, id_col=ID_COL_INDEX, id_header=ID_COL)
+    SheetsJournalStore(lambda: sheet, sync).load()
+
+    assert sheet.values[0] == COLUMNS
+    assert sync.header == COLUMNS
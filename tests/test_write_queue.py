@@ -0,0 +1,65 @@
+"""WriteQueue status bookkeeping against a recording store."""
+import pytest
+
+from sheet_writer import WriteQueue
+
+
+class RecordingStore:
+    """Records each batch; fails them with `error` while set"""
+
+    def __init__(self, error=None):
+        self.error = error
+        self.batches = []
+
+    def batch(self, ops):
+        self.batches.append(ops)
+        if self.error is not None:
+            raise self.error
+        return []
+
+
+def queue_for(store):
+    return WriteQueue(store, flush_delay=0.05, backoff=0.01, max_retries=1)
+
+
+def states(queue, ids):
+    return [queue.status[i]["state"] for i in ids]
+
+
+def test_edits_dropped_by_delete_commit_with_it():
+    store = RecordingStore()
+    queue = queue_for(store)
+    ids = [queue.update("T1", {"Qty Lot": 5}), queue.update("T1", {"Possition": "CLOSE"}), queue.delete("T1")]
+
+    assert states(queue, ids) == ["pending"] * 3
+    assert queue.wait(timeout=5)
+    assert states(queue, ids) == ["committed"] * 3
+    assert store.batches == [[("delete", "T1")]]
+
+
+@pytest.mark.parametrize("error", [KeyError("T1"), ConnectionError("down")])
+def test_edits_dropped_by_failed_delete_fail_with_it(error):
+    queue = queue_for(RecordingStore(error))
+    ids = [queue.update("T1", {"Qty Lot": 5}), queue.delete("T1")]
+
+    assert queue.wait(timeout=5)
+    assert states(queue, ids) == ["failed", "failed"]
+    assert queue.pending_ops() == []
+
+
+def test_repeated_delete_finishes_every_mutation():
+    queue = queue_for(RecordingStore())
+    ids = [queue.delete("T1"), queue.delete("T1")]
+
+    assert queue.wait(timeout=5)
+    assert states(queue, ids) == ["committed", "committed"]
+
+
+def test_edits_of_other_trades_are_written():
+    store = RecordingStore()
+    queue = queue_for(store)
+    queue.update("T1", {"Qty Lot": 5})
+    queue.delete("T2")
+
+    assert queue.wait(timeout=5)
+    assert sorted(op[0] for batch in store.batches for op in batch) == ["delete", "update"]